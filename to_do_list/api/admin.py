@@ -1,21 +1,361 @@
-from django.contrib import admin
+"""
+Admins that stay usable with millions of tasks: changelists are ordered by
+the primary key and count at most ESTIMATED_COUNT_THRESHOLD rows, the
+filters use indexes, related objects are joined instead of fetched per row,
+and the bulk actions are UPDATE and DELETE statements instead of a save()
+or delete() per object.
+"""
+import itertools
 
-from . import models
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
 
+from . import caching, models, task_ordering
 
-def make_model_admin_with_id(primary_key_column_name, model):
-    # noinspection PyProtectedMember
-    return type(
-        model.__name__, (admin.ModelAdmin,),
-        {"readonly_fields": (primary_key_column_name,)}
+ESTIMATED_COUNT_THRESHOLD = 10000
+MOVED_TASKS_CHUNK_SIZE = 1000
+
+
+def estimate_count(model):
+    """
+    Returns the approximate amount of rows of the model's table, or None
+    when the database can't tell it cheaply
+    """
+    table_name = model._meta.db_table
+    has_rowid_primary_key = model._meta.pk.get_internal_type() in (
+        "AutoField", "BigAutoField",
     )
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            # Kept up to date by autovacuum, -1 before the first ANALYZE
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class "
+                "WHERE oid = %s::regclass",
+                [table_name],
+            )
+        elif connection.vendor == "sqlite" and has_rowid_primary_key:
+            # The primary key is the rowid, so this reads one index entry.
+            # Deleted rows make it an overestimate
+            cursor.execute(
+                f"SELECT MAX(rowid) FROM "
+                f"{connection.ops.quote_name(table_name)}"
+            )
+        else:
+            return None
+        [estimate] = cursor.fetchone()
+    return estimate if estimate is not None and estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts at most ESTIMATED_COUNT_THRESHOLD + 1 rows. Bigger unfiltered
+    tables get the estimate of the database, and bigger filtered results are
+    cut at the threshold
+    """
+
+    @cached_property
+    def count(self):
+        capped_count = self.object_list.order_by()[
+            :ESTIMATED_COUNT_THRESHOLD + 1
+        ].count()
+        if capped_count <= ESTIMATED_COUNT_THRESHOLD:
+            return capped_count
+        if not self.object_list.query.where:
+            estimate = estimate_count(self.object_list.model)
+            if estimate is not None:
+                return max(estimate, capped_count)
+        return capped_count
+
+
+def owner_filter_factory(owner_id_lookup):
+    class OwnerFilter(admin.SimpleListFilter):
+        """
+        Filters by the owner that was clicked in the owner column. Unlike
+        the filter of a ForeignKey, it doesn't list every user
+        """
+        title = "owner"
+        parameter_name = "owner"
+
+        def get_owner_id(self):
+            try:
+                return int(self.value())
+            except (TypeError, ValueError):
+                return None
+
+        def lookups(self, request, model_admin):
+            owner_id = self.get_owner_id()
+            if owner_id is None:
+                return ()
+            return User.objects.filter(pk=owner_id).values_list(
+                "pk", "username",
+            )
+
+        def queryset(self, request, queryset):
+            owner_id = self.get_owner_id()
+            if owner_id is None:
+                return queryset
+            return queryset.filter(**{owner_id_lookup: owner_id})
+
+    return OwnerFilter
 
 
-def register_with_id(primary_key_column_name, *models_):
+def show_owner(owner):
+    return format_html('<a href="?owner={}">{}</a>', owner.pk, owner)
+
+
+def make_model_admin_with_id(
+    primary_key_column_name, model, bases=(admin.ModelAdmin,),
+    readonly_fields=(), **attributes
+):
+    """
+    Other attributes of the ModelAdmin (list_display, list_filter and so on)
+    are given as keyword arguments
+    """
+    # noinspection PyProtectedMember
+    return type(model.__name__, bases, {
+        "readonly_fields": (primary_key_column_name, *readonly_fields),
+        "ordering": (f"-{primary_key_column_name}",),
+        "paginator": EstimatedCountPaginator,
+        # Would count every row once more
+        "show_full_result_count": False,
+        **attributes,
+    })
+
+
+def register_with_id(primary_key_column_name, *models_, **kwargs):
     for model in models_:
         admin.site.register(model, make_model_admin_with_id(
-            primary_key_column_name, model
+            primary_key_column_name, model, **kwargs
         ))
 
 
-register_with_id("id", models.Task, models.ToDoList)
+class BulkDeletingAdmin(admin.ModelAdmin):
+    """
+    Replaces the "delete selected" action, whose confirmation page lists
+    every object that is deleted, with one that only counts them
+    """
+    actions = ["delete_in_bulk"]
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+    @admin.action(
+        description="Delete selected %(verbose_name_plural)s",
+        permissions=["delete"],
+    )
+    def delete_in_bulk(self, request, queryset):
+        if request.POST.get("post") == "yes":
+            deleted_amount = queryset.count()
+            with transaction.atomic():
+                self.delete_queryset(request, queryset)
+            self.message_user(
+                request, f"{deleted_amount} "
+                f"{self.model._meta.verbose_name_plural} were deleted.",
+                messages.SUCCESS,
+            )
+            return None
+        return TemplateResponse(
+            request, "admin/api/bulk_delete_confirmation.html", {
+                **self.admin_site.each_context(request),
+                "title": "Are you sure?",
+                "opts": self.model._meta,
+                "amount": queryset.count(),
+                "select_across": request.POST.get("select_across") == "1",
+                "selected_ids": request.POST.getlist(
+                    helpers.ACTION_CHECKBOX_NAME,
+                ),
+                "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+            },
+        )
+
+
+class TaskCountersKeepingAdmin(BulkDeletingAdmin):
+    """Recounts the tasks of the to-do lists that tasks are changed in"""
+
+    @staticmethod
+    def recount_tasks(to_do_list_ids):
+        # noinspection PyUnresolvedReferences
+        to_do_lists = models.ToDoList.objects.filter(pk__in=to_do_list_ids)
+        to_do_lists.bump_version(**models.get_recounted_task_counters())
+        caching.invalidate_after_change(
+            *to_do_lists.values_list("owner_id", flat=True),
+        )
+
+    @staticmethod
+    def get_to_do_list_ids(queryset):
+        return set(queryset.order_by().values_list(
+            "to_do_list_id", flat=True,
+        ).distinct())
+
+    def save_model(self, request, obj, form, change):
+        # The task could have been moved from another list
+        to_do_list_ids = {obj.to_do_list_id, form.initial.get("to_do_list")}
+        task_ordering.lock_to_do_lists(to_do_list_ids)
+        super().save_model(request, obj, form, change)
+        self.recount_tasks(to_do_list_ids)
+
+    def delete_model(self, request, obj):
+        to_do_list_id = obj.to_do_list_id
+        task_ordering.lock_to_do_list(to_do_list_id)
+        super().delete_model(request, obj)
+        self.recount_tasks({to_do_list_id})
+
+    def delete_queryset(self, request, queryset):
+        to_do_list_ids = self.get_to_do_list_ids(queryset)
+        task_ordering.lock_to_do_lists(to_do_list_ids)
+        # Tasks have no signal receivers and nothing that refers to them, so
+        # this is a single DELETE
+        super().delete_queryset(request, queryset)
+        self.recount_tasks(to_do_list_ids)
+
+
+class TaskActionForm(helpers.ActionForm):
+    to_do_list = forms.IntegerField(
+        required=False, label="To-do list id",
+        help_text="where the tasks are moved to",
+    )
+
+
+class TaskAdmin(TaskCountersKeepingAdmin):
+    action_form = TaskActionForm
+    actions = [
+        "mark_done", "mark_not_done", "move_to_to_do_list",
+        *TaskCountersKeepingAdmin.actions,
+    ]
+
+    def save_model(self, request, obj, form, change):
+        if "is_done" in form.changed_data:
+            obj.done_at = models.get_done_at(obj.is_done)
+        super().save_model(request, obj, form, change)
+
+    def set_state(self, request, queryset, is_done):
+        with transaction.atomic():
+            to_do_list_ids = self.get_to_do_list_ids(queryset)
+            task_ordering.lock_to_do_lists(to_do_list_ids)
+            changed_amount = queryset.exclude(is_done=is_done).update(
+                is_done=is_done, done_at=models.get_done_at(is_done),
+            )
+            self.recount_tasks(to_do_list_ids)
+        self.message_user(
+            request, f"{changed_amount} tasks were marked as "
+            f"{'done' if is_done else 'not done'}.", messages.SUCCESS,
+        )
+
+    @admin.action(
+        description="Mark selected tasks as done", permissions=["change"],
+    )
+    def mark_done(self, request, queryset):
+        self.set_state(request, queryset, True)
+
+    @admin.action(
+        description="Mark selected tasks as not done", permissions=["change"],
+    )
+    def mark_not_done(self, request, queryset):
+        self.set_state(request, queryset, False)
+
+    @admin.action(
+        description="Move selected tasks to the top of the to-do list",
+        permissions=["change"],
+    )
+    def move_to_to_do_list(self, request, queryset):
+        # noinspection PyUnresolvedReferences
+        to_do_list = models.ToDoList.objects.filter(
+            pk=request.POST.get("to_do_list") or None,
+        ).first()
+        if to_do_list is None:
+            self.message_user(
+                request, "Enter the id of an existing to-do list.",
+                messages.ERROR,
+            )
+            return
+        with transaction.atomic():
+            to_do_list_ids = self.get_to_do_list_ids(queryset)
+            task_ordering.lock_to_do_lists(to_do_list_ids | {to_do_list.pk})
+            # In their current order, the tasks of one to-do list after
+            # another
+            tasks = queryset.order_by(
+                "to_do_list_id", "order", "pk",
+            ).values_list("pk", flat=True).iterator(
+                chunk_size=MOVED_TASKS_CHUNK_SIZE,
+            )
+            moved_amount = 0
+            while chunk := list(
+                itertools.islice(tasks, MOVED_TASKS_CHUNK_SIZE)
+            ):
+                first_order = task_ordering.allocate_orders(
+                    to_do_list, amount=len(chunk),
+                )
+                # A single UPDATE for the whole chunk
+                # noinspection PyUnresolvedReferences
+                models.Task.objects.bulk_update([
+                    models.Task(
+                        pk=task_id, to_do_list=to_do_list,
+                        order=first_order
+                        + task_number * task_ordering.ORDER_GAP,
+                    )
+                    for task_number, task_id in enumerate(chunk)
+                ], ["to_do_list", "order"])
+                moved_amount += len(chunk)
+            self.recount_tasks(to_do_list_ids | {to_do_list.pk})
+        self.message_user(
+            request, f"{moved_amount} tasks were moved to {to_do_list}.",
+            messages.SUCCESS,
+        )
+
+    @admin.display(description="owner")
+    def owner(self, task):
+        return show_owner(task.to_do_list.owner)
+
+
+class ToDoListAdmin(BulkDeletingAdmin):
+
+    def delete_model(self, request, obj):
+        # Before the tasks, which are deleted first
+        task_ordering.lock_to_do_list(obj)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        task_ordering.lock_to_do_lists(queryset.values_list("pk", flat=True))
+        super().delete_queryset(request, queryset)
+
+    @admin.display(description="owner")
+    def owner_link(self, to_do_list):
+        return show_owner(to_do_list.owner)
+
+
+register_with_id(
+    "id", models.Task, bases=(TaskAdmin,), readonly_fields=("done_at",),
+    list_display=("id", "title", "is_done", "to_do_list", "owner"),
+    list_select_related=("to_do_list__owner",),
+    list_filter=("is_done", owner_filter_factory("to_do_list__owner_id")),
+    raw_id_fields=("to_do_list",),
+    # Sorting by the other columns would sort the whole table
+    sortable_by=("id",),
+    search_fields=("=to_do_list__owner__username",),
+)
+register_with_id(
+    "id", models.ToDoList, bases=(ToDoListAdmin,),
+    readonly_fields=("version", "next_order", "task_count", "done_count"),
+    list_display=("id", "title", "owner_link", "task_count", "done_count"),
+    list_select_related=("owner",),
+    list_filter=(owner_filter_factory("owner_id"),),
+    raw_id_fields=("owner",),
+    sortable_by=("id",),
+    search_fields=("=owner__username",),
+)
+register_with_id(
+    "id", models.ArchivedTask, bases=(BulkDeletingAdmin,),
+    list_display=("id", "task_id", "title", "to_do_list", "done_at"),
+    list_select_related=("to_do_list",),
+    raw_id_fields=("to_do_list",),
+    sortable_by=("id",),
+)
@@ -0,0 +1,86 @@
+"""
+Moving of tasks done long ago from Task to ArchivedTask, used by the
+archive_tasks command.
+
+Done tasks pile up in long-lived to-do lists, and every read of the list and
+every reordering goes over them. Archived tasks are only read by the paginated
+get_archived_tasks endpoint, and leave the counters of their to-do lists like
+deleted tasks do. Pages that show the to-do lists get a "reset" event, so
+they load them again.
+"""
+import collections
+import datetime
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import caching, events, models, task_ordering
+
+
+def get_archiving_cutoff(age_days):
+    """Tasks done before it are archived"""
+    return timezone.now() - datetime.timedelta(days=age_days)
+
+
+def archive_chunk(cutoff, chunk_size):
+    """
+    Archives up to chunk_size of the tasks done before the cutoff, the ones
+    done earliest first, and returns their amount, or None if there are no
+    such tasks
+    """
+    # noinspection PyUnresolvedReferences
+    done_tasks = models.Task.objects.filter(is_done=True, done_at__lt=cutoff)
+    with transaction.atomic():
+        candidates = list(done_tasks.order_by("done_at", "pk").values_list(
+            "pk", "to_do_list_id",
+        )[:chunk_size])
+        if not candidates:
+            return None
+        to_do_list_ids = {to_do_list_id for _, to_do_list_id in candidates}
+        # Locked before the tasks, like everywhere else (see
+        # task_ordering.lock_to_do_list()). The tasks could have been changed
+        # back to not done in the meantime
+        task_ordering.lock_to_do_lists(to_do_list_ids)
+        tasks = list(done_tasks.select_for_update().filter(
+            pk__in=[task_id for task_id, _ in candidates],
+        ).values_list("pk", "title", "to_do_list_id", "done_at"))
+        archived_at = timezone.now()
+        # noinspection PyUnresolvedReferences
+        models.ArchivedTask.objects.bulk_create(
+            models.ArchivedTask(
+                task_id=task_id, title=title, to_do_list_id=to_do_list_id,
+                done_at=done_at, archived_at=archived_at,
+            )
+            for task_id, title, to_do_list_id, done_at in tasks
+        )
+        # Nothing refers to tasks, so this is a single DELETE
+        # noinspection PyUnresolvedReferences
+        models.Task.objects.filter(pk__in=[task[0] for task in tasks]).delete()
+        amounts = collections.Counter(
+            to_do_list_id for _, _, to_do_list_id, _ in tasks
+        )
+        for to_do_list_id, amount in amounts.items():
+            # noinspection PyUnresolvedReferences
+            models.ToDoList.objects.filter(pk=to_do_list_id).bump_version(
+                task_count=F("task_count") - amount,
+                done_count=F("done_count") - amount,
+            )
+            events.publish(
+                events.get_to_do_list_channel(to_do_list_id),
+                events.RESET_EVENT,
+            )
+        # noinspection PyUnresolvedReferences
+        caching.invalidate_after_change(*models.ToDoList.objects.filter(
+            pk__in=to_do_list_ids,
+        ).values_list("owner_id", flat=True).distinct())
+    return len(tasks)
+
+
+def archive_tasks(cutoff, chunk_size):
+    """
+    Archives the tasks done before the cutoff, chunk_size in a transaction,
+    and yields the amount archived by every chunk
+    """
+    while (archived_amount := archive_chunk(cutoff, chunk_size)) is not None:
+        yield archived_amount
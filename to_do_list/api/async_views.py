@@ -0,0 +1,75 @@
+"""
+Coroutine versions of the hottest API views, routed instead of the ones from
+views.py when ASYNC_API_VIEWS is set (see urls.py), and the event stream
+views, which only have coroutine versions.
+
+Django 4.0 has no asynchronous ORM, so the database and cache work of a
+request is done in sync_to_async calls, and only what needs neither (login
+and ownership aside) stays in the event loop: conditional GETs of to-do lists
+are answered from the ETag. Streamed contents are read by the ASGIHandler of
+events.py in the thread of the view, a chunk at a time.
+"""
+from asgiref.sync import sync_to_async
+
+from . import caching, events, view_utils, views
+from .json_encoding import FastJsonResponse
+from .view_utils import (
+    receive_to_do_list, with_json_exceptions_and_required_login
+)
+
+
+@with_json_exceptions_and_required_login
+async def get_to_do_lists(request):
+    etag = view_utils.make_etag(
+        "to_do_lists",
+        await sync_to_async(caching.get_version)(request.user.id),
+    )
+    not_modified_response = view_utils.get_not_modified_response(
+        request, etag,
+    )
+    if not_modified_response is not None:
+        return not_modified_response
+    rows = await sync_to_async(caching.get_to_do_lists)(
+        request, lambda: views.get_to_do_lists_rows(request),
+    )
+    return view_utils.add_etag(FastJsonResponse(rows, safe=False), etag)
+
+
+@with_json_exceptions_and_required_login
+@receive_to_do_list("get", "to_do_list_id")
+async def get_to_do_list_contents(request, to_do_list):
+    etag = view_utils.make_etag(to_do_list.pk, to_do_list.version)
+    not_modified_response = view_utils.get_not_modified_response(
+        request, etag,
+    )
+    if not_modified_response is not None:
+        return not_modified_response
+    response = await sync_to_async(views.make_to_do_list_contents_response)(
+        request, to_do_list,
+    )
+    return view_utils.add_etag(response, etag)
+
+
+@with_json_exceptions_and_required_login
+async def change_task_state(request):
+    [task_id, new_state] = view_utils.validate_post_integers(
+        request, "task_id", "new_state",
+    )
+    view_utils.validate_task_state(new_state)
+    await sync_to_async(views.set_task_state)(request, task_id, new_state)
+    return FastJsonResponse({})
+
+
+@with_json_exceptions_and_required_login
+async def get_to_do_lists_events(request):
+    return events.make_event_stream_response(
+        events.get_to_do_lists_channel(request.user.id),
+    )
+
+
+@with_json_exceptions_and_required_login
+@receive_to_do_list("get", "to_do_list_id")
+async def get_to_do_list_events(_request, to_do_list):
+    return events.make_event_stream_response(
+        events.get_to_do_list_channel(to_do_list.pk),
+    )
@@ -0,0 +1,225 @@
+"""
+Applying many task mutations in one request.
+
+The operations are validated with the same rules as the single-operation
+views, the ownership of every touched task and to-do list is checked with one
+query per model, and then everything is applied in one transaction. Operations
+of the same kind are applied together, in this order: creations, renamings
+and state changes, then reorderings and deletions, in the order they were
+sent, since the positions of reorderings count the tasks deleted before them.
+Consecutive deletions are applied together.
+"""
+import collections
+import http
+import json
+
+from django.db import transaction
+
+from . import caching, events, models, task_ordering, view_utils
+from .view_utils import JsonException
+
+MAX_OPERATIONS = 1000
+
+
+def validate_create(operation):
+    [title] = view_utils.validate_strings(operation, "title")
+    [to_do_list_id] = view_utils.validate_integers(operation, "to_do_list_id")
+    return {"title": title, "to_do_list_id": to_do_list_id}
+
+
+def validate_rename(operation):
+    [new_title] = view_utils.validate_strings(operation, "new_title")
+    [task_id] = view_utils.validate_integers(operation, "task_id")
+    return {"task_id": task_id, "new_title": new_title}
+
+
+def validate_change_state(operation):
+    task_id, new_state = view_utils.validate_integers(
+        operation, "task_id", "new_state",
+    )
+    view_utils.validate_task_state(new_state)
+    return {"task_id": task_id, "new_state": new_state}
+
+
+def validate_reorder(operation):
+    task_id, new_order = view_utils.validate_integers(
+        operation, "task_id", "new_order",
+    )
+    return {"task_id": task_id, "new_order": new_order}
+
+
+def validate_delete(operation):
+    [task_id] = view_utils.validate_integers(operation, "task_id")
+    return {"task_id": task_id}
+
+
+VALIDATORS = {
+    "create": validate_create,
+    "rename": validate_rename,
+    "change_state": validate_change_state,
+    "reorder": validate_reorder,
+    "delete": validate_delete,
+}
+
+
+def validate_operation(operation):
+    if not isinstance(operation, dict):
+        raise JsonException(
+            "operation should be an object!", http.HTTPStatus.BAD_REQUEST,
+        )
+    action = operation.get("action")
+    try:
+        validator = VALIDATORS[action]
+    except (KeyError, TypeError):
+        raise JsonException(
+            f"action should be one of: {', '.join(VALIDATORS)}!",
+            http.HTTPStatus.BAD_REQUEST,
+        ) from None
+    return {"action": action, **validator(operation)}
+
+
+def validate_operations(request):
+    [operations] = view_utils.validate_post_strings(request, "operations")
+    try:
+        operations = json.loads(operations)
+    except ValueError:
+        raise JsonException(
+            "operations is not valid JSON!", http.HTTPStatus.BAD_REQUEST,
+        ) from None
+    if not isinstance(operations, list):
+        raise JsonException(
+            "operations should be an array!", http.HTTPStatus.BAD_REQUEST,
+        )
+    if len(operations) > MAX_OPERATIONS:
+        raise JsonException(
+            f"There can't be more than {MAX_OPERATIONS} operations!",
+            http.HTTPStatus.BAD_REQUEST,
+        )
+    validated_operations = []
+    for operation_number, operation in enumerate(operations):
+        try:
+            validated_operations.append(validate_operation(operation))
+        except JsonException as error:
+            raise JsonException(
+                f"Operation {operation_number}: {error.error_body}",
+                error.status_code,
+            ) from None
+    return validated_operations
+
+
+def apply_operations(request, operations):
+    """Returns the result of every operation, in the same order"""
+    to_do_lists = view_utils.get_owned_objects_or_error(
+        request, models.ToDoList, view_utils.TO_DO_LIST_OWNER_ID_LOOKUP,
+        view_utils.UNACCESSIBLE_TO_DO_LIST_ERROR_TEXT, (
+            operation["to_do_list_id"] for operation in operations
+            if operation["action"] == "create"
+        ),
+    )
+    tasks = view_utils.get_owned_objects_or_error(
+        request, models.Task, view_utils.TASK_OWNER_ID_LOOKUP,
+        view_utils.UNACCESSIBLE_TASK_ERROR_TEXT, (
+            operation["task_id"] for operation in operations
+            if operation["action"] != "create"
+        ),
+    )
+    results = [{} for _ in operations]
+    changed_to_do_list_ids = {
+        *to_do_lists, *(task.to_do_list_id for task in tasks.values()),
+    }
+    with transaction.atomic():
+        # Keeps the changes of other transactions out of the recounting below
+        task_ordering.lock_to_do_lists(changed_to_do_list_ids)
+        create_tasks(operations, results, to_do_lists)
+        update_tasks(operations)
+        deleted_task_ids = []
+        for operation in operations:
+            if operation["action"] == "delete":
+                deleted_task_ids.append(operation["task_id"])
+            elif operation["action"] == "reorder":
+                delete_tasks(deleted_task_ids, tasks)
+                deleted_task_ids = []
+                task = tasks[operation["task_id"]]
+                task_ordering.move_task(task, operation["new_order"])
+                events.publish_task_event(
+                    "moved", task, position=operation["new_order"],
+                )
+        delete_tasks(deleted_task_ids, tasks)
+        # noinspection PyUnresolvedReferences
+        models.ToDoList.objects.filter(
+            pk__in=changed_to_do_list_ids,
+        ).bump_version(**models.get_recounted_task_counters())
+        caching.invalidate_after_change(request.user.id)
+    return results
+
+
+def create_tasks(operations, results, to_do_lists):
+    creations = [
+        (operation_number, operation)
+        for operation_number, operation in enumerate(operations)
+        if operation["action"] == "create"
+    ]
+    amounts_of_new_tasks = collections.Counter(
+        operation["to_do_list_id"] for _, operation in creations
+    )
+    next_orders = {
+        to_do_list_id: task_ordering.allocate_orders(to_do_list_id, amount)
+        for to_do_list_id, amount in amounts_of_new_tasks.items()
+    }
+    new_tasks = []
+    for operation_number, operation in creations:
+        to_do_list_id = operation["to_do_list_id"]
+        new_tasks.append((operation_number, models.Task(
+            title=operation["title"], order=next_orders[to_do_list_id],
+            to_do_list=to_do_lists[to_do_list_id],
+        )))
+        next_orders[to_do_list_id] += task_ordering.ORDER_GAP
+    # noinspection PyUnresolvedReferences
+    models.Task.objects.bulk_create(task for _, task in new_tasks)
+    for operation_number, task in new_tasks:
+        results[operation_number] = {"id": task.pk}
+        events.publish_task_event(
+            "created", task, title=task.title, is_done=task.is_done,
+        )
+
+
+def update_tasks(operations):
+    updated_task_ids = {
+        operation["task_id"] for operation in operations
+        if operation["action"] in ("rename", "change_state")
+    }
+    if not updated_task_ids:
+        return
+    # Loaded again now that their to-do lists are locked, so that the changes
+    # made since the ownership check aren't written over
+    # noinspection PyUnresolvedReferences
+    tasks = models.Task.objects.select_for_update().in_bulk(updated_task_ids)
+    for operation in operations:
+        task = tasks.get(operation.get("task_id"))
+        if task is None or operation["action"] not in (
+            "rename", "change_state",
+        ):
+            # Not updated, or deleted in the meantime
+            continue
+        if operation["action"] == "rename":
+            task.title = operation["new_title"]
+            events.publish_task_event("renamed", task, title=task.title)
+        else:
+            is_done = bool(operation["new_state"])
+            if task.is_done != is_done:
+                task.is_done = is_done
+                task.done_at = models.get_done_at(is_done)
+            events.publish_task_event("toggled", task, is_done=task.is_done)
+    # noinspection PyUnresolvedReferences
+    models.Task.objects.bulk_update(
+        tasks.values(), ["title", "is_done", "done_at"],
+    )
+
+
+def delete_tasks(task_ids, tasks):
+    if not task_ids:
+        return
+    for task_id in task_ids:
+        events.publish_task_event("deleted", tasks[task_id])
+    # noinspection PyUnresolvedReferences
+    models.Task.objects.filter(pk__in=task_ids).delete()
@@ -0,0 +1,115 @@
+"""
+Per-user cache of the serialized to-do lists index.
+
+Every user has a version number in the cache, and the snapshots are stored
+under keys that contain it. Changing a to-do list bumps the version after the
+transaction commits, so snapshots computed from the old data are never read
+again, even if they are stored after the bump. A missing version (never set
+or evicted) starts from the current time, so it never goes back to a value
+that older snapshots might have been stored under.
+
+Only the cache of the process that made a change is invalidated, so the
+processes have to share the cache (see TO_DO_LISTS_CACHE_ALIAS), or else use
+an old index and version for up to TO_DO_LISTS_CACHE_TIMEOUT.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+statistics_lock = threading.Lock()
+statistics = {"hits": 0, "misses": 0}
+
+
+def get_cache():
+    return caches[settings.TO_DO_LISTS_CACHE_ALIAS]
+
+
+def get_version_key(user_id):
+    return f"to_do_lists_version:{user_id}"
+
+
+def add_version(cache, version_key):
+    # Expires like the snapshots, so that processes that don't share the
+    # cache don't keep an old version, and its ETags, forever
+    cache.add(
+        version_key, time.time_ns(),
+        timeout=settings.TO_DO_LISTS_CACHE_TIMEOUT,
+    )
+
+
+def get_version(user_id):
+    cache = get_cache()
+    version_key = get_version_key(user_id)
+    version = cache.get(version_key)
+    if version is None:
+        add_version(cache, version_key)
+        version = cache.get(version_key)
+    return version
+
+
+def invalidate(user_id):
+    cache = get_cache()
+    try:
+        cache.incr(get_version_key(user_id))
+    except ValueError:
+        # There is no version yet, so there are no snapshots to invalidate
+        add_version(cache, get_version_key(user_id))
+
+
+def invalidate_after_change(*user_ids):
+    """Invalidates the users' indexes after a change in a transaction"""
+    for user_id in set(user_ids):
+        if user_id is not None:
+            # Invalidating right away makes the change visible to the rest
+            # of the transaction, and invalidating after the commit drops the
+            # snapshots that were computed from the old data in the meantime
+            invalidate(user_id)
+            transaction.on_commit(lambda user_id=user_id: invalidate(user_id))
+
+
+def count(statistic):
+    with statistics_lock:
+        statistics[statistic] += 1
+
+
+def get_statistics():
+    with statistics_lock:
+        return dict(statistics)
+
+
+def get_snapshot_key(request):
+    user_id = request.user.id
+    parameters_hash = hashlib.md5(
+        request.GET.urlencode().encode()
+    ).hexdigest()
+    return f"to_do_lists:{user_id}:{get_version(user_id)}:{parameters_hash}"
+
+
+def get_snapshot(key):
+    """Returns None on a miss"""
+    snapshot = get_cache().get(key)
+    count("misses" if snapshot is None else "hits")
+    return snapshot
+
+
+def store_snapshot(key, snapshot):
+    get_cache().set(
+        key, snapshot, timeout=settings.TO_DO_LISTS_CACHE_TIMEOUT,
+    )
+
+
+def get_to_do_lists(request, compute):
+    """
+    Returns the cached index of the user's to-do lists for the request's
+    query parameters, computing and storing it with compute() on a miss
+    """
+    key = get_snapshot_key(request)
+    snapshot = get_snapshot(key)
+    if snapshot is None:
+        snapshot = compute()
+        store_snapshot(key, snapshot)
+    return snapshot
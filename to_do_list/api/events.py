@@ -0,0 +1,244 @@
+"""
+Changes of to-do lists, pushed to the open pages over Server-Sent Events.
+
+The mutation views publish small delta events (a task was created, renamed,
+toggled, moved or deleted, a to-do list was created, renamed or deleted)
+when their transaction commits. Tasks' events go to the channel of their
+to-do list, and to-do lists' events to the channel of their owner.
+
+Events are delivered by the broadcaster from the EVENTS_BROADCASTER setting.
+InProcessBroadcaster only reaches the subscribers in the same process, so
+deployments with several ASGI workers need a broadcaster backed by a shared
+message bus (e.g. Redis pub/sub), with the same methods and subscriptions
+like Subscription.
+
+Django 4.0 sends streaming responses synchronously, so event streams are only
+sent by the ASGIHandler from this module, which asgi.py uses. Without
+EVENT_STREAMS (which asgi.py sets) the stream views answer 204, which tells
+EventSource not to reconnect.
+"""
+import asyncio
+import collections
+import contextvars
+import functools
+import http
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers import asgi
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+# Comments that keep idle connections from being closed by proxies
+KEEPALIVE_INTERVAL = 15
+# Events that a slow subscriber can have waiting. After that it gets a
+# "reset" event, which makes the page load the list again
+SUBSCRIPTION_QUEUE_SIZE = 1000
+
+RESET_EVENT = {"type": "reset"}
+
+current_receive = contextvars.ContextVar("current_receive")
+
+
+def get_to_do_list_channel(to_do_list_id):
+    return f"to_do_list:{to_do_list_id}"
+
+
+def get_to_do_lists_channel(user_id):
+    return f"to_do_lists:{user_id}"
+
+
+@functools.lru_cache(maxsize=None)
+def load_broadcaster(path):
+    return import_string(path)()
+
+
+def get_broadcaster():
+    return load_broadcaster(settings.EVENTS_BROADCASTER)
+
+
+def publish(channel, event):
+    """Publishes the event once the current transaction commits"""
+    transaction.on_commit(lambda: get_broadcaster().publish(channel, event))
+
+
+def publish_task_event(event_type, task, **data):
+    publish(get_to_do_list_channel(task.to_do_list_id), {
+        "type": event_type, "id": task.pk, **data,
+    })
+
+
+def publish_to_do_list_event(event_type, to_do_list, **data):
+    publish(get_to_do_lists_channel(to_do_list.owner_id), {
+        "type": event_type, "id": to_do_list.pk, **data,
+    })
+
+
+class Subscription:
+    """
+    Events of a channel for one stream. Created and read in the event loop,
+    while events can be published from any thread
+    """
+
+    def __init__(self, broadcaster, channel):
+        self.broadcaster = broadcaster
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(SUBSCRIPTION_QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event):
+        if self.queue.full():
+            self.overflowed = True
+        else:
+            self.queue.put_nowait(event)
+
+    async def get(self):
+        if self.overflowed:
+            self.overflowed = False
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            return RESET_EVENT
+        return await self.queue.get()
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
+
+
+class InProcessBroadcaster:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = collections.defaultdict(set)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self.lock:
+            self.subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions[subscription.channel]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.channel]
+
+    def publish(self, channel, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.deliver, event,
+                )
+            except RuntimeError:
+                # The loop is closed, so is the stream
+                pass
+
+
+def encode_event(event):
+    return f"data: {json.dumps(event)}\n\n".encode()
+
+
+async def wait_for_disconnection(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+def make_response_start(response):
+    return {
+        "type": "http.response.start",
+        "status": response.status_code,
+        "headers": [
+            (header.encode("ascii"), value.encode("latin1"))
+            for header, value in response.items()
+        ] + [
+            (b"Set-Cookie", cookie.output(header="").encode("ascii").strip())
+            for cookie in response.cookies.values()
+        ],
+    }
+
+
+async def send_streaming_content(response, send):
+    """
+    Sends a streaming response, making every part of its content in the
+    thread of its view, where its rows can be read from the database
+    """
+    await send(make_response_start(response))
+    parts = iter(response)
+    get_next_part = sync_to_async(next, thread_sensitive=True)
+    while (part := await get_next_part(parts, None)) is not None:
+        await send({
+            "type": "http.response.body", "body": part, "more_body": True,
+        })
+    await send({"type": "http.response.body"})
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    """Sent with send_events() by ASGIHandler, until the client leaves"""
+
+    def __init__(self, channel):
+        super().__init__((), content_type="text/event-stream")
+        self.channel = channel
+        self["Cache-Control"] = "no-cache"
+        # Keeps nginx from buffering the events
+        self["X-Accel-Buffering"] = "no"
+
+    async def send_events(self, send, receive):
+        subscription = get_broadcaster().subscribe(self.channel)
+        disconnection = asyncio.ensure_future(wait_for_disconnection(receive))
+        try:
+            await send(make_response_start(self))
+            # Lets EventSource know that the stream is open
+            chunk = b": connected\n\n"
+            while not disconnection.done():
+                await send({
+                    "type": "http.response.body", "body": chunk,
+                    "more_body": True,
+                })
+                getting = asyncio.ensure_future(subscription.get())
+                await asyncio.wait(
+                    {getting, disconnection}, timeout=KEEPALIVE_INTERVAL,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if getting.done():
+                    chunk = encode_event(getting.result())
+                else:
+                    getting.cancel()
+                    chunk = b": keepalive\n\n"
+        finally:
+            disconnection.cancel()
+            subscription.close()
+
+
+def make_event_stream_response(channel):
+    if not settings.EVENT_STREAMS:
+        # Not served by ASGIHandler
+        return HttpResponse(status=http.HTTPStatus.NO_CONTENT)
+    return EventStreamResponse(channel)
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """
+    Django's ASGI handler, which can also send EventStreamResponse, and
+    sends the other streaming responses without blocking the event loop
+    """
+
+    async def handle(self, scope, receive, send):
+        # Every connection is handled in its own task, and so its own context
+        current_receive.set(receive)
+        await super().handle(scope, receive, send)
+
+    async def send_response(self, response, send):
+        if isinstance(response, EventStreamResponse):
+            await response.send_events(send, current_receive.get())
+        elif response.streaming:
+            await send_streaming_content(response, send)
+        else:
+            await super().send_response(response, send)
+            return
+        await sync_to_async(response.close, thread_sensitive=True)()
@@ -0,0 +1,131 @@
+"""
+Full-text search of the titles of a user's tasks and to-do lists.
+
+Every word of the query has to be the beginning of a word of the title, so
+results show up while the query is being typed. Hits are ranked by the length
+of their titles: all of them have all the words, so the shorter the title, the
+more of it the query covers. Pages are given by their offset.
+
+On SQLite the titles are copied to the FTS5 table api_search_index by the
+triggers of the 0010_search_index migration, whichever code changes them.
+The rowids of a user's hits are in their own range (owner_id * OWNER_ROWIDS
+and up), which FTS5 seeks to in the word lists, so only the user's entries
+are read however big the table grows. For the same reason, the words are
+looked up in the index of the prefixes of up to INDEXED_PREFIX_LENGTH
+characters, since longer prefixes are expanded to every matching word of
+every user. Longer words are checked on the titles of the hits of their first
+INDEXED_PREFIX_LENGTH characters, with the diacritics stripped from both like
+the tokenizer strips them, so "resume" finds "résumé".
+
+The rowids are 64-bit integers, so the scheme only holds for owner ids below
+2 ** 26 and task and to-do list ids below 2 ** 36. A bigger owner id
+overflows the rowids computed by the triggers, and a bigger task or to-do
+list id puts its entry in the range of the next owner.
+
+On PostgreSQL the titles are matched by GIN indexes of their tsvectors, from
+the same migration. Those keep the diacritics.
+"""
+import http
+import re
+import unicodedata
+
+from django.db import connection
+
+from .view_utils import JsonException
+
+RESULT_FIELDS = ("type", "id", "title", "to_do_list_id")
+OWNER_ROWIDS = 2 ** 37
+INDEXED_PREFIX_LENGTH = 4
+
+SQLITE_QUERY = """
+    SELECT kind, record_id, title, to_do_list_id FROM api_search_index
+    WHERE api_search_index MATCH %s AND rowid BETWEEN %s AND %s {}
+    ORDER BY length(title), rowid
+    LIMIT %s OFFSET %s
+"""
+POSTGRESQL_QUERY = """
+    WITH search_query AS (SELECT to_tsquery('simple', %s) AS query)
+    SELECT kind, id, title, to_do_list_id FROM (
+        SELECT 'task' AS kind, task.id, task.title, task.to_do_list_id
+        FROM api_task AS task
+        INNER JOIN api_todolist AS to_do_list
+            ON to_do_list.id = task.to_do_list_id
+        CROSS JOIN search_query
+        WHERE to_do_list.owner_id = %s
+            AND to_tsvector('simple', task.title) @@ query
+        UNION ALL
+        SELECT 'to_do_list', to_do_list.id, to_do_list.title, to_do_list.id
+        FROM api_todolist AS to_do_list
+        CROSS JOIN search_query
+        WHERE to_do_list.owner_id = %s
+            AND to_tsvector('simple', to_do_list.title) @@ query
+    ) AS hits
+    ORDER BY length(title), kind DESC, id
+    LIMIT %s OFFSET %s
+"""
+
+
+def get_words(text):
+    """The words of the query, without the syntax of the search engines"""
+    # Composed, so that letters aren't split from their diacritics
+    return re.findall(r"\w+", unicodedata.normalize("NFC", text))
+
+
+def strip_diacritics(text):
+    """
+    Like the remove_diacritics option of the tokenizer, registered as an SQL
+    function on SQLite connections
+    """
+    return "".join(
+        character for character in unicodedata.normalize("NFD", text)
+        if not unicodedata.combining(character)
+    )
+
+
+def make_sqlite_query(user_id, words, limit, offset):
+    terms, title_filters, parameters = [], [], []
+    for word in words:
+        if len(word) > INDEXED_PREFIX_LENGTH:
+            title_filters.append("AND strip_diacritics(title) REGEXP %s")
+            parameters.append(
+                rf"(?i)(?<!\w){re.escape(strip_diacritics(word))}"
+            )
+        terms.append(f'"{word[:INDEXED_PREFIX_LENGTH]}"*')
+    return SQLITE_QUERY.format(" ".join(title_filters)), [
+        " AND ".join(terms),
+        user_id * OWNER_ROWIDS, (user_id + 1) * OWNER_ROWIDS - 1,
+        *parameters, limit, offset,
+    ]
+
+
+def make_postgresql_query(user_id, words, limit, offset):
+    return POSTGRESQL_QUERY, [
+        " & ".join(f"{word}:*" for word in words),
+        user_id, user_id, limit, offset,
+    ]
+
+
+def validate_offset(request):
+    try:
+        offset = int(request.GET.get("after", 0))
+    except ValueError:
+        offset = -1
+    if offset < 0:
+        raise JsonException("after is invalid!", http.HTTPStatus.BAD_REQUEST)
+    return offset
+
+
+def search(user_id, text, limit, offset):
+    """Returns the rows of RESULT_FIELDS of a page of the hits"""
+    words = get_words(text)
+    if not words:
+        return []
+    if connection.vendor == "postgresql":
+        query, parameters = make_postgresql_query(
+            user_id, words, limit, offset,
+        )
+    else:
+        query, parameters = make_sqlite_query(user_id, words, limit, offset)
+    with connection.cursor() as cursor:
+        cursor.execute(query, parameters)
+        return cursor.fetchall()
@@ -0,0 +1,103 @@
+"""
+Fast JSON encoding of the API responses.
+
+FastJsonResponse encodes with the API_JSON_ENCODER setting: "orjson" (used
+when the package is installed, otherwise it falls back to "stdlib"),
+"stdlib" (DjangoJSONEncoder, like JsonResponse) or the import path of a
+function that takes the data and returns bytes. Both built-in encoders give
+the same values for the types DjangoJSONEncoder supports.
+
+Rows, the tuples of a values_list() queryset with their field names, are
+encoded as a list of objects. The dicts are only built while encoding, with
+dict(zip()) like values() builds them, so the speedup is orjson's alone (10k
+tasks in about 4 ms instead of 10 ms, see benchmark_json_encoding). Rows take
+less space in the cache than dicts, though.
+"""
+import functools
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class Rows:
+
+    def __init__(self, fields, rows):
+        self.fields = tuple(fields)
+        self.rows = list(rows)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Rows)
+            and (self.fields, self.rows) == (other.fields, other.rows)
+        )
+
+    def as_dicts(self):
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in self.rows]
+
+
+class StdlibEncoder(DjangoJSONEncoder):
+
+    def default(self, o):
+        if isinstance(o, Rows):
+            return o.as_dicts()
+        return super().default(o)
+
+
+def stdlib_dumps(data):
+    return StdlibEncoder(separators=(",", ":")).encode(data).encode()
+
+
+def orjson_default(value):
+    if isinstance(value, Rows):
+        return value.as_dicts()
+    # Decimals, lazy strings, and dates and times in DjangoJSONEncoder's
+    # format, which differs from orjson's
+    return DjangoJSONEncoder().default(value)
+
+
+def orjson_dumps(data):
+    if orjson is None:
+        return stdlib_dumps(data)
+    return orjson.dumps(
+        data, default=orjson_default,
+        option=orjson.OPT_PASSTHROUGH_DATETIME,
+    )
+
+
+ENCODERS = {
+    "orjson": orjson_dumps,
+    "stdlib": stdlib_dumps,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def load_encoder(name):
+    try:
+        return ENCODERS[name]
+    except KeyError:
+        return import_string(name)
+
+
+def dumps(data):
+    return load_encoder(settings.API_JSON_ENCODER)(data)
+
+
+class FastJsonResponse(HttpResponse):
+    """JsonResponse with the encoder from the settings"""
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the "
+                "safe parameter to False."
+            )
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=dumps(data), **kwargs)
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import archiving
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the tasks done more than AGE days ago to the archive, where "
+        "get_archived_tasks pages through them. Tasks are moved in chunks, "
+        "every chunk in its own transaction, so the to-do lists are only "
+        "locked for a chunk at a time. Meant to be run periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--age", type=float, default=settings.TASK_ARCHIVING_AGE_DAYS,
+            help="days since the tasks were done, TASK_ARCHIVING_AGE_DAYS "
+                 "by default",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=1000,
+            help="amount of tasks moved in a transaction",
+        )
+
+    def handle(self, *args, age, chunk_size, **options):
+        if chunk_size < 1:
+            raise CommandError("--chunk-size should be positive.")
+        if age < 0:
+            raise CommandError("--age can't be negative.")
+        start_time = time.perf_counter()
+        archived_amount = sum(archiving.archive_tasks(
+            archiving.get_archiving_cutoff(age), chunk_size,
+        ))
+        self.stdout.write(
+            f"Archived {archived_amount} tasks in "
+            f"{time.perf_counter() - start_time:.2f} s."
+        )
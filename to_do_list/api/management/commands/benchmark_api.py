@@ -0,0 +1,276 @@
+import itertools
+import json
+import logging
+import platform
+import random
+import statistics
+import time
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.urls import reverse
+
+from api import models, task_ordering
+
+BULK_CREATE_BATCH_SIZE = 10000
+PERCENTILES = (50, 90, 99)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the API endpoints through the test client with a synthetic "
+        "fixture of USERS users with LISTS to-do lists of TASKS tasks each: "
+        "latency percentiles, queries and rows written (by UPDATE, INSERT "
+        "and DELETE) per request. The endpoints are called on a to-do list "
+        "of the first user. Uses a new test database. The results can be "
+        "saved as JSON and compared with the ones of another run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument(
+            "--lists", type=int, default=5, help="to-do lists per user",
+        )
+        parser.add_argument(
+            "--tasks", type=int, default=1000, help="tasks per to-do list",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=100,
+            help="amount of requests to every endpoint",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output", help="file to save the results to, as JSON",
+        )
+        parser.add_argument(
+            "--compare", metavar="BASELINE",
+            help="results saved by --output by a previous run, to compare "
+                 "the latencies with",
+        )
+
+    def handle(
+        self, *args, users, lists, tasks, requests, seed, output, compare,
+        **options
+    ):
+        if min(users, lists, tasks) < 1 or requests < 2:
+            raise CommandError(
+                "There should be at least one user, to-do list and task, and "
+                "two requests."
+            )
+        if requests > tasks:
+            raise CommandError(
+                "--requests can't be more than --tasks, as every delete_task "
+                "request deletes another task."
+            )
+        baseline = None
+        if compare is not None:
+            with open(compare) as baseline_file:
+                baseline = json.load(baseline_file)
+        setup_test_environment()
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        old_database_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False,
+        )
+        try:
+            start_time = time.perf_counter()
+            user, to_do_list = create_fixture(users, lists, tasks)
+            self.stdout.write(
+                f"Created {users} users, {users * lists} to-do lists and "
+                f"{users * lists * tasks} tasks in "
+                f"{time.perf_counter() - start_time:.2f} s."
+            )
+            client = Client()
+            client.force_login(user)
+            endpoints = get_endpoints(to_do_list, random.Random(seed))
+            results = {}
+            for name, make_request in endpoints.items():
+                results[name] = measure(client, make_request, requests)
+                self.write_result(name, results[name], baseline)
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+        if output is not None:
+            with open(output, "w") as output_file:
+                json.dump({
+                    "parameters": {
+                        "users": users, "lists": lists, "tasks": tasks,
+                        "requests": requests, "seed": seed,
+                    },
+                    "environment": {
+                        "database": connection.vendor,
+                        "django": django.get_version(),
+                        "python": platform.python_version(),
+                    },
+                    "results": results,
+                }, output_file, indent=2)
+
+    def write_result(self, name, result, baseline):
+        line = (
+            f"{name}: "
+            + ", ".join(
+                f"p{percentile} {result[f'p{percentile}_ms']:.2f} ms"
+                for percentile in PERCENTILES
+            )
+            + f", {result['queries']:.1f} queries, "
+              f"{result['rows_written']:.1f} rows written"
+        )
+        if result["failures"]:
+            line += f", {result['failures']} failed"
+        baseline_result = (baseline or {}).get("results", {}).get(name)
+        if baseline_result is not None:
+            change = result["p50_ms"] / baseline_result["p50_ms"] - 1
+            style = self.style.ERROR if change > 0.1 else self.style.SUCCESS
+            line += style(f" (p50 {change:+.0%} from the baseline)")
+        self.stdout.write(line)
+
+
+def create_fixture(users_amount, lists_amount, tasks_amount):
+    """Returns the first user and their first to-do list"""
+    User.objects.bulk_create(
+        User(username=f"benchmark_api_{user_number}")
+        for user_number in range(users_amount)
+    )
+    users = list(User.objects.filter(
+        username__startswith="benchmark_api_",
+    ).order_by("pk"))
+    # noinspection PyUnresolvedReferences
+    models.ToDoList.objects.bulk_create(
+        models.ToDoList(
+            title=f"To-do list {list_number}", owner=user,
+            next_order=(tasks_amount + 1) * task_ordering.ORDER_GAP,
+            task_count=tasks_amount, done_count=tasks_amount // 2,
+        )
+        for user in users for list_number in range(lists_amount)
+    )
+    # noinspection PyUnresolvedReferences
+    to_do_list_ids = models.ToDoList.objects.order_by("pk").values_list(
+        "pk", flat=True,
+    )
+    tasks = (
+        # noinspection PyUnresolvedReferences
+        models.Task(
+            title=f"Task {task_number}", is_done=task_number % 2 == 1,
+            order=task_number * task_ordering.ORDER_GAP,
+            to_do_list_id=to_do_list_id,
+        )
+        for to_do_list_id in to_do_list_ids.iterator()
+        for task_number in range(1, tasks_amount + 1)
+    )
+    while batch := list(itertools.islice(tasks, BULK_CREATE_BATCH_SIZE)):
+        # noinspection PyUnresolvedReferences
+        models.Task.objects.bulk_create(batch)
+    return users[0], users[0].todolist_set.order_by("pk").first()
+
+
+def get_endpoints(to_do_list, random_generator):
+    """
+    Returns functions that return the method, URL and data of the next
+    request to every endpoint, in the order they should be measured in
+    """
+    task_ids = list(task_ordering.get_tasks_in_ascending_order(
+        to_do_list,
+    ).values_list("pk", flat=True))
+    contents_url = reverse("api:get_to_do_list_contents", kwargs={
+        "to_do_list_id": to_do_list.pk,
+    })
+    # Deleted tasks are taken from the end
+    random_generator.shuffle(task_ids)
+    task_states = {}
+    created_tasks_amount = itertools.count()
+
+    def change_task_state():
+        task_id = random_generator.choice(task_ids)
+        task_states[task_id] = not task_states.get(task_id, False)
+        return "post", reverse("api:change_task_state"), {
+            "task_id": task_id, "new_state": int(task_states[task_id]),
+        }
+
+    def make_reorder_task(get_position):
+        return lambda: ("post", reverse("api:reorder_task"), {
+            "task_id": random_generator.choice(task_ids),
+            "new_order": get_position(),
+        })
+
+    return {
+        "get_to_do_lists": lambda: (
+            "get", reverse("api:get_to_do_lists"), {},
+        ),
+        "get_to_do_list_contents": lambda: ("get", contents_url, {}),
+        "get_to_do_list_contents (page of 100)": lambda: (
+            "get", contents_url, {"limit": 100},
+        ),
+        "get_to_do_list_contents (open tasks, page of 100)": lambda: (
+            "get", contents_url, {"is_done": 0, "limit": 100},
+        ),
+        "get_to_do_list_contents (ndjson stream)": lambda: (
+            "get", contents_url, {"stream": "ndjson"},
+        ),
+        "search": lambda: ("get", reverse("api:search"), {
+            "q": f"task {random_generator.randint(1, 999)}",
+        }),
+        "create_task": lambda: ("post", reverse("api:create_task"), {
+            "title": f"Created task {next(created_tasks_amount)}",
+            "to_do_list_id": to_do_list.pk,
+        }),
+        "change_task_state": change_task_state,
+        "reorder_task (random position)": make_reorder_task(
+            lambda: random_generator.randint(1, len(task_ids)),
+        ),
+        # Beyond the end of the list, which is clamped to its top
+        "reorder_task (top)": make_reorder_task(lambda: 2 ** 31),
+        # Halves the gap between the same neighbours every time, so the list
+        # is rebalanced every few requests
+        "reorder_task (second from the bottom)": make_reorder_task(
+            lambda: 2,
+        ),
+        "delete_task": lambda: ("post", reverse("api:delete_task"), {
+            "task_id": task_ids.pop(),
+        }),
+    }
+
+
+def measure(client, make_request, requests_amount):
+    durations = []
+    queries_amounts = []
+    rows_written_amounts = []
+    failures = 0
+    for _ in range(requests_amount):
+        method, url, data = make_request()
+        rows_written = 0
+
+        def count_rows_written(execute, sql, params, many, context):
+            nonlocal rows_written
+            result = execute(sql, params, many, context)
+            if sql.lstrip()[:6].upper() != "SELECT":
+                # -1 for statements that don't change rows
+                rows_written += max(context["cursor"].rowcount, 0)
+            return result
+
+        with CaptureQueriesContext(connection) as queries, \
+                connection.execute_wrapper(count_rows_written):
+            start_time = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            durations.append(time.perf_counter() - start_time)
+        if response.status_code != 200:
+            failures += 1
+        queries_amounts.append(len(queries))
+        rows_written_amounts.append(rows_written)
+    percentiles = statistics.quantiles(durations, n=100, method="inclusive")
+    return {
+        **{
+            f"p{percentile}_ms": percentiles[percentile - 1] * 1000
+            for percentile in PERCENTILES
+        },
+        "mean_ms": statistics.mean(durations) * 1000,
+        "max_ms": max(durations) * 1000,
+        "queries": statistics.mean(queries_amounts),
+        "max_queries": max(queries_amounts),
+        "rows_written": statistics.mean(rows_written_amounts),
+        "max_rows_written": max(rows_written_amounts),
+        "failures": failures,
+    }
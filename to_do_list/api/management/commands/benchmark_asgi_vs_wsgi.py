@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from api import models
+
+MODES = {"wsgi": "0", "asgi": "1"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the throughput of the read and toggle API views with many "
+        "concurrent requests: the synchronous views called from a thread per "
+        "client (WSGI) and the coroutine views called from one event loop "
+        "(ASGI). Every mode runs in its own process, as the views are chosen "
+        "when the URLs are loaded, and uses a new test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=MODES, help=(
+            "run only this mode, in this process "
+            "(ASYNC_API_VIEWS should match it)"
+        ))
+        parser.add_argument("--clients", type=int, default=64)
+        parser.add_argument(
+            "--requests", type=int, default=50,
+            help="amount of requests made by every client",
+        )
+
+    def handle(self, *args, mode, clients, requests, **options):
+        if mode is None:
+            for mode, async_api_views in MODES.items():
+                subprocess.run([
+                    sys.executable, sys.argv[0], "benchmark_asgi_vs_wsgi",
+                    "--mode", mode, "--clients", str(clients),
+                    "--requests", str(requests),
+                ], env={
+                    **os.environ, "ASYNC_API_VIEWS": async_api_views,
+                }, check=True)
+            return
+        setup_test_environment()
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        old_database_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False,
+        )
+        try:
+            self.run_mode(mode, clients, requests)
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+
+    def run_mode(self, mode, clients_amount, requests_amount):
+        user = User.objects.create_user("benchmark_asgi_vs_wsgi")
+        # noinspection PyUnresolvedReferences
+        to_do_list = models.ToDoList.objects.create(
+            title="Benchmark", owner=user,
+        )
+        # noinspection PyUnresolvedReferences
+        task = models.Task.objects.create(
+            title="Task", order=1, to_do_list=to_do_list,
+        )
+        requests = get_requests(to_do_list, task)
+        failures = []
+        start_time = time.perf_counter()
+        if mode == "asgi":
+            client = Client()
+            client.force_login(user)
+            asyncio.run(run_async_clients(
+                client.cookies, requests, clients_amount, requests_amount, failures,
+            ))
+        else:
+            threads = [
+                threading.Thread(target=run_client, args=(
+                    user, requests, requests_amount, failures,
+                ))
+                for _ in range(clients_amount)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed_time = time.perf_counter() - start_time
+        requests_amount *= clients_amount
+        self.stdout.write(
+            f"{mode.upper()} (ASYNC_API_VIEWS={settings.ASYNC_API_VIEWS}): "
+            f"{requests_amount} requests from {clients_amount} clients in "
+            f"{elapsed_time:.2f} s ({requests_amount / elapsed_time:.1f} "
+            f"requests/s), {len(failures)} failed"
+        )
+
+
+def get_requests(to_do_list, task):
+    """Returns (method, URL, POST data) of every request, cycled by clients"""
+    return [
+        ("get", reverse("api:get_to_do_lists"), None),
+        ("get", reverse("api:get_to_do_list_contents", kwargs={
+            "to_do_list_id": to_do_list.pk,
+        }), None),
+        ("post", reverse("api:change_task_state"), {
+            "task_id": task.pk, "new_state": 1,
+        }),
+    ]
+
+
+def run_client(user, requests, requests_amount, failures):
+    client = Client()
+    client.force_login(user)
+    try:
+        for request_number in range(requests_amount):
+            method, url, data = requests[request_number % len(requests)]
+            response = getattr(client, method)(url, data)
+            if response.status_code != 200:
+                failures.append(response)
+    finally:
+        connection.close()
+
+
+async def run_async_clients(
+    session_cookies, requests, clients_amount, requests_amount, failures,
+):
+    async def run_async_client():
+        async_client = AsyncClient()
+        async_client.cookies = session_cookies
+        for request_number in range(requests_amount):
+            method, url, data = requests[request_number % len(requests)]
+            if method == "get":
+                response = await async_client.get(url, data)
+            else:
+                # Multipart bodies of AsyncClient can't be read in Django 4.0
+                response = await async_client.post(
+                    url, urlencode(data),
+                    content_type="application/x-www-form-urlencoded",
+                )
+            if response.status_code != 200:
+                failures.append(response)
+
+    await asyncio.gather(*(
+        run_async_client() for _ in range(clients_amount)
+    ))
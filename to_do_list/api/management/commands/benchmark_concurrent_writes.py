@@ -0,0 +1,108 @@
+import logging
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from api import models
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the throughput of concurrent create_task and reorder_task "
+        "requests with SQLite's default settings and with the pragmas and "
+        "the transaction mode from the database OPTIONS. "
+        "Every run uses a new temporary database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument(
+            "--requests", type=int, default=100,
+            help="amount of requests made by every thread",
+        )
+
+    def handle(self, *args, threads, requests, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("This benchmark is for SQLite only.")
+        setup_test_environment()
+        # Failed requests are counted, their tracebacks would only be noise
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        database_settings = connections.settings["default"]
+        original_database_settings = dict(database_settings)
+        tuned_options = database_settings["OPTIONS"]
+        try:
+            for profile_name, profile_options in (
+                ("SQLite defaults", {}),
+                ("Tuned (OPTIONS from the settings)", tuned_options),
+            ):
+                with tempfile.TemporaryDirectory() as directory:
+                    connection.close()
+                    database_settings.update(
+                        NAME=Path(directory) / "benchmark.sqlite3",
+                        OPTIONS=profile_options,
+                    )
+                    call_command("migrate", verbosity=0)
+                    self.run_profile(profile_name, threads, requests)
+                    connection.close()
+        finally:
+            database_settings.update(original_database_settings)
+
+    def run_profile(self, profile_name, threads_amount, requests_amount):
+        user = User.objects.create_user("benchmark_concurrent_writes")
+        # noinspection PyUnresolvedReferences
+        to_do_list = models.ToDoList.objects.create(
+            title="Benchmark", owner=user,
+        )
+        failures = []
+        threads = [
+            threading.Thread(target=self.work, args=(
+                user, to_do_list, requests_amount, failures,
+            ))
+            for _ in range(threads_amount)
+        ]
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed_time = time.perf_counter() - start_time
+        requests_amount *= threads_amount
+        self.stdout.write(
+            f"{profile_name}: {requests_amount} requests in "
+            f"{elapsed_time:.2f} s ({requests_amount / elapsed_time:.1f} "
+            f"requests/s), {len(failures)} failed"
+        )
+
+    @staticmethod
+    def work(user, to_do_list, requests_amount, failures):
+        client = Client()
+        client.force_login(user)
+        task_ids = []
+        try:
+            for request_number in range(requests_amount):
+                try:
+                    if request_number % 2 == 0 or not task_ids:
+                        response = client.post(reverse("api:create_task"), {
+                            "title": f"Task {request_number}",
+                            "to_do_list_id": to_do_list.pk,
+                        })
+                        task_ids.append(response.json()["id"])
+                    else:
+                        client.post(reverse("api:reorder_task"), {
+                            "task_id": random.choice(task_ids),
+                            "new_order": random.randint(1, len(task_ids)),
+                        })
+                except OperationalError as error:
+                    failures.append(error)
+        finally:
+            connection.close()
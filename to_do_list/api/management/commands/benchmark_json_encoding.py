@@ -0,0 +1,75 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse
+from django.test import override_settings
+
+from api import json_encoding, views
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the time to build the response of a to-do list's contents: "
+        "JsonResponse with the dicts of values(), which the API used before, "
+        "and FastJsonResponse with the rows of values_list() and every "
+        "encoder. Needs no database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tasks", type=int, default=10000,
+            help="amount of tasks in the response",
+        )
+        parser.add_argument(
+            "--repetitions", type=int, default=50,
+            help="amount of responses built by every encoder",
+        )
+
+    def handle(self, *args, tasks, repetitions, **options):
+        fields = views.TASK_FIELDS
+        rows = [
+            (task_id, f"Task number {task_id} ✓", task_id % 3 == 0,
+             task_id << 16)
+            for task_id in range(1, tasks + 1)
+        ]
+
+        def build_json_response():
+            return JsonResponse(
+                [dict(zip(fields, row)) for row in rows], safe=False,
+            )
+
+        def build_fast_json_response():
+            return json_encoding.FastJsonResponse(
+                json_encoding.Rows(fields, rows), safe=False,
+            )
+
+        candidates = [
+            ("JsonResponse, values() dicts", "stdlib", build_json_response),
+        ] + [
+            (
+                f"FastJsonResponse ({encoder}), values_list() rows", encoder,
+                build_fast_json_response,
+            )
+            for encoder in json_encoding.ENCODERS
+        ]
+        if json_encoding.orjson is None:
+            self.stdout.write("orjson isn't installed, stdlib is used instead.")
+        contents = []
+        for name, encoder, build_response in candidates:
+            with override_settings(API_JSON_ENCODER=encoder):
+                # The first response warms the caches up
+                contents.append(json.loads(build_response().content))
+                durations = []
+                for _ in range(repetitions):
+                    start_time = time.perf_counter()
+                    build_response()
+                    durations.append(time.perf_counter() - start_time)
+            self.stdout.write(
+                f"{name}: median "
+                f"{statistics.median(durations) * 1000:.2f} ms, "
+                f"mean {statistics.mean(durations) * 1000:.2f} ms"
+            )
+        if any(content != contents[0] for content in contents):
+            self.stderr.write("The responses have different contents.")
@@ -0,0 +1,98 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+
+from api import models
+
+# MIDDLEWARE before PageMiddleware, where every request went through all of
+# it
+UNSCOPED_MIDDLEWARE = [
+    "django.middleware.security.SecurityMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "htmlmin.middleware.HtmlMinifyMiddleware",
+    "htmlmin.middleware.MarkRequestMiddleware",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the time per request of an API endpoint and of the pages "
+        "with the settings, and with the previous setup: unscoped middleware "
+        "and pages minified on every request. Uses a new test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=200,
+            help="amount of requests to every URL",
+        )
+
+    def handle(self, *args, requests, **options):
+        setup_test_environment()
+        old_database_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False,
+        )
+        try:
+            user = User.objects.create_user("benchmark_middleware")
+            # noinspection PyUnresolvedReferences
+            to_do_list = models.ToDoList.objects.create(
+                title="Benchmark", owner=user,
+            )
+            urls = {
+                "API": reverse("api:get_to_do_lists"),
+                "index page": reverse("index"),
+                "to-do list page": reverse(
+                    "to_do_list:view", args=(to_do_list.pk,),
+                ),
+            }
+            for profile_name, profile_settings in (
+                (
+                    "Unscoped middleware, no minified pages cache", {
+                        "MIDDLEWARE": UNSCOPED_MIDDLEWARE,
+                        "CACHES": {
+                            **settings.CACHES, "benchmark_dummy": {
+                                "BACKEND": "django.core.cache.backends."
+                                           "dummy.DummyCache",
+                            },
+                        },
+                        "MINIFIED_PAGES_CACHE_ALIAS": "benchmark_dummy",
+                    },
+                ),
+                ("Settings", {}),
+            ):
+                with override_settings(**profile_settings):
+                    client = Client()
+                    client.force_login(user)
+                    for url_name, url in urls.items():
+                        durations = self.measure(client, url, requests)
+                        self.stdout.write(
+                            f"{profile_name}, {url_name}: median "
+                            f"{statistics.median(durations) * 1000:.2f} ms, "
+                            f"mean {statistics.mean(durations) * 1000:.2f} ms"
+                        )
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+
+    @staticmethod
+    def measure(client, url, requests_amount):
+        """Returns the duration of every request after the first one"""
+        # The first request fills the caches
+        client.get(url)
+        durations = []
+        for _ in range(requests_amount):
+            start_time = time.perf_counter()
+            client.get(url)
+            durations.append(time.perf_counter() - start_time)
+        return durations
@@ -0,0 +1,104 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.urls import reverse
+
+from api import models
+from authentication.backends import users_cache
+
+SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+AUTHENTICATION_BACKENDS = {
+    "ModelBackend": "django.contrib.auth.backends.ModelBackend",
+    "CachedModelBackend": "authentication.backends.CachedModelBackend",
+}
+# The tables read by SessionMiddleware and AuthenticationMiddleware
+AUTHENTICATION_TABLES = ("django_session", "auth_user")
+
+
+class Command(BaseCommand):
+    help = (
+        "Counts the queries per request of the API endpoints with every "
+        "session engine and authentication backend, and how many of them "
+        "are made to load the session and the user. Uses a new test "
+        "database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=20,
+            help="amount of requests to every endpoint",
+        )
+
+    def handle(self, *args, requests, **options):
+        setup_test_environment()
+        old_database_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False,
+        )
+        try:
+            user = User.objects.create_user("benchmark_session_queries")
+            # noinspection PyUnresolvedReferences
+            to_do_list = models.ToDoList.objects.create(
+                title="Benchmark", owner=user,
+            )
+            # noinspection PyUnresolvedReferences
+            task = models.Task.objects.create(
+                title="Task", order=1, to_do_list=to_do_list,
+            )
+            for session_engine_name, session_engine in SESSION_ENGINES.items():
+                for backend_name, backend in AUTHENTICATION_BACKENDS.items():
+                    with override_settings(
+                        SESSION_ENGINE=session_engine,
+                        AUTHENTICATION_BACKENDS=[backend],
+                    ):
+                        queries, authentication_queries = self.count_queries(
+                            user, to_do_list, task, requests,
+                        )
+                    self.stdout.write(
+                        f"{session_engine_name} sessions, {backend_name}: "
+                        f"{queries:.2f} queries per request, "
+                        f"{authentication_queries:.2f} of them for the "
+                        f"session and the user"
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_database_name, verbosity=0)
+
+    @staticmethod
+    def count_queries(user, to_do_list, task, requests_amount):
+        """Returns the average amounts of all and authentication queries"""
+        users_cache.clear()
+        client = Client()
+        client.force_login(user)
+        requests = [
+            lambda: client.get(reverse("api:get_to_do_lists")),
+            lambda: client.get(reverse(
+                "api:get_to_do_list_contents", args=(to_do_list.pk,),
+            )),
+            lambda: client.post(reverse("api:change_task_state"), {
+                "task_id": task.pk, "new_state": 1,
+            }),
+            lambda: client.post(reverse("api:rename_task"), {
+                "task_id": task.pk, "new_title": "Task",
+            }),
+        ]
+        # The first requests fill the caches
+        for request in requests:
+            request()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(requests_amount):
+                for request in requests:
+                    request()
+        authentication_queries = [
+            query for query in queries
+            if any(table in query["sql"] for table in AUTHENTICATION_TABLES)
+        ]
+        requests_amount *= len(requests)
+        return (
+            len(queries) / requests_amount,
+            len(authentication_queries) / requests_amount,
+        )
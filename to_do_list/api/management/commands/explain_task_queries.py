@@ -0,0 +1,87 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api import models, task_ordering
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints the query plans of the hot task queries with and without the "
+        "(to_do_list, order) index. Everything is done inside a transaction "
+        "that is rolled back, so the database is left untouched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tasks", type=int, default=10000,
+            help="amount of tasks in the synthetic to-do list",
+        )
+
+    def handle(self, *args, tasks, **options):
+        with transaction.atomic():
+            to_do_list = self.make_synthetic_to_do_list(tasks)
+            self.print_plans("With the index", to_do_list)
+            index, = (
+                index for index in models.Task._meta.indexes
+                if index.name == "task_list_order_idx"
+            )
+            # The schema editor isn't entered as a context manager, because
+            # SQLite doesn't allow that inside of a transaction
+            with connection.cursor() as cursor:
+                cursor.execute(str(index.remove_sql(
+                    models.Task, connection.schema_editor(),
+                )))
+            self.print_plans("Without the index", to_do_list)
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def make_synthetic_to_do_list(tasks_amount):
+        owner = User.objects.create_user("explain_task_queries")
+        # noinspection PyUnresolvedReferences
+        to_do_list = models.ToDoList.objects.create(
+            title="Synthetic to-do list", owner=owner,
+        )
+        # noinspection PyUnresolvedReferences
+        models.Task.objects.bulk_create(
+            models.Task(
+                title=f"Task {task_number}", to_do_list=to_do_list,
+                order=task_number * task_ordering.ORDER_GAP,
+            )
+            for task_number in range(1, tasks_amount + 1)
+        )
+        return to_do_list
+
+    def print_plans(self, heading, to_do_list):
+        self.stdout.write(self.style.MIGRATE_HEADING(heading))
+        ascending_tasks = task_ordering.get_tasks_in_ascending_order(
+            to_do_list
+        )
+        querysets = {
+            "get_to_do_list_contents": to_do_list.task_set.all(),
+            "move_task (neighbours)": ascending_tasks.values_list(
+                "order", flat=True,
+            )[100:102],
+            "rebalance": ascending_tasks.only("order"),
+        }
+        for name, queryset in querysets.items():
+            self.stdout.write(f"  {name}:")
+            for line in self.explain(queryset, heading):
+                self.stdout.write(f"    {line}")
+
+    @staticmethod
+    def explain(queryset, tag):
+        # QuerySet.explain() can't be used twice for the same query: SQLite
+        # would reuse the cached statement and print the plan that was made
+        # before the index was dropped. The comment makes the statements
+        # differ
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"{connection.ops.explain_query_prefix()} {sql} -- {tag}",
+                params,
+            )
+            return [
+                " ".join(str(column) for column in row)
+                for row in cursor.fetchall()
+            ]
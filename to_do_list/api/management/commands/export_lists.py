@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import models, transfer
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports to-do lists and their tasks as NDJSON (see api.transfer), "
+        "for import_lists. Exports every to-do list, unless users or to-do "
+        "lists are given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", default="-",
+            help="file to write to, stdout by default",
+        )
+        parser.add_argument(
+            "--gzip", action="store_true",
+            help="compress the output, the default for files ending in .gz",
+        )
+        parser.add_argument(
+            "--user", action="append", default=[], dest="usernames",
+            help="export the to-do lists of this user, can be repeated",
+        )
+        parser.add_argument(
+            "--list", action="append", default=[], type=int,
+            dest="to_do_list_ids",
+            help="export the to-do list with this id, can be repeated",
+        )
+
+    def handle(
+        self, *args, output, gzip, usernames, to_do_list_ids, **options
+    ):
+        # noinspection PyUnresolvedReferences
+        to_do_lists = models.ToDoList.objects.all()
+        if usernames or to_do_list_ids:
+            to_do_lists = (
+                to_do_lists.filter(owner__username__in=usernames)
+                | to_do_lists.filter(pk__in=to_do_list_ids)
+            )
+        start_time = time.perf_counter()
+        lines_amount = 0
+        try:
+            with transfer.open_output(
+                output, gzip or output.endswith(".gz"),
+            ) as output_file:
+                for line in transfer.generate_records(to_do_lists):
+                    output_file.write(line)
+                    lines_amount += 1
+        except OSError as error:
+            raise CommandError(error)
+        elapsed_time = time.perf_counter() - start_time
+        # The statistics don't go into the exported lines
+        (self.stderr if output == "-" else self.stdout).write(
+            f"Exported {lines_amount} lines in {elapsed_time:.2f} s "
+            f"({lines_amount / max(elapsed_time, 1e-9):.0f} lines/s)."
+        )
@@ -0,0 +1,63 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api import transfer
+
+PROGRESS_INTERVAL = 100_000
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports the to-do lists and tasks exported by export_lists, as new "
+        "to-do lists of the users with the exported usernames. Tasks are "
+        "saved in chunks, every chunk in its own transaction, so a failed "
+        "import keeps what was imported before the failure."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "input_path", nargs="?", default="-", metavar="input",
+            help="file to read, gzipped or not, stdin by default",
+        )
+        parser.add_argument(
+            "--owner",
+            help="username of the owner of all imported to-do lists",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=5000,
+            help="amount of tasks saved at a time",
+        )
+
+    def handle(self, *args, input_path, owner, chunk_size, **options):
+        if chunk_size < 1:
+            raise CommandError("--chunk-size should be positive.")
+        if owner is not None:
+            try:
+                owner = User.objects.get(username=owner)
+            except User.DoesNotExist:
+                raise CommandError(f"User {owner!r} doesn't exist.")
+        importer = transfer.Importer(chunk_size, owner)
+        start_time = time.perf_counter()
+        try:
+            with transfer.open_input(input_path) as input_file:
+                for line_number, line in enumerate(input_file, start=1):
+                    if line.strip():
+                        importer.import_line(line, line_number)
+                    if line_number % PROGRESS_INTERVAL == 0:
+                        self.report(importer, start_time)
+            importer.finish()
+        except OSError as error:
+            raise CommandError(error)
+        finally:
+            self.report(importer, start_time)
+
+    def report(self, importer, start_time):
+        elapsed_time = time.perf_counter() - start_time
+        self.stdout.write(
+            f"Imported {importer.to_do_lists_amount} to-do lists and "
+            f"{importer.tasks_amount} tasks in {elapsed_time:.2f} s "
+            f"({importer.tasks_amount / max(elapsed_time, 1e-9):.0f} "
+            f"tasks/s)."
+        )
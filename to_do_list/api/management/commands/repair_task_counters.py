@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from api import caching, models
+
+
+class Command(BaseCommand):
+    help = (
+        "Finds the to-do lists whose task_count or done_count don't match "
+        "their tasks and recounts them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="only report the to-do lists with wrong counters",
+        )
+
+    def handle(self, *args, dry_run, **options):
+        with transaction.atomic():
+            # noinspection PyUnresolvedReferences
+            wrong_to_do_lists = list(models.ToDoList.objects.annotate(
+                real_task_count=Count("task"),
+                real_done_count=Count("task", filter=Q(task__is_done=True)),
+            ).exclude(
+                task_count=F("real_task_count"),
+                done_count=F("real_done_count"),
+            ).values_list("pk", "owner_id"))
+            if wrong_to_do_lists and not dry_run:
+                # noinspection PyUnresolvedReferences
+                models.ToDoList.objects.filter(pk__in=[
+                    to_do_list_id for to_do_list_id, _ in wrong_to_do_lists
+                ]).bump_version(**models.get_recounted_task_counters())
+                caching.invalidate_after_change(*(
+                    owner_id for _, owner_id in wrong_to_do_lists
+                ))
+        self.stdout.write(
+            f"{len(wrong_to_do_lists)} to-do lists had wrong counters"
+            + ("." if dry_run else ", they were recounted.")
+        )
@@ -0,0 +1,68 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the tests against a throwaway PostgreSQL server: creates a "
+        "cluster in a temporary directory with initdb, starts it on a Unix "
+        "socket there, runs manage.py test with DATABASE_BACKEND=postgresql "
+        "and removes the cluster. Needs the PostgreSQL server binaries and "
+        "psycopg2, and like PostgreSQL itself can't be run as root."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "test_labels", nargs="*",
+            help="passed on to manage.py test",
+        )
+        parser.add_argument(
+            "--bin-dir",
+            help="directory of initdb and pg_ctl, looked up in PATH by "
+                 "default",
+        )
+
+    def handle(self, *args, test_labels, bin_dir, **options):
+        initdb, pg_ctl = (
+            shutil.which(program, path=bin_dir)
+            for program in ("initdb", "pg_ctl")
+        )
+        if initdb is None or pg_ctl is None:
+            raise CommandError(
+                "initdb and pg_ctl weren't found, pass --bin-dir."
+            )
+        with tempfile.TemporaryDirectory(prefix="to_do_list_pg_") as root:
+            data_directory = os.path.join(root, "data")
+            subprocess.run([
+                initdb, "--pgdata", data_directory, "--username", "postgres",
+                "--auth", "trust", "--no-sync",
+            ], stdout=subprocess.DEVNULL, check=True)
+            subprocess.run([
+                pg_ctl, "start", "--pgdata", data_directory, "--wait",
+                "--log", os.path.join(root, "server.log"),
+                # Only the socket, so that the port can't be taken
+                "--options", f"-k {root} -c listen_addresses='' -F",
+            ], stdout=subprocess.DEVNULL, check=True)
+            try:
+                result = subprocess.run([
+                    sys.executable, sys.argv[0], "test", "--noinput",
+                    *test_labels,
+                ], env={
+                    **os.environ, "DATABASE_BACKEND": "postgresql",
+                    "POSTGRES_HOST": root, "POSTGRES_USER": "postgres",
+                    "POSTGRES_PASSWORD": "", "POSTGRES_PORT": "",
+                })
+            finally:
+                subprocess.run([
+                    pg_ctl, "stop", "--pgdata", data_directory, "--wait",
+                    "--mode", "fast",
+                ], stdout=subprocess.DEVNULL, check=True)
+        if result.returncode:
+            raise CommandError(
+                "The tests failed.", returncode=result.returncode,
+            )
@@ -0,0 +1,30 @@
+# Generated by Django 4.0.3 on 2026-10-18 14:47
+
+from django.db import migrations, models
+from django.db.models import F
+
+TASK_ORDER_GAP = 2 ** 16
+
+
+def spread_orders(apps, schema_editor):
+    # Dense orders would have no room between neighbours, so the first move
+    # in every to-do list would renumber all of its tasks. The next_order
+    # counters of 0007_todolist_next_order start above the spread orders
+    Task = apps.get_model('api', 'Task')
+    Task.objects.update(order=F('order') * TASK_ORDER_GAP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_alter_task_options_alter_task_is_done'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='order',
+            field=models.BigIntegerField(),
+        ),
+        migrations.RunPython(spread_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.3 on 2026-10-18 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_alter_task_order'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['to_do_list', 'order'], name='task_list_order_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-18 14:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_task_list_order_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todolist',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
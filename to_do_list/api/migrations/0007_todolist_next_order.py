@@ -0,0 +1,38 @@
+# Generated by Django 4.0.3 on 2026-10-18 14:56
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+TASK_ORDER_GAP = 2 ** 16
+
+
+def initialize_next_orders(apps, schema_editor):
+    ToDoList = apps.get_model('api', 'ToDoList')
+    Task = apps.get_model('api', 'Task')
+    highest_orders = Task.objects.filter(
+        to_do_list=OuterRef('pk'),
+    ).values('to_do_list').annotate(highest_order=Max('order')).values(
+        'highest_order',
+    )
+    ToDoList.objects.update(next_order=Coalesce(
+        Subquery(highest_orders), 0,
+    ) + TASK_ORDER_GAP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_todolist_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todolist',
+            name='next_order',
+            field=models.BigIntegerField(default=65536),
+        ),
+        migrations.RunPython(
+            initialize_next_orders, migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.0.3 on 2026-10-18 15:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def initialize_task_counters(apps, schema_editor):
+    ToDoList = apps.get_model('api', 'ToDoList')
+    Task = apps.get_model('api', 'Task')
+
+    def count_tasks(**filters):
+        return Coalesce(Subquery(
+            Task.objects.filter(
+                to_do_list=OuterRef('pk'), **filters,
+            ).order_by().values('to_do_list').annotate(
+                amount=Count('pk'),
+            ).values('amount')
+        ), 0)
+
+    ToDoList.objects.update(
+        task_count=count_tasks(), done_count=count_tasks(is_done=True),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_todolist_next_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todolist',
+            name='done_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='todolist',
+            name='task_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(
+            initialize_task_counters, migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.3 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_todolist_task_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['is_done', 'id'], name='task_done_id_idx'),
+        ),
+    ]
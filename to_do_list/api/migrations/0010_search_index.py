@@ -0,0 +1,170 @@
+from django.db import migrations
+
+# SQLite: an FTS5 table with the titles of tasks and to-do lists, kept in sync
+# by triggers. Rowids are grouped by owner (see api/full_text_search.py):
+# owner_id * 2 ** 37 + id * 2, plus 1 for to-do lists, which only holds for
+# owner ids below 2 ** 26 and ids below 2 ** 36
+OWNER_ROWIDS = 2 ** 37
+
+SQLITE_INDEX_COLUMNS = "rowid, title, kind, record_id, to_do_list_id"
+
+
+def make_sqlite_task_row(row, owner_id):
+    return (
+        f"{owner_id} * {OWNER_ROWIDS} + {row}.id * 2, {row}.title, 'task', "
+        f"{row}.id, {row}.to_do_list_id"
+    )
+
+
+def make_sqlite_to_do_list_row(row):
+    return (
+        f"{row}.owner_id * {OWNER_ROWIDS} + {row}.id * 2 + 1, {row}.title, "
+        f"'to_do_list', {row}.id, {row}.id"
+    )
+
+
+def make_sqlite_task_insertion(row):
+    return f"""
+        INSERT INTO api_search_index ({SQLITE_INDEX_COLUMNS})
+        SELECT {make_sqlite_task_row(row, 'api_todolist.owner_id')}
+        FROM api_todolist WHERE api_todolist.id = {row}.to_do_list_id;
+    """
+
+
+def make_sqlite_task_deletion(row):
+    return f"""
+        DELETE FROM api_search_index WHERE rowid = (
+            SELECT owner_id * {OWNER_ROWIDS} + {row}.id * 2
+            FROM api_todolist WHERE id = {row}.to_do_list_id
+        );
+    """
+
+
+def make_sqlite_to_do_list_tasks_deletion(condition=""):
+    return f"""
+        DELETE FROM api_search_index WHERE {condition} rowid IN (
+            SELECT OLD.owner_id * {OWNER_ROWIDS} + id * 2
+            FROM api_task WHERE to_do_list_id = OLD.id
+        );
+    """
+
+
+SQLITE_CREATION = [
+    """
+    CREATE VIRTUAL TABLE api_search_index USING fts5(
+        title, kind UNINDEXED, record_id UNINDEXED, to_do_list_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3 4'
+    )
+    """,
+    f"""
+    INSERT INTO api_search_index ({SQLITE_INDEX_COLUMNS})
+    SELECT {make_sqlite_task_row('api_task', 'api_todolist.owner_id')}
+    FROM api_task
+    INNER JOIN api_todolist ON api_todolist.id = api_task.to_do_list_id
+    """,
+    f"""
+    INSERT INTO api_search_index ({SQLITE_INDEX_COLUMNS})
+    SELECT {make_sqlite_to_do_list_row('api_todolist')} FROM api_todolist
+    """,
+    f"""
+    CREATE TRIGGER api_task_search_insert AFTER INSERT ON api_task BEGIN
+        {make_sqlite_task_insertion('NEW')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER api_task_search_update
+    AFTER UPDATE OF title, to_do_list_id ON api_task BEGIN
+        {make_sqlite_task_deletion('OLD')}
+        {make_sqlite_task_insertion('NEW')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER api_task_search_delete AFTER DELETE ON api_task BEGIN
+        {make_sqlite_task_deletion('OLD')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER api_todolist_search_insert
+    AFTER INSERT ON api_todolist BEGIN
+        INSERT INTO api_search_index ({SQLITE_INDEX_COLUMNS})
+        VALUES ({make_sqlite_to_do_list_row('NEW')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER api_todolist_search_update
+    AFTER UPDATE OF title, owner_id ON api_todolist BEGIN
+        DELETE FROM api_search_index
+        WHERE rowid = OLD.owner_id * {OWNER_ROWIDS} + OLD.id * 2 + 1;
+        INSERT INTO api_search_index ({SQLITE_INDEX_COLUMNS})
+        VALUES ({make_sqlite_to_do_list_row('NEW')});
+        -- The tasks move to the rowids of the new owner
+        {make_sqlite_to_do_list_tasks_deletion(
+            'NEW.owner_id != OLD.owner_id AND'
+        )}
+        INSERT INTO api_search_index ({SQLITE_INDEX_COLUMNS})
+        SELECT {make_sqlite_task_row('api_task', 'NEW.owner_id')}
+        FROM api_task
+        WHERE NEW.owner_id != OLD.owner_id AND to_do_list_id = NEW.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER api_todolist_search_delete
+    AFTER DELETE ON api_todolist BEGIN
+        DELETE FROM api_search_index
+        WHERE rowid = OLD.owner_id * {OWNER_ROWIDS} + OLD.id * 2 + 1;
+        -- Django deletes the tasks first, unless the rows are deleted
+        -- directly
+        {make_sqlite_to_do_list_tasks_deletion()}
+    END
+    """,
+]
+SQLITE_DELETION = [
+    f"DROP TRIGGER {trigger}"
+    for trigger in (
+        "api_task_search_insert", "api_task_search_update",
+        "api_task_search_delete", "api_todolist_search_insert",
+        "api_todolist_search_update", "api_todolist_search_delete",
+    )
+] + ["DROP TABLE api_search_index"]
+
+# PostgreSQL: the titles are matched by expression indexes, which are always
+# up to date
+POSTGRESQL_CREATION = [
+    "CREATE INDEX api_task_title_search_idx ON api_task "
+    "USING gin (to_tsvector('simple', title))",
+    "CREATE INDEX api_todolist_title_search_idx ON api_todolist "
+    "USING gin (to_tsvector('simple', title))",
+]
+POSTGRESQL_DELETION = [
+    "DROP INDEX api_task_title_search_idx",
+    "DROP INDEX api_todolist_title_search_idx",
+]
+
+
+def run_statements(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(
+            schema_editor.connection.vendor, (),
+        ):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_task_done_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_statements({
+                'sqlite': SQLITE_CREATION,
+                'postgresql': POSTGRESQL_CREATION,
+            }),
+            run_statements({
+                'sqlite': SQLITE_DELETION,
+                'postgresql': POSTGRESQL_DELETION,
+            }),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.3 on 2026-10-18 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_done', False)), fields=['to_do_list', 'order'], name='task_open_list_order_idx'),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 4.0.3 on 2026-10-18 15:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def make_done_at_field():
+    field = models.DateTimeField(blank=True, null=True)
+    field.set_attributes_from_name('done_at')
+    return field
+
+
+def add_done_at(apps, schema_editor):
+    Task = apps.get_model('api', 'Task')
+    field = make_done_at_field()
+    if schema_editor.connection.vendor != 'sqlite':
+        schema_editor.add_field(Task, field)
+        return
+    # Django 4.0 remakes the table to add a column on SQLite, which drops the
+    # search triggers of 0010_search_index
+    definition, parameters = schema_editor.column_sql(Task, field)
+    schema_editor.execute(
+        f'ALTER TABLE {schema_editor.quote_name(Task._meta.db_table)} '
+        f'ADD COLUMN {schema_editor.quote_name(field.column)} {definition}',
+        parameters,
+    )
+
+
+def remove_done_at(apps, schema_editor):
+    Task = apps.get_model('api', 'Task')
+    field = make_done_at_field()
+    if schema_editor.connection.vendor != 'sqlite':
+        schema_editor.remove_field(Task, field)
+        return
+    schema_editor.execute(
+        f'ALTER TABLE {schema_editor.quote_name(Task._meta.db_table)} '
+        f'DROP COLUMN {schema_editor.quote_name(field.column)}'
+    )
+
+
+def initialize_done_at(apps, schema_editor):
+    # When they were done isn't known, so they are archived counting from now
+    Task = apps.get_model('api', 'Task')
+    Task.objects.filter(is_done=True).update(
+        done_at=django.utils.timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_task_open_list_order_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField()),
+                ('title', models.TextField()),
+                ('done_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-pk'],
+            },
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_done_at, remove_done_at),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='task',
+                    name='done_at',
+                    field=models.DateTimeField(blank=True, null=True),
+                ),
+            ],
+        ),
+        migrations.RunPython(initialize_done_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('done_at__isnull', False)), fields=['done_at'], name='task_done_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='to_do_list',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.todolist'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtask',
+            index=models.Index(fields=['to_do_list', 'id'], name='archived_task_list_id_idx'),
+        ),
+    ]
@@ -1,10 +1,69 @@
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# The distance between the orders of neighbouring tasks, see task_ordering
+TASK_ORDER_GAP = 2 ** 16
+
+
+class ToDoListQuerySet(models.QuerySet):
+
+    def bump_version(self, **changes):
+        """Also sets the fields in changes, with the same UPDATE"""
+        return self.update(version=models.F("version") + 1, **changes)
+
+
+def count_tasks(**filters):
+    """An expression with the amount of the to-do list's tasks"""
+    # noinspection PyUnresolvedReferences
+    return Coalesce(models.Subquery(
+        Task.objects.filter(
+            to_do_list=models.OuterRef("pk"), **filters,
+        ).order_by().values("to_do_list").annotate(
+            amount=models.Count("pk"),
+        ).values("amount")
+    ), 0)
+
+
+def get_recounted_task_counters():
+    """
+    Changes for bump_version() that recount the tasks of every to-do list
+    """
+    return {
+        "task_count": count_tasks(),
+        "done_count": count_tasks(is_done=True),
+    }
+
+
+def get_done_at(is_done):
+    """The done_at of a task that is changed to the state"""
+    return timezone.now() if is_done else None
 
 
 class ToDoList(models.Model):
     title = models.TextField()
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Increased on every change of the tasks of the list
+    version = models.PositiveBigIntegerField(default=0)
+    # The order of the next task created on the top, see task_ordering
+    next_order = models.BigIntegerField(default=TASK_ORDER_GAP)
+    # Denormalized amounts of all and done tasks, changed with the version.
+    # repair_task_counters fixes them
+    task_count = models.IntegerField(default=0)
+    done_count = models.IntegerField(default=0)
+
+    objects = ToDoListQuerySet.as_manager()
+
+    loaded_owner_id = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered to be able to tell the previous owner that the list is
+        # gone from them
+        instance.loaded_owner_id = instance.__dict__.get("owner_id")
+        return instance
 
     def __str__(self):
         return self.title
@@ -16,7 +75,11 @@ class ToDoList(models.Model):
 class Task(models.Model):
     title = models.TextField()
     is_done = models.BooleanField(default=False)
-    order = models.IntegerField()
+    # When the task was marked as done, None if it isn't done. Tasks done long
+    # enough ago are moved to ArchivedTask by archive_tasks
+    done_at = models.DateTimeField(null=True, blank=True)
+    # Sparse, see task_ordering
+    order = models.BigIntegerField()
     to_do_list = models.ForeignKey(ToDoList, on_delete=models.CASCADE)
 
     def __str__(self):
@@ -24,3 +87,47 @@ class Task(models.Model):
 
     class Meta:
         ordering = ["-order"]
+        indexes = [
+            models.Index(
+                fields=["to_do_list", "order"], name="task_list_order_idx",
+            ),
+            # The admin's is_done filter, in the admin's order
+            models.Index(fields=["is_done", "id"], name="task_done_id_idx"),
+            # The open tasks of a to-do list, which get_to_do_list_contents
+            # filters by, without the done ones that pile up
+            models.Index(
+                fields=["to_do_list", "order"],
+                name="task_open_list_order_idx",
+                condition=models.Q(is_done=False),
+            ),
+            # The tasks that archive_tasks moves, oldest first
+            models.Index(
+                fields=["done_at"], name="task_done_at_idx",
+                condition=models.Q(done_at__isnull=False),
+            ),
+        ]
+
+
+class ArchivedTask(models.Model):
+    """
+    A done task moved out of the Task table by archive_tasks. Archived tasks
+    aren't counted in the counters of their to-do list
+    """
+    # The id that the task had
+    task_id = models.BigIntegerField()
+    title = models.TextField()
+    to_do_list = models.ForeignKey(ToDoList, on_delete=models.CASCADE)
+    done_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.title
+
+    class Meta:
+        ordering = ["-pk"]
+        indexes = [
+            # get_archived_tasks' pages
+            models.Index(
+                fields=["to_do_list", "id"], name="archived_task_list_id_idx",
+            ),
+        ]
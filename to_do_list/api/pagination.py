@@ -0,0 +1,130 @@
+"""
+Keyset pagination and field projection for the read endpoints.
+
+A page is requested with ``limit`` (and ``after``, the ``next`` cursor of the
+previous page). The cursor holds the values of the sorting fields of the last
+returned row, so the next page is a range scan instead of an OFFSET. Without
+``limit`` and ``after`` the whole collection is returned as a plain JSON
+array, like before pagination existed.
+"""
+import http
+
+from django.db.models import Q
+
+from .json_encoding import Rows
+from .view_utils import JsonException
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+CURSOR_SEPARATOR = ":"
+
+
+def validate_fields(request, allowed_fields):
+    """Returns the fields listed in ``fields=`` or all the allowed fields"""
+    try:
+        # Without repetitions
+        fields = list(dict.fromkeys(request.GET["fields"].split(",")))
+    except KeyError:
+        return list(allowed_fields)
+    for field in fields:
+        if field not in allowed_fields:
+            raise JsonException(
+                f"{field} is not a valid field! Valid fields are: "
+                f"{', '.join(allowed_fields)}.",
+                http.HTTPStatus.BAD_REQUEST,
+            )
+    return fields
+
+
+def validate_limit(request):
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise JsonException(
+            "limit is invalid!", http.HTTPStatus.BAD_REQUEST,
+        ) from None
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise JsonException(
+            f"limit should be between 1 and {MAX_PAGE_SIZE}!",
+            http.HTTPStatus.BAD_REQUEST,
+        )
+    return limit
+
+
+def validate_cursor(request, cursor_fields):
+    try:
+        cursor = request.GET["after"]
+    except KeyError:
+        return None
+    values = cursor.split(CURSOR_SEPARATOR)
+    try:
+        values = [int(value) for value in values]
+    except ValueError:
+        values = []
+    if len(values) != len(cursor_fields):
+        raise JsonException("after is invalid!", http.HTTPStatus.BAD_REQUEST)
+    return values
+
+
+def get_field_name(cursor_field):
+    return cursor_field.removeprefix("-")
+
+
+def filter_after(queryset, cursor_fields, cursor_values):
+    """
+    Keeps the rows that come after the cursor. For ("-a", "b") this is
+    a < A OR (a = A AND b > B)
+    """
+    condition = Q()
+    equal_fields = {}
+    for cursor_field, value in zip(cursor_fields, cursor_values):
+        field = get_field_name(cursor_field)
+        lookup = "lt" if cursor_field.startswith("-") else "gt"
+        condition |= Q(**equal_fields, **{f"{field}__{lookup}": value})
+        equal_fields[field] = value
+    return queryset.filter(condition)
+
+
+def is_paginated(request):
+    return "limit" in request.GET or "after" in request.GET
+
+
+def get_rows(
+    request, queryset, allowed_fields, cursor_fields, always_paginated=False,
+):
+    """
+    Returns the projected rows of the queryset: Rows, or a page dict with
+    "results" (Rows) and "next" when pagination is requested or
+    ``always_paginated``.
+
+    ``cursor_fields`` are integer fields that the rows are sorted by, like in
+    order_by() ("-field" for descending order), and should make the sorting
+    total.
+    """
+    fields = validate_fields(request, allowed_fields)
+    queryset = queryset.order_by(*cursor_fields)
+    if not always_paginated and not is_paginated(request):
+        return Rows(fields, queryset.values_list(*fields))
+    limit = validate_limit(request)
+    cursor_values = validate_cursor(request, cursor_fields)
+    if cursor_values is not None:
+        queryset = filter_after(queryset, cursor_fields, cursor_values)
+    cursor_field_names = [
+        get_field_name(cursor_field) for cursor_field in cursor_fields
+    ]
+    extra_fields = [
+        field for field in cursor_field_names if field not in fields
+    ]
+    # One more row is fetched to know whether there is a next page
+    selected_fields = [*fields, *extra_fields]
+    rows = list(queryset.values_list(*selected_fields)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        del rows[limit:]
+        next_cursor = CURSOR_SEPARATOR.join(
+            str(rows[-1][selected_fields.index(field)])
+            for field in cursor_field_names
+        )
+    if extra_fields:
+        rows = [row[:len(fields)] for row in rows]
+    return {"results": Rows(fields, rows), "next": next_cursor}
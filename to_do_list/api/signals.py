@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import caching, full_text_search, models
+
+
+@receiver(post_save, sender=models.ToDoList)
+@receiver(post_delete, sender=models.ToDoList)
+def invalidate_owners_to_do_lists_cache(sender, instance, **kwargs):
+    # The list could have been moved to another user (in the admin)
+    caching.invalidate_after_change(
+        instance.owner_id, instance.loaded_owner_id,
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_new_users_to_do_lists_cache(
+    sender, instance, created, **kwargs
+):
+    # Ids of users that were rolled back can be given to new users
+    if created:
+        caching.invalidate_after_change(instance.pk)
+
+
+@receiver(connection_created)
+def add_search_functions(sender, connection, **kwargs):
+    if connection.vendor == "sqlite":
+        connection.connection.create_function(
+            "strip_diacritics", 1, full_text_search.strip_diacritics,
+            deterministic=True,
+        )
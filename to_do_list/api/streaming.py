@@ -0,0 +1,68 @@
+"""
+Streaming responses for exporting whole collections.
+
+The rows are read with a chunked iterator and encoded chunk by chunk, so the
+memory used by a response doesn't depend on the amount of rows.
+"""
+import http
+import itertools
+
+from django.http import StreamingHttpResponse
+
+from . import json_encoding, pagination
+from .view_utils import JsonException
+
+CHUNK_SIZE = 2000
+STREAM_FORMATS = {
+    "1": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def validate_stream_format(request):
+    """Returns None when streaming isn't requested"""
+    stream_format = request.GET.get("stream")
+    if stream_format is None or stream_format == "0":
+        return None
+    if stream_format not in STREAM_FORMATS:
+        raise JsonException(
+            "stream should be 0, 1 or ndjson!", http.HTTPStatus.BAD_REQUEST,
+        )
+    return stream_format
+
+
+def generate_encoded_chunks(rows, fields, stream_format):
+    """Encodes CHUNK_SIZE rows at a time"""
+    chunks = iter(lambda: list(itertools.islice(rows, CHUNK_SIZE)), [])
+    if stream_format == "ndjson":
+        for chunk in chunks:
+            yield b"".join(
+                json_encoding.dumps(row) + b"\n"
+                for row in json_encoding.Rows(fields, chunk).as_dicts()
+            )
+        return
+    yield b"["
+    for chunk_number, chunk in enumerate(chunks):
+        # Without the brackets of the array
+        encoded_chunk = json_encoding.dumps(
+            json_encoding.Rows(fields, chunk)
+        )[1:-1]
+        yield encoded_chunk if chunk_number == 0 else b"," + encoded_chunk
+    yield b"]"
+
+
+def make_streaming_response(
+    request, queryset, stream_format, allowed_fields, cursor_fields,
+):
+    """
+    Streams the projected rows of the queryset, sorted like
+    pagination.get_rows() sorts them
+    """
+    fields = pagination.validate_fields(request, allowed_fields)
+    rows = queryset.order_by(*cursor_fields).values_list(*fields).iterator(
+        chunk_size=CHUNK_SIZE,
+    )
+    return StreamingHttpResponse(
+        generate_encoded_chunks(rows, fields, stream_format),
+        content_type=STREAM_FORMATS[stream_format],
+    )
@@ -0,0 +1,57 @@
+"""
+Filtering and sorting of the tasks of get_to_do_list_contents, by the query
+parameters:
+
+- ``is_done=0`` or ``1`` keeps the open or the done tasks. The open tasks of
+  a to-do list are read from the partial index task_open_list_order_idx, so
+  they stay cheap to get however many done tasks the list has;
+- ``q`` keeps the tasks whose titles contain it, ignoring the case;
+- ``sort`` is one of SORTINGS, "order" by default.
+"""
+import http
+
+from .view_utils import JsonException
+
+# The cursor fields of the sortings, see pagination.get_rows()
+SORTINGS = {
+    # From the top of the to-do list to its bottom
+    "order": ("-order", "-id"),
+    "reversed_order": ("order", "id"),
+    "newest": ("-id",),
+    "oldest": ("id",),
+}
+DEFAULT_SORTING = "order"
+
+
+def validate_is_done(request):
+    try:
+        is_done = request.GET["is_done"]
+    except KeyError:
+        return None
+    if is_done not in ("0", "1"):
+        raise JsonException(
+            "is_done should be 0 or 1!", http.HTTPStatus.BAD_REQUEST,
+        )
+    return is_done == "1"
+
+
+def validate_sorting(request):
+    sorting = request.GET.get("sort", DEFAULT_SORTING)
+    if sorting not in SORTINGS:
+        raise JsonException(
+            f"{sorting} is not a valid sorting! Valid sortings are: "
+            f"{', '.join(SORTINGS)}.",
+            http.HTTPStatus.BAD_REQUEST,
+        )
+    return sorting
+
+
+def filter_tasks(request, tasks):
+    """Returns the filtered tasks and the cursor fields of their sorting"""
+    is_done = validate_is_done(request)
+    if is_done is not None:
+        tasks = tasks.filter(is_done=is_done)
+    title_part = request.GET.get("q")
+    if title_part:
+        tasks = tasks.filter(title__icontains=title_part)
+    return tasks, SORTINGS[validate_sorting(request)]
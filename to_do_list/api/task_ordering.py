@@ -0,0 +1,120 @@
+"""
+Sparse ordering of tasks inside a to-do list.
+
+Tasks are sorted by ``Task.order`` (descending), but the values are not dense:
+neighbouring tasks are spread ``ORDER_GAP`` apart, so moving a task only
+needs a new value between its new neighbours, and deleting a task leaves a
+harmless gap. The list is renumbered only when there is no room left between
+two neighbours. Orders on the top of the list are handed out by the
+``ToDoList.next_order`` counter, which only grows.
+"""
+from django.db import connection, transaction
+from django.db.models import F
+
+from . import models
+
+ORDER_GAP = models.TASK_ORDER_GAP
+
+
+def get_tasks_in_ascending_order(to_do_list):
+    # noinspection PyUnresolvedReferences
+    return models.Task.objects.filter(
+        to_do_list=to_do_list,
+    ).order_by("order", "pk")
+
+
+def lock_to_do_list(to_do_list):
+    """
+    Serializes the moves of concurrent transactions in the same to-do list
+    by locking its row until the transaction ends. SQLite doesn't need this,
+    as its write transactions are serialized anyway.
+
+    Transactions that change tasks lock their to-do lists first, before any
+    of the tasks, so that they can't wait for each other's locks in opposite
+    orders
+    """
+    lock_to_do_lists([getattr(to_do_list, "pk", to_do_list)])
+
+
+def lock_to_do_lists(to_do_list_ids):
+    """lock_to_do_list() for many to-do lists, with one query"""
+    if connection.features.has_select_for_update:
+        # noinspection PyUnresolvedReferences
+        list(models.ToDoList.objects.select_for_update().filter(
+            pk__in=to_do_list_ids,
+        ).order_by("pk").values_list("pk", flat=True))
+
+
+def allocate_orders(to_do_list, amount=1):
+    """
+    Returns the order for a new task on the top of the list, or the first of
+    ``amount`` such orders, ``ORDER_GAP`` apart. They are taken from the
+    list's next_order counter, so this is a single-row UPDATE and a read of
+    the same row. The UPDATE locks the row until the transaction ends, which
+    keeps concurrent transactions from getting the same orders, so this
+    should be called in the transaction that uses the orders
+    """
+    to_do_list_id = getattr(to_do_list, "pk", to_do_list)
+    # noinspection PyUnresolvedReferences
+    to_do_lists = models.ToDoList.objects.filter(pk=to_do_list_id)
+    with transaction.atomic():
+        to_do_lists.update(
+            next_order=F("next_order") + amount * ORDER_GAP,
+        )
+        next_order = to_do_lists.values_list("next_order", flat=True).get()
+    return next_order - amount * ORDER_GAP
+
+
+def rebalance(to_do_list):
+    """Spreads the orders of the tasks of a to-do list evenly again"""
+    tasks = list(get_tasks_in_ascending_order(to_do_list).only("order"))
+    for task_number, task in enumerate(tasks, start=1):
+        task.order = task_number * ORDER_GAP
+    # noinspection PyUnresolvedReferences
+    models.Task.objects.bulk_update(tasks, ["order"])
+
+
+def get_neighbour_orders(task, position):
+    other_tasks = get_tasks_in_ascending_order(task.to_do_list_id).exclude(
+        pk=task.pk,
+    ).values_list("order", flat=True)
+    # The task will have (position - 1) other tasks below it
+    lower_index = position - 2
+    if lower_index < 0:
+        return None, other_tasks.first()
+    neighbours = list(other_tasks[lower_index:lower_index + 2])
+    if not neighbours:
+        # The position is beyond the top of the list
+        return other_tasks.last(), None
+    return (neighbours + [None])[:2]
+
+
+def move_task(task, position):
+    """
+    Moves the task to the given 1-based position, counted from the bottom of
+    the list. Positions outside the list are clamped to its ends.
+
+    Only the moved task is written, unless its new neighbours have no gap
+    between them, in which case the whole list is rebalanced first.
+    """
+    with transaction.atomic():
+        lock_to_do_list(task.to_do_list_id)
+        lower_order, upper_order = get_neighbour_orders(task, position)
+        if (
+            lower_order is not None and upper_order is not None
+            and upper_order - lower_order < 2
+        ):
+            rebalance(task.to_do_list_id)
+            lower_order, upper_order = get_neighbour_orders(task, position)
+        if lower_order is None and upper_order is None:
+            return
+        if lower_order is None:
+            new_order = upper_order - ORDER_GAP
+        elif upper_order is None:
+            # Tasks that will be created later should still go above it
+            new_order = allocate_orders(task.to_do_list_id)
+        else:
+            new_order = (lower_order + upper_order) // 2
+        # noinspection PyUnresolvedReferences
+        models.Task.objects.filter(pk=task.pk).update(order=new_order)
+    task.order = new_order
@@ -1,8 +1,12 @@
+import contextlib
 import http
 
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-from . import models
+from . import events, models
 
 
 def checkers_mixin_methods_generator(http_status):
@@ -24,6 +28,31 @@ class StatusCodeCheckersMixin:
     )
 
 
+class QueryBudgetMixin:
+    """
+    Checks that the requests to a view don't make more queries than its
+    budget in query_budgets, which has the most queries by the URL names of
+    the views. Backends that lock rows (see task_ordering.lock_to_do_list())
+    also get the queries in row_lock_budgets
+    """
+    query_budgets = {}
+    row_lock_budgets = {}
+
+    @contextlib.contextmanager
+    def assertWithinQueryBudget(self, url_name):
+        budget = self.query_budgets[url_name]
+        if connection.features.has_select_for_update:
+            budget += self.row_lock_budgets.get(url_name, 0)
+        with CaptureQueriesContext(connection) as queries:
+            yield
+        if len(queries) > budget:
+            self.fail(
+                f"{url_name} made {len(queries)} queries, but its budget is "
+                f"{budget}:\n"
+                + "\n".join(query["sql"] for query in queries)
+            )
+
+
 class UsersFixture(StatusCodeCheckersMixin):
 
     # noinspection PyPep8Naming
@@ -68,3 +97,49 @@ class TasksFixture(ToDoListsFixture):
             )
             for to_do_list in (self.first_to_do_list, self.second_to_do_list)
         ]
+
+
+class ManyTasksFixture(StatusCodeCheckersMixin):
+
+    # noinspection PyPep8Naming
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("user with many tasks")
+        # noinspection PyUnresolvedReferences
+        cls.to_do_list = models.ToDoList.objects.create(
+            owner=cls.user, title="to-do list with many tasks",
+        )
+        # noinspection PyUnresolvedReferences
+        models.Task.objects.bulk_create(
+            models.Task(
+                title=f"task {task_number}", order=task_number,
+                to_do_list=cls.to_do_list,
+            )
+            for task_number in range(1, 8)
+        )
+        for list_number in range(3):
+            # noinspection PyUnresolvedReferences
+            models.ToDoList.objects.create(
+                owner=cls.user, title=f"to-do list {list_number}",
+            )
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get_contents(self, **parameters):
+        return self.client.get(reverse(
+            "api:get_to_do_list_contents", args=(self.to_do_list.pk,)
+        ), parameters)
+
+
+class RecordingBroadcaster(events.InProcessBroadcaster):
+    """Remembers the published events, and delivers them"""
+
+    def __init__(self):
+        super().__init__()
+        self.published = []
+
+    def publish(self, channel, event):
+        self.published.append((channel, event))
+        super().publish(channel, event)
@@ -1,9 +1,45 @@
-from django.contrib.auth.models import User
-from django.test import TestCase
+import asyncio
+import datetime
+import decimal
+import http
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin import helpers
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.http import Http404
+from django.test import (
+    AsyncRequestFactory, Client, RequestFactory, SimpleTestCase, TestCase,
+    TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+
+from authentication.backends import users_cache
+from to_do_list import minification
 
-from . import models
-from .test_utils import ToDoListsFixture, TasksFixture, StatusCodeCheckersMixin
+from . import admin as api_admin
+from . import (
+    async_views, caching, events, json_encoding, models, task_ordering,
+    transfer, view_utils,
+)
+from .test_utils import (
+    ManyTasksFixture, QueryBudgetMixin, StatusCodeCheckersMixin, TasksFixture,
+    ToDoListsFixture,
+)
 
 
 class ToDoListDeletionTests(ToDoListsFixture, TestCase):
@@ -236,6 +272,54 @@ class TaskReorderingTests(StatusCodeCheckersMixin, TestCase):
             "first", 999, ["first", "fifth", "fourth", "third", "second"],
         )
 
+    def test_reordering_writes_only_the_moved_task_when_there_is_a_gap(self):
+        task_ordering.rebalance(self.to_do_list_with_five_tasks)
+        orders_before = self.get_orders()
+        self.reorder_and_compare(
+            "fourth", 2, ["fifth", "third", "second", "fourth", "first"],
+        )
+        orders_after = self.get_orders()
+        self.assertEqual(
+            [
+                title for title in orders_before
+                if orders_before[title] != orders_after[title]
+            ],
+            ["fourth"],
+        )
+
+    def test_repeated_reordering_into_the_same_gap(self):
+        titles = ["fifth", "fourth", "third", "second", "first"]
+        for _ in range(40):
+            titles.remove("first")
+            titles.insert(3, "first")
+            self.reorder_and_compare("first", 2, titles)
+            titles.remove("fifth")
+            titles.insert(3, "fifth")
+            self.reorder_and_compare("fifth", 2, titles)
+
+    def test_new_tasks_go_above_tasks_moved_to_the_top(self):
+        self.reorder_and_compare(
+            "first", 5, ["first", "fifth", "fourth", "third", "second"],
+        )
+        response = self.client.post(reverse("api:create_task"), {
+            "title": "sixth",
+            "to_do_list_id": self.to_do_list_with_five_tasks.pk,
+        })
+        self.assertOk(response)
+        response = self.client.get(reverse(
+            "api:get_to_do_list_contents",
+            args=(self.to_do_list_with_five_tasks.pk,),
+        ))
+        self.assertTitlesAreEqual(
+            response, ["sixth", "first", "fifth", "fourth", "third", "second"],
+        )
+
+    def get_orders(self):
+        # noinspection PyUnresolvedReferences
+        return dict(models.Task.objects.filter(
+            to_do_list=self.to_do_list_with_five_tasks,
+        ).values_list("title", "order"))
+
 
 class TaskStateChangingTests(TasksFixture, TestCase):
 
@@ -327,3 +411,1497 @@ class TaskTitleChangingTests(TasksFixture, TestCase):
         self.assertIn("new task name after renaming", (
             record["title"] for record in response.json()
         ))
+
+
+class OwnershipCheckTests(TasksFixture, TestCase):
+
+    def get_owned_task(self, task_id):
+        request = RequestFactory().get("/")
+        request.user = self.first_user
+        return view_utils.get_owned_object_or_error(
+            request, models.Task, view_utils.TASK_OWNER_ID_LOOKUP,
+            view_utils.UNACCESSIBLE_TASK_ERROR_TEXT, task_id,
+        )
+
+    def test_accessible_task_is_fetched_in_one_query(self):
+        with self.assertNumQueries(1):
+            task = self.get_owned_task(self.first_task.pk)
+        self.assertEqual(task, self.first_task)
+
+    def test_inaccessible_task(self):
+        with self.assertRaises(view_utils.JsonException) as context:
+            self.get_owned_task(self.second_task.pk)
+        self.assertEqual(
+            context.exception.status_code, http.HTTPStatus.FORBIDDEN,
+        )
+
+    def test_nonexistent_task(self):
+        with self.assertRaises(Http404):
+            self.get_owned_task(-1)
+
+
+class PaginationTests(ManyTasksFixture, TestCase):
+
+    def get_all_pages(self, getter, **parameters):
+        rows = []
+        while True:
+            response = getter(**parameters)
+            self.assertOk(response)
+            page = response.json()
+            rows.extend(page["results"])
+            if page["next"] is None:
+                return rows
+            parameters["after"] = page["next"]
+
+    def test_paging_through_tasks(self):
+        unpaginated_tasks = self.get_contents().json()
+        self.assertEqual(len(unpaginated_tasks), 7)
+        self.assertEqual(
+            self.get_all_pages(self.get_contents, limit=3), unpaginated_tasks,
+        )
+
+    def test_paging_through_to_do_lists(self):
+
+        def get_to_do_lists(**parameters):
+            return self.client.get(reverse("api:get_to_do_lists"), parameters)
+        self.assertEqual(
+            self.get_all_pages(get_to_do_lists, limit=1),
+            get_to_do_lists().json(),
+        )
+
+    def test_last_page_has_no_next_cursor(self):
+        response = self.get_contents(limit=7)
+        self.assertOk(response)
+        self.assertIsNone(response.json()["next"])
+
+    def test_field_projection(self):
+        response = self.get_contents(fields="title", limit=2)
+        self.assertOk(response)
+        self.assertEqual(response.json()["results"], [
+            {"title": "task 7"}, {"title": "task 6"},
+        ])
+
+    def test_invalid_field_projection(self):
+        self.assertBadRequest(self.get_contents(fields="title,to_do_list"))
+
+    def test_invalid_pagination_parameters(self):
+        self.assertBadRequest(self.get_contents(limit=0))
+        self.assertBadRequest(self.get_contents(limit="abc"))
+        self.assertBadRequest(self.get_contents(after="1"))
+        self.assertBadRequest(self.get_contents(after="a:b"))
+
+
+class StreamingTests(ManyTasksFixture, TestCase):
+
+    def test_streaming_json_array(self):
+        response = self.get_contents(stream=1)
+        self.assertOk(response)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            json.loads(b"".join(response.streaming_content)),
+            self.get_contents().json(),
+        )
+
+    def test_streaming_ndjson(self):
+        response = self.get_contents(stream="ndjson", fields="title")
+        self.assertOk(response)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [{"title": f"task {number}"} for number in range(7, 0, -1)],
+        )
+
+    def test_streaming_an_empty_to_do_list(self):
+        self.to_do_list.task_set.all().delete()
+        for stream_format, expected_body in (("1", b"[]"), ("ndjson", b"")):
+            response = self.get_contents(stream=stream_format)
+            self.assertEqual(
+                b"".join(response.streaming_content), expected_body,
+            )
+
+    def test_invalid_stream_format(self):
+        self.assertBadRequest(self.get_contents(stream="xml"))
+
+
+class TaskFilteringTests(ManyTasksFixture, TestCase):
+
+    # noinspection PyPep8Naming
+    def setUp(self):
+        super().setUp()
+        self.to_do_list.task_set.filter(order__in=(2, 4, 6)).update(
+            is_done=True,
+        )
+
+    def get_titles(self, **parameters):
+        response = self.get_contents(fields="title", **parameters)
+        self.assertOk(response)
+        rows = response.json()
+        if isinstance(rows, dict):
+            rows = rows["results"]
+        return [row["title"] for row in rows]
+
+    def test_filtering_by_state(self):
+        self.assertEqual(self.get_titles(is_done=0), [
+            "task 7", "task 5", "task 3", "task 1",
+        ])
+        self.assertEqual(self.get_titles(is_done=1), [
+            "task 6", "task 4", "task 2",
+        ])
+
+    def test_filtering_by_title(self):
+        # noinspection PyUnresolvedReferences
+        models.Task.objects.filter(title="task 3").update(title="Call Bob")
+        self.assertEqual(self.get_titles(q="BOB"), ["Call Bob"])
+        self.assertEqual(self.get_titles(q="bob", is_done=1), [])
+
+    def test_sorting(self):
+        self.assertEqual(
+            self.get_titles(sort="reversed_order", is_done=0),
+            ["task 1", "task 3", "task 5", "task 7"],
+        )
+        self.assertEqual(
+            self.get_titles(sort="oldest"),
+            [f"task {number}" for number in range(1, 8)],
+        )
+
+    def test_paging_through_filtered_and_sorted_tasks(self):
+        titles = []
+        parameters = {"is_done": 0, "sort": "oldest", "limit": 3}
+        while True:
+            page = self.get_contents(fields="title", **parameters).json()
+            titles.extend(row["title"] for row in page["results"])
+            if page["next"] is None:
+                break
+            parameters["after"] = page["next"]
+        self.assertEqual(titles, ["task 1", "task 3", "task 5", "task 7"])
+
+    def test_streaming_filtered_tasks(self):
+        response = self.get_contents(stream="ndjson", is_done=1, q="4")
+        self.assertEqual(
+            [
+                json.loads(line)["title"]
+                for line in b"".join(response.streaming_content).splitlines()
+            ],
+            ["task 4"],
+        )
+
+    def test_invalid_filters(self):
+        self.assertBadRequest(self.get_contents(is_done="yes"))
+        self.assertBadRequest(self.get_contents(sort="title"))
+
+
+class BatchTests(TasksFixture, TestCase):
+
+    def setUp(self):
+        TasksFixture.setUp(self)
+        self.client.force_login(self.first_user)
+
+    def send_batch(self, operations):
+        return self.client.post(reverse("api:batch_tasks"), {
+            "operations": json.dumps(operations),
+        })
+
+    def get_tasks(self):
+        return self.client.get(reverse(
+            "api:get_to_do_list_contents", args=(self.first_to_do_list.pk,)
+        )).json()
+
+    def test_mixed_operations(self):
+        response = self.send_batch([
+            {
+                "action": "create", "title": "new task",
+                "to_do_list_id": self.first_to_do_list.pk,
+            },
+            {
+                "action": "rename", "task_id": self.first_task.pk,
+                "new_title": "renamed task",
+            },
+            {
+                "action": "change_state", "task_id": self.first_task.pk,
+                "new_state": 1,
+            },
+            {
+                "action": "create", "title": "newer task",
+                "to_do_list_id": self.first_to_do_list.pk,
+            },
+            {"action": "reorder", "task_id": self.first_task.pk, "new_order": 3},
+        ])
+        self.assertOk(response)
+        results = response.json()["results"]
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[1:3], [{}, {}])
+        self.assertEqual(
+            [(task["title"], task["is_done"]) for task in self.get_tasks()],
+            [
+                ("renamed task", True), ("newer task", False),
+                ("new task", False),
+            ],
+        )
+        self.assertEqual(self.get_tasks()[2]["id"], results[0]["id"])
+
+    def test_deletion(self):
+        response = self.send_batch([
+            {"action": "delete", "task_id": self.first_task.pk},
+        ])
+        self.assertOk(response)
+        self.assertEqual(self.get_tasks(), [])
+
+    def test_reorderings_and_deletions_are_applied_in_order(self):
+        # noinspection PyUnresolvedReferences
+        models.Task.objects.all().delete()
+        tasks = {}
+        # From the bottom of the list
+        for order, title in enumerate("ABCD", start=1):
+            # noinspection PyUnresolvedReferences
+            tasks[title] = models.Task.objects.create(
+                title=title, order=order * task_ordering.ORDER_GAP,
+                to_do_list=self.first_to_do_list,
+            )
+        self.assertOk(self.send_batch([
+            {"action": "delete", "task_id": tasks["A"].pk},
+            # The second of B, C, D from the bottom
+            {"action": "reorder", "task_id": tasks["D"].pk, "new_order": 2},
+        ]))
+        self.assertEqual(
+            [task["title"] for task in self.get_tasks()], ["C", "D", "B"],
+        )
+
+    def test_updates_do_not_write_over_concurrent_changes(self):
+        get_owned_objects_or_error = view_utils.get_owned_objects_or_error
+
+        def get_and_rename_in_the_meantime(request, model_class, *args):
+            objects = get_owned_objects_or_error(request, model_class, *args)
+            if model_class is models.Task:
+                # noinspection PyUnresolvedReferences
+                models.Task.objects.filter(pk=self.first_task.pk).update(
+                    title="renamed in the meantime",
+                )
+            return objects
+
+        with mock.patch.object(
+            view_utils, "get_owned_objects_or_error",
+            get_and_rename_in_the_meantime,
+        ):
+            self.assertOk(self.send_batch([{
+                "action": "change_state", "task_id": self.first_task.pk,
+                "new_state": 1,
+            }]))
+        [task] = self.get_tasks()
+        self.assertEqual(
+            (task["title"], task["is_done"]),
+            ("renamed in the meantime", True),
+        )
+
+    def test_nothing_is_applied_when_any_operation_is_invalid(self):
+        response = self.send_batch([
+            {"action": "delete", "task_id": self.first_task.pk},
+            {"action": "change_state", "task_id": self.first_task.pk},
+        ])
+        self.assertBadRequest(response)
+        self.assertIn("Operation 1", response.json()["error"])
+        self.assertEqual(len(self.get_tasks()), 1)
+
+    def test_inaccessible_task(self):
+        response = self.send_batch([
+            {"action": "delete", "task_id": self.first_task.pk},
+            {"action": "delete", "task_id": self.second_task.pk},
+        ])
+        self.assertForbidden(response)
+        self.assertEqual(len(self.get_tasks()), 1)
+
+    def test_inaccessible_to_do_list(self):
+        self.assertForbidden(self.send_batch([{
+            "action": "create", "title": "task",
+            "to_do_list_id": self.second_to_do_list.pk,
+        }]))
+
+    def test_nonexistent_task(self):
+        self.assertNotFound(self.send_batch([
+            {"action": "delete", "task_id": -1},
+        ]))
+
+    def test_malformed_operations(self):
+        for operations in ("{", "{}", "[1]", '[{"action": "explode"}]'):
+            response = self.client.post(reverse("api:batch_tasks"), {
+                "operations": operations,
+            })
+            self.assertBadRequest(response)
+
+    def test_booleans_and_fractions_are_not_integers(self):
+        for operation in (
+            {"action": "delete", "task_id": True},
+            {"action": "reorder", "task_id": self.first_task.pk,
+             "new_order": 2.9},
+            {"action": "change_state", "task_id": self.first_task.pk,
+             "new_state": False},
+        ):
+            response = self.send_batch([operation])
+            self.assertBadRequest(response)
+            self.assertIn("is invalid", response.json()["error"])
+        self.assertOk(self.send_batch([
+            {"action": "reorder", "task_id": self.first_task.pk,
+             "new_order": 1.0},
+        ]))
+
+    def test_amount_of_queries_does_not_depend_on_amount_of_operations(self):
+        operations = [
+            {
+                "action": "change_state", "task_id": self.first_task.pk,
+                "new_state": 1,
+            },
+            {
+                "action": "create", "title": "task",
+                "to_do_list_id": self.first_to_do_list.pk,
+            },
+        ]
+        # Caches the user of the session
+        self.assertOk(self.send_batch([]))
+        queries_counts = []
+        for repetitions in (1, 10):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertOk(self.send_batch(operations * repetitions))
+            queries_counts.append(len(queries))
+        self.assertEqual(queries_counts[0], queries_counts[1])
+
+
+class ToDoListsCacheTests(ToDoListsFixture, TestCase):
+
+    def setUp(self):
+        ToDoListsFixture.setUp(self)
+        self.client.force_login(self.first_user)
+
+    def get_titles(self):
+        response = self.client.get(reverse("api:get_to_do_lists"))
+        self.assertOk(response)
+        return [to_do_list["title"] for to_do_list in response.json()]
+
+    def test_hits_and_misses(self):
+        statistics_before = caching.get_statistics()
+        self.get_titles()
+        self.get_titles()
+        statistics_after = caching.get_statistics()
+        self.assertEqual(
+            statistics_after["misses"] - statistics_before["misses"], 1,
+        )
+        self.assertEqual(
+            statistics_after["hits"] - statistics_before["hits"], 1,
+        )
+
+    def test_cached_index_is_served_without_querying_to_do_lists(self):
+        self.get_titles()
+        with CaptureQueriesContext(connection) as queries:
+            self.get_titles()
+        self.assertFalse([
+            query for query in queries
+            if "api_todolist" in query["sql"]
+        ])
+
+    def test_index_and_version_of_other_processes_expire(self):
+        response = self.client.get(reverse("api:get_to_do_lists"))
+        # A change in another process, which doesn't invalidate this cache
+        # noinspection PyUnresolvedReferences
+        models.ToDoList.objects.filter(pk=self.first_to_do_list.pk).update(
+            title="renamed elsewhere",
+        )
+        self.assertEqual(self.get_titles(), ["First user's to-do list"])
+        with mock.patch("time.time", return_value=(
+            time.time() + settings.TO_DO_LISTS_CACHE_TIMEOUT + 1
+        )):
+            self.assertEqual(self.get_titles(), ["renamed elsewhere"])
+            response = self.client.get(
+                reverse("api:get_to_do_lists"),
+                HTTP_IF_NONE_MATCH=response["ETag"],
+            )
+        self.assertOk(response)
+
+    def test_invalidation_by_views(self):
+        self.assertEqual(self.get_titles(), ["First user's to-do list"])
+        response = self.client.post(reverse("api:create_to_do_list"), {
+            "title": "new",
+        })
+        new_to_do_list_id = response.json()["id"]
+        self.assertEqual(
+            self.get_titles(), ["new", "First user's to-do list"],
+        )
+        self.client.post(reverse("api:rename_to_do_list"), {
+            "to_do_list_id": new_to_do_list_id, "new_title": "renamed",
+        })
+        self.assertEqual(
+            self.get_titles(), ["renamed", "First user's to-do list"],
+        )
+        self.client.post(reverse("api:delete_to_do_list"), {
+            "to_do_list_id": new_to_do_list_id,
+        })
+        self.assertEqual(self.get_titles(), ["First user's to-do list"])
+
+    def test_invalidation_when_owner_changes(self):
+        self.assertEqual(self.get_titles(), ["First user's to-do list"])
+        # noinspection PyUnresolvedReferences
+        to_do_list = models.ToDoList.objects.get(pk=self.first_to_do_list.pk)
+        to_do_list.owner = self.second_user
+        to_do_list.save()
+        self.assertEqual(self.get_titles(), [])
+
+
+class ConditionalGetTests(TasksFixture, TestCase):
+
+    def setUp(self):
+        TasksFixture.setUp(self)
+        self.client.force_login(self.first_user)
+
+    def get_contents(self, etag=None):
+        headers = {} if etag is None else {"HTTP_IF_NONE_MATCH": etag}
+        return self.client.get(reverse(
+            "api:get_to_do_list_contents", args=(self.first_to_do_list.pk,)
+        ), **headers)
+
+    def test_unchanged_contents_are_not_queried(self):
+        etag = self.get_contents()["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_contents(etag)
+        self.assertEqual(response.status_code, http.HTTPStatus.NOT_MODIFIED)
+        self.assertFalse([
+            query for query in queries if "api_task" in query["sql"]
+        ])
+
+    def test_task_mutations_change_the_etag(self):
+        mutations = (
+            ("api:create_task", {
+                "title": "task", "to_do_list_id": self.first_to_do_list.pk,
+            }),
+            ("api:rename_task", {
+                "task_id": self.first_task.pk, "new_title": "renamed",
+            }),
+            ("api:change_task_state", {
+                "task_id": self.first_task.pk, "new_state": 1,
+            }),
+            ("api:reorder_task", {
+                "task_id": self.first_task.pk, "new_order": 2,
+            }),
+            ("api:batch_tasks", {"operations": json.dumps([{
+                "action": "change_state", "task_id": self.first_task.pk,
+                "new_state": 0,
+            }])}),
+            ("api:delete_task", {"task_id": self.first_task.pk}),
+        )
+        etag = self.get_contents()["ETag"]
+        for url_name, data in mutations:
+            self.assertOk(self.client.post(reverse(url_name), data))
+            response = self.get_contents(etag)
+            self.assertOk(response)
+            self.assertNotEqual(response["ETag"], etag)
+            etag = response["ETag"]
+
+    def test_to_do_lists_index(self):
+        response = self.client.get(reverse("api:get_to_do_lists"))
+        etag = response["ETag"]
+        response = self.client.get(
+            reverse("api:get_to_do_lists"), HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, http.HTTPStatus.NOT_MODIFIED)
+        self.client.post(reverse("api:create_to_do_list"), {"title": "new"})
+        response = self.client.get(
+            reverse("api:get_to_do_lists"), HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertOk(response)
+
+
+@skipUnless(connection.vendor == "sqlite", "SQLite-specific")
+class SQLiteBackendTests(TestCase):
+
+    def test_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            for pragma, value in connection.settings_dict["OPTIONS"].get(
+                "pragmas", {}
+            ).items():
+                if pragma in ("busy_timeout", "cache_size"):
+                    cursor.execute(f"PRAGMA {pragma}")
+                    self.assertEqual(cursor.fetchone()[0], value)
+
+
+class ConcurrentOrderingTests(TransactionTestCase):
+    threads_amount = 8
+    tasks_per_thread = 25
+
+    def setUp(self):
+        # noinspection PyUnresolvedReferences
+        self.to_do_list = models.ToDoList.objects.create(
+            title="contended to-do list",
+            owner=User.objects.create_user("owner of a contended list"),
+        )
+
+    def create_tasks(self):
+        try:
+            for task_number in range(self.tasks_per_thread):
+                with transaction.atomic():
+                    # noinspection PyUnresolvedReferences
+                    models.Task.objects.create(
+                        title=f"task {task_number}", to_do_list=self.to_do_list,
+                        order=task_ordering.allocate_orders(
+                            self.to_do_list
+                        ),
+                    )
+        finally:
+            connection.close()
+
+    def test_concurrently_created_tasks_get_unique_orders(self):
+        threads = [
+            threading.Thread(target=self.create_tasks)
+            for _ in range(self.threads_amount)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        orders = list(self.to_do_list.task_set.values_list("order", flat=True))
+        self.assertEqual(
+            len(orders), self.threads_amount * self.tasks_per_thread,
+        )
+        self.assertEqual(len(set(orders)), len(orders))
+
+
+class AsyncViewsTests(TasksFixture, TestCase):
+
+    def make_request(self, method="get", data=None, user=None, **headers):
+        factory = AsyncRequestFactory()
+        if method == "get":
+            request = factory.get("/", data, **headers)
+        else:
+            # Multipart bodies of AsyncRequestFactory can't be read in
+            # Django 4.0
+            request = factory.post(
+                "/", urlencode(data),
+                content_type="application/x-www-form-urlencoded", **headers
+            )
+        request.user = self.first_user if user is None else user
+        return request
+
+    async def test_getting_to_do_lists(self):
+        response = await async_views.get_to_do_lists(self.make_request())
+        self.assertOk(response)
+        self.assertEqual(
+            [
+                to_do_list["title"]
+                for to_do_list in json.loads(response.content)
+            ],
+            [self.first_to_do_list.title],
+        )
+        response = await async_views.get_to_do_lists(self.make_request(
+            **{"if-none-match": response["ETag"]}
+        ))
+        self.assertEqual(response.status_code, http.HTTPStatus.NOT_MODIFIED)
+
+    async def test_getting_to_do_list_contents(self):
+        response = await async_views.get_to_do_list_contents(
+            self.make_request(), to_do_list_id=self.first_to_do_list.pk,
+        )
+        self.assertOk(response)
+        self.assertEqual(
+            [task["id"] for task in json.loads(response.content)],
+            [self.first_task.pk],
+        )
+        response = await async_views.get_to_do_list_contents(
+            self.make_request(), to_do_list_id=self.second_to_do_list.pk,
+        )
+        self.assertForbidden(response)
+
+    async def test_streaming_to_do_list_contents(self):
+        response = await async_views.get_to_do_list_contents(
+            self.make_request(data={"stream": "ndjson", "fields": "id"}),
+            to_do_list_id=self.first_to_do_list.pk,
+        )
+        self.assertOk(response)
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        # Reads the tasks in the thread of the view, while being sent
+        await events.ASGIHandler().send_response(response, send)
+        self.assertEqual(messages[0]["status"], http.HTTPStatus.OK)
+        self.assertEqual(
+            json.loads(b"".join(
+                message.get("body", b"") for message in messages[1:]
+            )),
+            {"id": self.first_task.pk},
+        )
+        self.assertFalse(messages[-1].get("more_body", False))
+
+    async def test_changing_task_state(self):
+        response = await async_views.change_task_state(self.make_request(
+            "post", {"task_id": self.first_task.pk, "new_state": 1},
+        ))
+        self.assertOk(response)
+        task = await sync_to_async(models.Task.objects.get)(
+            pk=self.first_task.pk,
+        )
+        self.assertTrue(task.is_done)
+        response = await async_views.change_task_state(self.make_request(
+            "post", {"task_id": self.first_task.pk, "new_state": 2},
+        ))
+        self.assertBadRequest(response)
+
+    async def test_anonymous_user_is_redirected_to_login(self):
+        response = await async_views.get_to_do_lists(
+            self.make_request(user=AnonymousUser()),
+        )
+        self.assertEqual(response.status_code, http.HTTPStatus.FOUND)
+
+
+@override_settings(EVENTS_BROADCASTER="api.test_utils.RecordingBroadcaster")
+class EventsTests(TasksFixture, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        events.load_broadcaster.cache_clear()
+        self.broadcaster = events.get_broadcaster()
+        self.client.force_login(self.first_user)
+        self.channel = events.get_to_do_list_channel(self.first_to_do_list.pk)
+
+    def tearDown(self):
+        events.load_broadcaster.cache_clear()
+
+    def test_task_changes_are_published(self):
+        task_id = self.first_task.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            new_task_id = self.client.post(reverse("api:create_task"), {
+                "title": "new task", "to_do_list_id": self.first_to_do_list.pk,
+            }).json()["id"]
+            self.client.post(reverse("api:rename_task"), {
+                "task_id": task_id, "new_title": "renamed task",
+            })
+            self.client.post(reverse("api:change_task_state"), {
+                "task_id": task_id, "new_state": 1,
+            })
+            self.client.post(reverse("api:reorder_task"), {
+                "task_id": task_id, "new_order": 2,
+            })
+            self.client.post(reverse("api:delete_task"), {
+                "task_id": new_task_id,
+            })
+        self.assertEqual(self.broadcaster.published, [
+            (self.channel, {
+                "type": "created", "id": new_task_id, "title": "new task",
+                "is_done": False,
+            }),
+            (self.channel, {
+                "type": "renamed", "id": task_id, "title": "renamed task",
+            }),
+            (self.channel, {"type": "toggled", "id": task_id, "is_done": True}),
+            (self.channel, {"type": "moved", "id": task_id, "position": 2}),
+            (self.channel, {"type": "deleted", "id": new_task_id}),
+        ])
+
+    def test_to_do_list_changes_are_published_to_the_owner(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            to_do_list_id = self.client.post(
+                reverse("api:create_to_do_list"), {"title": "new list"},
+            ).json()["id"]
+            self.client.post(reverse("api:delete_to_do_list"), {
+                "to_do_list_id": to_do_list_id,
+            })
+        channel = events.get_to_do_lists_channel(self.first_user.pk)
+        self.assertEqual(self.broadcaster.published, [
+            (channel, {
+                "type": "created", "id": to_do_list_id, "title": "new list",
+            }),
+            (channel, {"type": "deleted", "id": to_do_list_id}),
+        ])
+
+    def test_batch_changes_are_published(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("api:batch_tasks"), {
+                "operations": json.dumps([
+                    {
+                        "action": "change_state", "task_id": self.first_task.pk,
+                        "new_state": 1,
+                    },
+                    {"action": "delete", "task_id": self.first_task.pk},
+                ]),
+            })
+        self.assertEqual(self.broadcaster.published, [
+            (self.channel, {
+                "type": "toggled", "id": self.first_task.pk, "is_done": True,
+            }),
+            (self.channel, {"type": "deleted", "id": self.first_task.pk}),
+        ])
+
+    def test_failed_changes_are_not_published(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("api:batch_tasks"), {
+                "operations": json.dumps([
+                    {"action": "delete", "task_id": self.first_task.pk},
+                    {"action": "delete", "task_id": self.second_task.pk},
+                ]),
+            })
+        self.assertForbidden(response)
+        self.assertEqual(self.broadcaster.published, [])
+
+    def test_event_streams_need_asgi(self):
+        url = reverse(
+            "api:get_to_do_list_events", args=(self.first_to_do_list.pk,)
+        )
+        with override_settings(EVENT_STREAMS=False):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, http.HTTPStatus.NO_CONTENT)
+        with override_settings(EVENT_STREAMS=True):
+            response = self.client.get(url)
+            self.assertIsInstance(response, events.EventStreamResponse)
+            self.assertEqual(response.channel, self.channel)
+            response = self.client.get(reverse(
+                "api:get_to_do_list_events", args=(self.second_to_do_list.pk,)
+            ))
+            self.assertForbidden(response)
+
+
+class EventStreamTests(SimpleTestCase):
+
+    async def test_events_are_sent_until_disconnection(self):
+        broadcaster = events.InProcessBroadcaster()
+        messages = []
+        disconnected = asyncio.Event()
+
+        async def send(message):
+            messages.append(message)
+            if message.get("body", b"").startswith(b"data:"):
+                disconnected.set()
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        response = events.EventStreamResponse("channel")
+        with mock.patch.object(
+            events, "get_broadcaster", return_value=broadcaster,
+        ):
+            sending = asyncio.create_task(response.send_events(send, receive))
+            while not broadcaster.subscriptions:
+                await asyncio.sleep(0)
+            # Views publish from worker threads
+            await sync_to_async(broadcaster.publish, thread_sensitive=False)(
+                "channel", {"type": "deleted", "id": 1},
+            )
+            await asyncio.wait_for(sending, timeout=5)
+        self.assertEqual(messages[0]["type"], "http.response.start")
+        self.assertIn(
+            (b"Content-Type", b"text/event-stream"), messages[0]["headers"],
+        )
+        self.assertEqual(
+            messages[-1]["body"], b'data: {"type": "deleted", "id": 1}\n\n',
+        )
+        self.assertEqual(broadcaster.subscriptions, {})
+
+    async def test_overflowed_subscription_is_reset(self):
+        broadcaster = events.InProcessBroadcaster()
+        subscription = broadcaster.subscribe("channel")
+        for event_number in range(events.SUBSCRIPTION_QUEUE_SIZE + 1):
+            subscription.deliver({"type": "deleted", "id": event_number})
+        self.assertEqual(await subscription.get(), events.RESET_EVENT)
+        subscription.deliver({"type": "deleted", "id": 0})
+        self.assertEqual(
+            await subscription.get(), {"type": "deleted", "id": 0},
+        )
+        subscription.close()
+
+
+class UsersCacheTests(ToDoListsFixture, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        users_cache.clear()
+        self.client.force_login(self.first_user)
+
+    def count_user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertOk(self.client.get(reverse("api:get_to_do_lists")))
+        return sum('"auth_user"' in query["sql"] for query in queries)
+
+    def test_user_is_loaded_once(self):
+        self.assertEqual(self.count_user_queries(), 1)
+        self.assertEqual(self.count_user_queries(), 0)
+
+    def test_changing_user_invalidates_it(self):
+        self.count_user_queries()
+        self.first_user.first_name = "First"
+        self.first_user.save()
+        self.assertEqual(self.count_user_queries(), 1)
+
+    @override_settings(AUTHENTICATION_USERS_CACHE_TIMEOUT=-1)
+    def test_expired_user_is_loaded_again(self):
+        self.count_user_queries()
+        self.assertEqual(self.count_user_queries(), 1)
+
+    @override_settings(AUTHENTICATION_USERS_CACHE_SIZE=1)
+    def test_least_recently_used_user_is_evicted(self):
+        users_cache.set(self.first_user.pk, self.first_user)
+        users_cache.set(self.second_user.pk, self.second_user)
+        self.assertIsNone(users_cache.get(self.first_user.pk))
+        self.assertEqual(users_cache.get(self.second_user.pk), self.second_user)
+
+
+class PageMiddlewareTests(ToDoListsFixture, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.force_login(self.first_user)
+
+    def test_api_skips_page_middleware(self):
+        response = self.client.get(reverse("api:get_to_do_lists"))
+        self.assertNotIn("X-Frame-Options", response)
+        response = self.client.get(reverse("index"))
+        self.assertEqual(response["X-Frame-Options"], "DENY")
+
+    @override_settings(HTML_MINIFY=True)
+    def test_minified_pages_are_cached(self):
+        caches[settings.MINIFIED_PAGES_CACHE_ALIAS].clear()
+        url = reverse("to_do_list:view", args=(self.first_to_do_list.pk,))
+        with mock.patch.object(
+            minification, "minify", wraps=minification.minify,
+        ) as minify:
+            pages = [self.client.get(url).content.decode() for _ in range(2)]
+        minify.assert_called_once()
+        self.assertNotIn("\n", pages[1])
+        self.assertNotIn(minification.CSRF_TOKEN_PLACEHOLDER, pages[1])
+        csrf_token = re.search(
+            r'name="csrfmiddlewaretoken" type="hidden" value="(\w+)"',
+            pages[1],
+        ).group(1)
+        response = self.client.post(reverse("api:create_to_do_list"), {
+            "title": "new list", "csrfmiddlewaretoken": csrf_token,
+        })
+        self.assertOk(response)
+
+
+class TaskCountersTests(TasksFixture, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # The fixture creates its tasks directly
+        # noinspection PyUnresolvedReferences
+        models.ToDoList.objects.bump_version(
+            **models.get_recounted_task_counters()
+        )
+        self.client.force_login(self.first_user)
+
+    def get_counters(self):
+        [to_do_list] = self.client.get(reverse("api:get_to_do_lists")).json()
+        return to_do_list["done_count"], to_do_list["task_count"]
+
+    def test_views_keep_counters(self):
+        self.assertEqual(self.get_counters(), (0, 1))
+        new_task_id = self.client.post(reverse("api:create_task"), {
+            "title": "new task", "to_do_list_id": self.first_to_do_list.pk,
+        }).json()["id"]
+        self.assertEqual(self.get_counters(), (0, 2))
+        for _ in range(2):
+            self.client.post(reverse("api:change_task_state"), {
+                "task_id": new_task_id, "new_state": 1,
+            })
+            self.assertEqual(self.get_counters(), (1, 2))
+        self.client.post(reverse("api:delete_task"), {
+            "task_id": new_task_id,
+        })
+        self.assertEqual(self.get_counters(), (0, 1))
+
+    def test_renaming_keeps_counters(self):
+        get_owned_object_or_error = view_utils.get_owned_object_or_error
+
+        def get_and_change_in_the_meantime(*args):
+            record = get_owned_object_or_error(*args)
+            with mock.patch.object(
+                view_utils, "get_owned_object_or_error",
+                get_owned_object_or_error,
+            ):
+                self.client.post(reverse("api:create_task"), {
+                    "title": "new task",
+                    "to_do_list_id": self.first_to_do_list.pk,
+                })
+                self.client.post(reverse("api:change_task_state"), {
+                    "task_id": self.first_task.pk, "new_state": 1,
+                })
+            return record
+
+        # noinspection PyUnresolvedReferences
+        old_version = models.ToDoList.objects.get(
+            pk=self.first_to_do_list.pk,
+        ).version
+
+        with mock.patch.object(
+            view_utils, "get_owned_object_or_error",
+            get_and_change_in_the_meantime,
+        ):
+            self.assertOk(self.client.post(reverse("api:rename_task"), {
+                "task_id": self.first_task.pk, "new_title": "renamed task",
+            }))
+        with mock.patch.object(
+            view_utils, "get_owned_object_or_error",
+            get_and_change_in_the_meantime,
+        ):
+            self.assertOk(self.client.post(reverse("api:rename_to_do_list"), {
+                "to_do_list_id": self.first_to_do_list.pk,
+                "new_title": "renamed to-do list",
+            }))
+        self.assertEqual(self.get_counters(), (1, 3))
+        # noinspection PyUnresolvedReferences
+        task = models.Task.objects.get(pk=self.first_task.pk)
+        self.assertTrue(task.is_done)
+        # noinspection PyUnresolvedReferences
+        to_do_list = models.ToDoList.objects.get(pk=self.first_to_do_list.pk)
+        self.assertEqual(to_do_list.title, "renamed to-do list")
+        # Both creations, the state change and the renaming of the task
+        self.assertEqual(to_do_list.version, old_version + 4)
+        self.assertEqual(len({
+            order for order in to_do_list.task_set.values_list(
+                "order", flat=True,
+            )
+        }), 3)
+
+    def test_batch_keeps_counters(self):
+        self.client.post(reverse("api:batch_tasks"), {
+            "operations": json.dumps([
+                {
+                    "action": "create", "title": "new task",
+                    "to_do_list_id": self.first_to_do_list.pk,
+                },
+                {
+                    "action": "change_state", "task_id": self.first_task.pk,
+                    "new_state": 1,
+                },
+            ]),
+        })
+        self.assertEqual(self.get_counters(), (1, 2))
+
+    def test_admin_keeps_counters(self):
+        self.client.force_login(User.objects.create_superuser("admin"))
+        response = self.client.post(reverse(
+            "admin:api_task_change", args=(self.first_task.pk,)
+        ), {
+            "title": self.first_task.title, "is_done": "on", "order": 1,
+            "to_do_list": self.first_to_do_list.pk,
+        })
+        self.assertEqual(response.status_code, http.HTTPStatus.FOUND)
+        self.client.force_login(self.first_user)
+        self.assertEqual(self.get_counters(), (1, 1))
+
+    def test_repair_command(self):
+        # noinspection PyUnresolvedReferences
+        models.ToDoList.objects.filter(pk=self.first_to_do_list.pk).update(
+            task_count=5, done_count=3,
+        )
+        output = io.StringIO()
+        call_command("repair_task_counters", stdout=output)
+        self.assertIn("1 to-do lists had wrong counters", output.getvalue())
+        self.assertEqual(self.get_counters(), (0, 1))
+
+
+class JsonEncodingTests(TasksFixture, TestCase):
+
+    def test_encoders_agree(self):
+        data = {
+            "rows": json_encoding.Rows(("id", "title"), [(1, "ä"), (2, "b")]),
+            "created": datetime.datetime(2022, 3, 4, 5, 6, 7, 890123),
+            "amount": decimal.Decimal("1.50"),
+        }
+        encoded = {
+            encoder: dumps(data)
+            for encoder, dumps in json_encoding.ENCODERS.items()
+        }
+        self.assertEqual(json.loads(encoded["stdlib"]), {
+            "rows": [{"id": 1, "title": "ä"}, {"id": 2, "title": "b"}],
+            "created": "2022-03-04T05:06:07.890",
+            "amount": "1.50",
+        })
+        self.assertEqual(
+            json.loads(encoded["orjson"]), json.loads(encoded["stdlib"]),
+        )
+
+    @override_settings(API_JSON_ENCODER="stdlib")
+    def test_responses_with_the_fallback_encoder(self):
+        self.client.force_login(self.first_user)
+        response = self.client.get(reverse(
+            "api:get_to_do_list_contents",
+            kwargs={"to_do_list_id": self.first_to_do_list.pk},
+        ), {"fields": "title,title,id"})
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.json(), [
+            {"title": self.first_task.title, "id": self.first_task.pk},
+        ])
+        response = self.client.post(reverse("api:delete_task"))
+        self.assertBadRequest(response)
+        self.assertIn("error", response.json())
+
+
+class ArchivingTests(TasksFixture, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.first_user)
+        for task_number in range(3):
+            # noinspection PyUnresolvedReferences
+            models.Task.objects.create(
+                title=f"Done task {task_number}", is_done=True,
+                done_at=timezone.now() - datetime.timedelta(days=40),
+                order=task_number + 2, to_do_list=self.first_to_do_list,
+            )
+        # noinspection PyUnresolvedReferences
+        models.ToDoList.objects.bump_version(
+            **models.get_recounted_task_counters()
+        )
+
+    def get_archived_tasks(self, to_do_list, **parameters):
+        return self.client.get(reverse(
+            "api:get_archived_tasks", args=(to_do_list.pk,),
+        ), parameters)
+
+    def test_done_at_follows_state(self):
+        for new_state in (1, 0):
+            self.client.post(reverse("api:change_task_state"), {
+                "task_id": self.first_task.pk, "new_state": new_state,
+            })
+            self.first_task.refresh_from_db()
+            self.assertEqual(self.first_task.done_at is not None, new_state)
+
+    def test_archiving_old_done_tasks(self):
+        self.client.post(reverse("api:change_task_state"), {
+            "task_id": self.first_task.pk, "new_state": 1,
+        })
+        output = io.StringIO()
+        call_command("archive_tasks", "--chunk-size", "2", stdout=output)
+        self.assertIn("Archived 3 tasks", output.getvalue())
+        self.assertEqual(
+            [task["title"] for task in self.get_contents().json()],
+            [self.first_task.title],
+        )
+        self.first_to_do_list.refresh_from_db()
+        self.assertEqual(
+            (self.first_to_do_list.task_count,
+             self.first_to_do_list.done_count),
+            (1, 1),
+        )
+
+    def get_contents(self):
+        return self.client.get(reverse(
+            "api:get_to_do_list_contents", args=(self.first_to_do_list.pk,),
+        ))
+
+    def test_archived_tasks_are_paginated(self):
+        call_command("archive_tasks", stdout=io.StringIO())
+        titles = []
+        parameters = {"limit": 2, "fields": "title"}
+        while True:
+            response = self.get_archived_tasks(
+                self.first_to_do_list, **parameters,
+            )
+            self.assertOk(response)
+            page = response.json()
+            titles.extend(task["title"] for task in page["results"])
+            if page["next"] is None:
+                break
+            parameters["after"] = page["next"]
+        self.assertEqual(
+            sorted(titles), [f"Done task {number}" for number in range(3)],
+        )
+        self.assertForbidden(self.get_archived_tasks(self.second_to_do_list))
+
+    def test_archived_tasks_are_paginated_by_default(self):
+        page = self.get_archived_tasks(self.first_to_do_list).json()
+        self.assertEqual(page, {"results": [], "next": None})
+
+
+class TransferTests(TasksFixture, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # noinspection PyUnresolvedReferences
+        models.Task.objects.create(
+            title="Done task", is_done=True, order=2,
+            to_do_list=self.first_to_do_list,
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def export(self, file_name, *args):
+        path = os.path.join(self.directory.name, file_name)
+        call_command(
+            "export_lists", "--output", path, *args, stdout=io.StringIO(),
+        )
+        return path
+
+    def test_export(self):
+        with open(self.export("lists.ndjson", "--user", "first")) as file:
+            lines = [json.loads(line) for line in file]
+        self.assertEqual(lines, [
+            {
+                "type": "to_do_list", "id": self.first_to_do_list.pk,
+                "title": self.first_to_do_list.title, "owner": "first",
+            },
+            {
+                "type": "task", "to_do_list": self.first_to_do_list.pk,
+                "title": self.first_task.title, "is_done": False,
+            },
+            {
+                "type": "task", "to_do_list": self.first_to_do_list.pk,
+                "title": "Done task", "is_done": True,
+            },
+        ])
+
+    def test_gzipped_round_trip(self):
+        path = self.export("lists.ndjson.gz")
+        with open(path, "rb") as file:
+            self.assertEqual(file.read(2), transfer.GZIP_MAGIC_NUMBER)
+        output = io.StringIO()
+        call_command(
+            "import_lists", path, "--owner", "second", "--chunk-size", "1",
+            stdout=output,
+        )
+        self.assertIn("Imported 2 to-do lists and 3 tasks", output.getvalue())
+        # noinspection PyUnresolvedReferences
+        imported_to_do_lists = models.ToDoList.objects.filter(
+            owner=self.second_user,
+        ).exclude(pk=self.second_to_do_list.pk).order_by("pk")
+        self.assertEqual([
+            (
+                to_do_list.title, to_do_list.task_count,
+                to_do_list.done_count, [
+                    (task.title, task.is_done)
+                    for task in to_do_list.task_set.all()
+                ],
+            )
+            for to_do_list in imported_to_do_lists
+        ], [
+            (self.first_to_do_list.title, 2, 1, [
+                ("Done task", True), (self.first_task.title, False),
+            ]),
+            (self.second_to_do_list.title, 1, 0, [
+                (self.second_task.title, False),
+            ]),
+        ])
+
+    def test_import_of_tasks_without_their_to_do_list(self):
+        path = os.path.join(self.directory.name, "lists.ndjson")
+        with open(path, "w") as file:
+            file.write(json.dumps({
+                "type": "task", "to_do_list": 1, "title": "Task",
+                "is_done": False,
+            }))
+        with self.assertRaisesRegex(CommandError, "^Line 1: "):
+            call_command("import_lists", path, stdout=io.StringIO())
+
+
+class QueryBudgetTests(QueryBudgetMixin, TasksFixture, TestCase):
+    # With the session, and the user, which the users cache loads with the
+    # first request of every test
+    query_budgets = {
+        "get_to_do_lists": 3,
+        "get_to_do_list_contents": 3,
+        "create_to_do_list": 3,
+        "rename_to_do_list": 5,
+        "delete_to_do_list": 7,
+        "create_task": 11,
+        "rename_task": 6,
+        "change_task_state": 6,
+        "reorder_task": 9,
+        "delete_task": 7,
+        "batch_tasks": 13,
+        "search": 3,
+        "get_archived_tasks": 3,
+    }
+    row_lock_budgets = {
+        "delete_to_do_list": 1,
+        "rename_task": 1,
+        "change_task_state": 1,
+        "reorder_task": 1,
+        "delete_task": 1,
+        "batch_tasks": 1,
+    }
+
+    def setUp(self):
+        super().setUp()
+        users_cache.clear()
+        self.client.force_login(self.first_user)
+
+    def request(self, url_name, data=None, method="post", **kwargs):
+        with self.assertWithinQueryBudget(url_name):
+            response = getattr(self.client, method)(
+                reverse(f"api:{url_name}", kwargs=kwargs), data,
+            )
+        self.assertOk(response)
+        return response
+
+    def test_read_endpoints(self):
+        self.request("get_to_do_lists", method="get")
+        self.request(
+            "get_to_do_list_contents", method="get",
+            to_do_list_id=self.first_to_do_list.pk,
+        )
+        self.request("search", {"q": "task"}, method="get")
+        self.request(
+            "get_archived_tasks", method="get",
+            to_do_list_id=self.first_to_do_list.pk,
+        )
+
+    def test_to_do_list_endpoints(self):
+        to_do_list_id = self.request("create_to_do_list", {
+            "title": "New to-do list",
+        }).json()["id"]
+        self.request("rename_to_do_list", {
+            "to_do_list_id": to_do_list_id, "new_title": "Renamed",
+        })
+        self.request("delete_to_do_list", {"to_do_list_id": to_do_list_id})
+
+    def test_task_endpoints(self):
+        task_id = self.request("create_task", {
+            "title": "New task", "to_do_list_id": self.first_to_do_list.pk,
+        }).json()["id"]
+        self.request("rename_task", {
+            "task_id": task_id, "new_title": "Renamed",
+        })
+        self.request("change_task_state", {
+            "task_id": task_id, "new_state": 1,
+        })
+        self.request("reorder_task", {"task_id": task_id, "new_order": 1})
+        self.request("delete_task", {"task_id": task_id})
+        self.request("batch_tasks", {"operations": json.dumps([
+            {
+                "action": "create", "title": "new task",
+                "to_do_list_id": self.first_to_do_list.pk,
+            },
+            {
+                "action": "change_state", "task_id": self.first_task.pk,
+                "new_state": 1,
+            },
+        ])})
+
+    def test_instrumentation_headers(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("api:get_to_do_lists"))
+        self.assertEqual(response["X-SQL-Queries"], str(len(queries)))
+        self.assertIn('desc="', response["Server-Timing"])
+        self.assertRegex(response["X-SQL-Slowest"], r"^\d+\.\d{3} \S")
+
+    @override_settings(
+        SQL_INSTRUMENTATION_HEADERS=False, SQL_INSTRUMENTATION_LOG=True,
+    )
+    def test_instrumentation_log(self):
+        with self.assertLogs("to_do_list.sql", "INFO") as logs:
+            response = self.client.get(reverse("api:get_to_do_lists"))
+        self.assertNotIn("X-SQL-Queries", response)
+        [record] = logs.records
+        self.assertEqual(record.view, "api:get_to_do_lists")
+        self.assertIn("view=api:get_to_do_lists method=GET status=200 ",
+                      record.getMessage())
+
+
+class AdminTests(QueryBudgetMixin, TasksFixture, TestCase):
+    query_budgets = {"admin:api_task_changelist": 4}
+
+    def setUp(self):
+        super().setUp()
+        # noinspection PyUnresolvedReferences
+        models.ToDoList.objects.bump_version(
+            **models.get_recounted_task_counters()
+        )
+        self.client.force_login(User.objects.create_superuser("admin"))
+
+    def get_changelist(self, **query):
+        return self.client.get(
+            reverse("admin:api_task_changelist"), query,
+        )
+
+    def act(self, action, task_ids, **data):
+        return self.client.post(reverse("admin:api_task_changelist"), {
+            "action": action, helpers.ACTION_CHECKBOX_NAME: task_ids, **data,
+        })
+
+    def get_counters(self, to_do_list):
+        to_do_list.refresh_from_db()
+        return to_do_list.done_count, to_do_list.task_count
+
+    def test_changelist_queries_dont_grow_with_tasks(self):
+        with self.assertWithinQueryBudget("admin:api_task_changelist"):
+            self.assertOk(self.get_changelist())
+        # noinspection PyUnresolvedReferences
+        models.Task.objects.bulk_create(
+            models.Task(
+                title=f"Task {task_number}", order=task_number,
+                to_do_list=to_do_list,
+            )
+            for task_number in range(10)
+            for to_do_list in (self.first_to_do_list, self.second_to_do_list)
+        )
+        with self.assertWithinQueryBudget("admin:api_task_changelist"):
+            response = self.get_changelist()
+        self.assertContains(
+            response, f'href="?owner={self.second_user.pk}"',
+        )
+
+    def test_owner_filter(self):
+        response = self.get_changelist(owner=self.second_user.pk)
+        self.assertEqual(
+            list(response.context["cl"].result_list),
+            [self.second_task],
+        )
+
+    def test_estimated_count(self):
+        with mock.patch.object(api_admin, "ESTIMATED_COUNT_THRESHOLD", 1):
+            # MAX(rowid) on SQLite, which is at least the amount of rows
+            self.assertGreaterEqual(
+                self.get_changelist().context["cl"].result_count, 2,
+            )
+            self.assertEqual(self.get_changelist(
+                owner=self.first_user.pk,
+            ).context["cl"].result_count, 1)
+
+    def test_mark_done(self):
+        self.act("mark_done", [self.first_task.pk, self.second_task.pk])
+        self.assertEqual(self.get_counters(self.first_to_do_list), (1, 1))
+        self.assertEqual(self.get_counters(self.second_to_do_list), (1, 1))
+        self.act("mark_not_done", [self.first_task.pk])
+        self.assertEqual(self.get_counters(self.first_to_do_list), (0, 1))
+
+    def test_move_to_to_do_list(self):
+        self.act(
+            "move_to_to_do_list", [self.second_task.pk],
+            to_do_list=self.first_to_do_list.pk,
+        )
+        self.assertEqual(
+            list(self.first_to_do_list.task_set.all()),
+            [self.second_task, self.first_task],
+        )
+        self.assertEqual(self.get_counters(self.first_to_do_list), (0, 2))
+        self.assertEqual(self.get_counters(self.second_to_do_list), (0, 0))
+
+    def test_delete_in_bulk(self):
+        response = self.act(
+            "delete_in_bulk", [self.first_task.pk], select_across=1,
+        )
+        self.assertContains(response, "delete 2 tasks?")
+        with CaptureQueriesContext(connection) as queries:
+            self.act(
+                "delete_in_bulk", [self.first_task.pk], post="yes",
+            )
+        self.assertEqual(sum(
+            query["sql"].startswith('DELETE FROM "api_task"')
+            for query in queries
+        ), 1)
+        # noinspection PyUnresolvedReferences
+        self.assertFalse(
+            models.Task.objects.filter(pk=self.first_task.pk).exists()
+        )
+        self.assertEqual(self.get_counters(self.first_to_do_list), (0, 0))
+
+    def test_to_do_list_bookkeeping_fields_are_read_only(self):
+        self.first_to_do_list.refresh_from_db()
+        response = self.client.post(reverse(
+            "admin:api_todolist_change", args=(self.first_to_do_list.pk,)
+        ), {
+            "title": "renamed", "owner": self.first_user.pk,
+            "version": 0, "next_order": 0, "task_count": 5, "done_count": 5,
+        })
+        self.assertEqual(response.status_code, http.HTTPStatus.FOUND)
+        # noinspection PyUnresolvedReferences
+        to_do_list = models.ToDoList.objects.get(pk=self.first_to_do_list.pk)
+        self.assertEqual(to_do_list.title, "renamed")
+        self.assertEqual(
+            (
+                to_do_list.version, to_do_list.next_order,
+                to_do_list.task_count, to_do_list.done_count,
+            ),
+            (
+                self.first_to_do_list.version,
+                self.first_to_do_list.next_order, 1, 0,
+            ),
+        )
+
+
+class SearchTests(TasksFixture, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.first_user)
+
+    def search(self, text, **query):
+        response = self.client.get(reverse("api:search"), {"q": text, **query})
+        self.assertOk(response)
+        return response.json()
+
+    def get_hits(self, text):
+        return [
+            (hit["type"], hit["id"]) for hit in self.search(text)["results"]
+        ]
+
+    def test_hits_are_scoped_to_the_user(self):
+        self.assertEqual(self.get_hits("belongs"), [
+            ("task", self.first_task.pk),
+        ])
+        self.assertEqual(self.get_hits("first to-do"), [
+            ("to_do_list", self.first_to_do_list.pk),
+            ("task", self.first_task.pk),
+        ])
+        self.assertEqual(self.get_hits("second"), [])
+
+    def test_index_follows_changes(self):
+        task_id = self.client.post(reverse("api:create_task"), {
+            "title": "Water the plants",
+            "to_do_list_id": self.first_to_do_list.pk,
+        }).json()["id"]
+        self.assertEqual(self.get_hits("wat plan"), [("task", task_id)])
+        self.client.post(reverse("api:rename_task"), {
+            "task_id": task_id, "new_title": "Feed the cat",
+        })
+        self.assertEqual(self.get_hits("plants"), [])
+        self.assertEqual(self.get_hits("cat"), [("task", task_id)])
+        self.client.post(reverse("api:delete_task"), {"task_id": task_id})
+        self.assertEqual(self.get_hits("cat"), [])
+        self.client.post(reverse("api:rename_to_do_list"), {
+            "to_do_list_id": self.first_to_do_list.pk, "new_title": "Home",
+        })
+        self.assertEqual(self.get_hits("home"), [
+            ("to_do_list", self.first_to_do_list.pk),
+        ])
+        self.client.post(reverse("api:delete_to_do_list"), {
+            "to_do_list_id": self.first_to_do_list.pk,
+        })
+        self.assertEqual(self.get_hits("home"), [])
+        self.assertEqual(self.get_hits("belongs"), [])
+
+    @skipUnless(connection.vendor == "sqlite", "PostgreSQL keeps diacritics")
+    def test_diacritics_are_ignored(self):
+        task_id = self.client.post(reverse("api:create_task"), {
+            "title": "Update the résumé",
+            "to_do_list_id": self.first_to_do_list.pk,
+        }).json()["id"]
+        for text in ("resu", "resume", "résumé", "RESUMÉ", "update resume"):
+            self.assertEqual(self.get_hits(text), [("task", task_id)])
+        self.assertEqual(self.get_hits("resumes"), [])
+
+    def test_index_follows_owner_changes(self):
+        self.second_to_do_list.owner = self.first_user
+        self.second_to_do_list.save()
+        self.assertEqual(self.get_hits("second"), [
+            ("to_do_list", self.second_to_do_list.pk),
+            ("task", self.second_task.pk),
+        ])
+
+    def test_pages(self):
+        # noinspection PyUnresolvedReferences
+        models.Task.objects.bulk_create(
+            models.Task(
+                title=f"Page task {task_number}", order=task_number,
+                to_do_list=self.first_to_do_list,
+            )
+            for task_number in range(3)
+        )
+        first_page = self.search("page", limit=2)
+        second_page = self.search("page", limit=2, after=first_page["next"])
+        self.assertEqual(len(first_page["results"]), 2)
+        self.assertEqual(len(second_page["results"]), 1)
+        self.assertIsNone(second_page["next"])
+
+    def test_queries_without_words(self):
+        self.assertEqual(self.search('"*) OR :')["results"], [])
+        self.assertBadRequest(self.client.get(reverse("api:search")))
+        self.assertBadRequest(self.client.get(
+            reverse("api:search"), {"q": "task", "after": "-1"},
+        ))
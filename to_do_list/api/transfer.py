@@ -0,0 +1,192 @@
+"""
+Export and import of to-do lists as NDJSON, used by the export_lists and
+import_lists commands.
+
+Every line is a JSON object. A to-do list is followed by its tasks, from the
+bottom of the list to its top:
+
+    {"type": "to_do_list", "id": 1, "title": "Home", "owner": "alice"}
+    {"type": "task", "to_do_list": 1, "title": "Dishes", "is_done": false}
+
+The ids are the ones of the exporting database, and are only used to tell
+which to-do list the tasks belong to. Both sides stream the rows, so memory
+doesn't grow with the amount of tasks.
+"""
+import contextlib
+import gzip
+import json
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.db.models import F
+
+from . import caching, events, models, task_ordering
+from .json_encoding import orjson, orjson_dumps
+
+GZIP_MAGIC_NUMBER = b"\x1f\x8b"
+EXPORT_CHUNK_SIZE = 2000
+
+loads = json.loads if orjson is None else orjson.loads
+
+
+@contextlib.contextmanager
+def open_output(path, compress):
+    """Opens the path, or stdout for "-", for writing bytes"""
+    with (
+        open(sys.stdout.fileno(), "wb", closefd=False) if path == "-"
+        else open(path, "wb")
+    ) as file:
+        if compress:
+            with gzip.GzipFile(fileobj=file, mode="wb") as output:
+                yield output
+        else:
+            yield file
+
+
+@contextlib.contextmanager
+def open_input(path):
+    """
+    Opens the path, or stdin for "-", for reading bytes, decompressed if it
+    is gzipped
+    """
+    with (
+        open(sys.stdin.fileno(), "rb", closefd=False) if path == "-"
+        else open(path, "rb")
+    ) as file:
+        if file.peek(len(GZIP_MAGIC_NUMBER)).startswith(GZIP_MAGIC_NUMBER):
+            with gzip.GzipFile(fileobj=file, mode="rb") as input_file:
+                yield input_file
+        else:
+            yield file
+
+
+def generate_records(to_do_lists):
+    """Yields the encoded lines of the to-do lists and their tasks"""
+    to_do_lists = to_do_lists.order_by("pk").values_list(
+        "pk", "title", "owner__username",
+    )
+    for to_do_list_id, title, owner in to_do_lists.iterator(
+        chunk_size=EXPORT_CHUNK_SIZE,
+    ):
+        yield orjson_dumps({
+            "type": "to_do_list", "id": to_do_list_id, "title": title,
+            "owner": owner,
+        }) + b"\n"
+        tasks = task_ordering.get_tasks_in_ascending_order(
+            to_do_list_id,
+        ).values_list("title", "is_done")
+        for title, is_done in tasks.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield orjson_dumps({
+                "type": "task", "to_do_list": to_do_list_id, "title": title,
+                "is_done": is_done,
+            }) + b"\n"
+
+
+class Importer:
+    """
+    Creates the to-do lists and tasks of the lines given to import_line(),
+    with the tasks saved chunk_size at a time. finish() saves the rest.
+
+    Tasks get orders from their to-do list's counter, like tasks created one
+    by one on the top of the list, so they keep the order of the lines
+    """
+
+    def __init__(self, chunk_size, owner=None):
+        self.chunk_size = chunk_size
+        # Owner of all to-do lists, instead of the ones from the lines
+        self.owner = owner
+        self.owners = {}
+        # Ids of the created to-do lists by the ids in the lines
+        self.to_do_list_ids = {}
+        self.to_do_list = None
+        self.tasks = []
+        self.to_do_lists_amount = 0
+        self.tasks_amount = 0
+
+    def get_owner(self, username):
+        if self.owner is not None:
+            return self.owner
+        if username not in self.owners:
+            try:
+                self.owners[username] = User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(
+                    f"User {username!r} doesn't exist, use --owner to import "
+                    f"the to-do lists to another user."
+                )
+        return self.owners[username]
+
+    def import_line(self, line, line_number):
+        try:
+            record = loads(line)
+            record_type = record["type"]
+            if record_type == "to_do_list":
+                self.create_to_do_list(record)
+            elif record_type == "task":
+                self.add_task(record)
+            else:
+                raise CommandError(f"Unknown type {record_type!r}.")
+        except (ValueError, KeyError, TypeError, CommandError) as error:
+            raise CommandError(f"Line {line_number}: {error}")
+
+    def create_to_do_list(self, record):
+        self.save_tasks()
+        # noinspection PyUnresolvedReferences
+        self.to_do_list = models.ToDoList.objects.create(
+            title=record["title"], owner=self.get_owner(record["owner"]),
+        )
+        self.to_do_list_ids[record["id"]] = self.to_do_list.pk
+        self.to_do_lists_amount += 1
+        events.publish_to_do_list_event(
+            "created", self.to_do_list, title=self.to_do_list.title,
+        )
+        caching.invalidate_after_change(self.to_do_list.owner_id)
+
+    def add_task(self, record):
+        if (
+            self.to_do_list is None
+            or self.to_do_list_ids.get(record["to_do_list"])
+            != self.to_do_list.pk
+        ):
+            raise CommandError(
+                "A task must follow its to-do list or the tasks before it."
+            )
+        is_done = bool(record["is_done"])
+        # noinspection PyUnresolvedReferences
+        self.tasks.append(models.Task(
+            title=record["title"], is_done=is_done,
+            done_at=models.get_done_at(is_done), to_do_list=self.to_do_list,
+        ))
+        if len(self.tasks) >= self.chunk_size:
+            self.save_tasks()
+
+    def save_tasks(self):
+        if not self.tasks:
+            return
+        with transaction.atomic():
+            first_order = task_ordering.allocate_orders(
+                self.to_do_list, amount=len(self.tasks),
+            )
+            for task_number, task in enumerate(self.tasks):
+                task.order = (
+                    first_order + task_number * task_ordering.ORDER_GAP
+                )
+            # noinspection PyUnresolvedReferences
+            models.Task.objects.bulk_create(self.tasks)
+            # noinspection PyUnresolvedReferences
+            models.ToDoList.objects.filter(
+                pk=self.to_do_list.pk,
+            ).bump_version(
+                task_count=F("task_count") + len(self.tasks),
+                done_count=F("done_count") + sum(
+                    task.is_done for task in self.tasks
+                ),
+            )
+            caching.invalidate_after_change(self.to_do_list.owner_id)
+        self.tasks_amount += len(self.tasks)
+        self.tasks = []
+
+    def finish(self):
+        self.save_tasks()
@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
+
+# The views that have coroutine versions
+hot_views = async_views if settings.ASYNC_API_VIEWS else views
 
 app_name = "api"
 urlpatterns = [
@@ -13,19 +17,38 @@ urlpatterns = [
         name="delete_to_do_list",
     ),
     path(
-        "to_do_lists/", views.get_to_do_lists, name="get_to_do_lists",
+        "to_do_lists/", hot_views.get_to_do_lists, name="get_to_do_lists",
     ),
     path(
-        "to_do_lists/<int:to_do_list_id>/", views.get_to_do_list_contents,
+        "to_do_lists/<int:to_do_list_id>/",
+        hot_views.get_to_do_list_contents,
         name="get_to_do_list_contents",
     ),
+    path(
+        "to_do_lists/<int:to_do_list_id>/archive/",
+        views.get_archived_tasks, name="get_archived_tasks",
+    ),
+    path(
+        "to_do_lists/events/", async_views.get_to_do_lists_events,
+        name="get_to_do_lists_events",
+    ),
+    path(
+        "to_do_lists/<int:to_do_list_id>/events/",
+        async_views.get_to_do_list_events,
+        name="get_to_do_list_events",
+    ),
     path("tasks/delete/", views.delete_task, name="delete_task"),
     path("tasks/create/", views.create_task, name="create_task"),
     path("tasks/reorder/", views.reorder_task, name="reorder_task"),
     path(
-        "tasks/change_state/", views.change_task_state,
+        "tasks/change_state/", hot_views.change_task_state,
         name="change_task_state",
     ),
-    path("tasks/rename/", views.rename_task, name="rename"),
-    path("to_do_lists/rename/", views.rename_to_do_list, name="rename"),
+    path("tasks/rename/", views.rename_task, name="rename_task"),
+    path("tasks/batch/", views.batch_tasks, name="batch_tasks"),
+    path("search/", views.search, name="search"),
+    path(
+        "to_do_lists/rename/", views.rename_to_do_list,
+        name="rename_to_do_list",
+    ),
 ]
@@ -1,50 +1,112 @@
+import asyncio
 import functools
 import http
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404
+from django.utils.cache import get_conditional_response as get_304_response
+from django.utils.cache import patch_cache_control
+from django.utils.http import quote_etag
 
 from . import models
+from .json_encoding import FastJsonResponse
 
 UNACCESSIBLE_TASK_ERROR_TEXT = "This task is not yours!"
 UNACCESSIBLE_TO_DO_LIST_ERROR_TEXT = "This to-do list is not yours!"
 
 
-def receiver_decorators_factory(checker, error_text, model_class):
+def get_owned_object_or_error(
+    request, model_class, owner_id_lookup, error_text, object_id,
+):
+    """
+    Fetches the object and checks that it belongs to the current user in one
+    query. Only when the check fails, another query is made to tell a missing
+    object (404) from somebody else's object (403).
+    """
+    # noinspection PyUnresolvedReferences
+    objects = model_class.objects
+    try:
+        return objects.get(
+            pk=object_id, **{owner_id_lookup: request.user.id}
+        )
+    except model_class.DoesNotExist:
+        if objects.filter(pk=object_id).exists():
+            raise JsonException(
+                error_text, http.HTTPStatus.FORBIDDEN,
+            ) from None
+        raise Http404(
+            f"No {model_class._meta.object_name} matches the given query."
+        ) from None
+
+
+def get_owned_objects_or_error(
+    request, model_class, owner_id_lookup, error_text, object_ids,
+):
+    """
+    Like get_owned_object_or_error, but for many objects at once. Returns a
+    dict of the objects by their ids.
+    """
+    object_ids = set(object_ids)
+    # noinspection PyUnresolvedReferences
+    objects = model_class.objects
+    owned_objects = objects.filter(
+        pk__in=object_ids, **{owner_id_lookup: request.user.id}
+    ).in_bulk()
+    if len(owned_objects) != len(object_ids):
+        missing_ids = object_ids - owned_objects.keys()
+        if objects.filter(pk__in=missing_ids).exists():
+            raise JsonException(error_text, http.HTTPStatus.FORBIDDEN)
+        raise Http404(
+            f"No {model_class._meta.object_name} matches the given query."
+        )
+    return owned_objects
+
+
+def receiver_decorators_factory(owner_id_lookup, error_text, model_class):
     def post_field_setter(request_type, field_name):
         request_type = request_type.upper()
 
+        def get_object(request, kwargs):
+            if request_type == "GET":
+                database_entry_id = kwargs.pop(field_name)
+            else:
+                [database_entry_id] = validate_post_integers(
+                    request, field_name,
+                )
+            return get_owned_object_or_error(
+                request, model_class, owner_id_lookup, error_text,
+                database_entry_id,
+            )
+
         def decorator(function):
+            if asyncio.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def async_wrapper(request, *args, **kwargs):
+                    object_ = await sync_to_async(get_object)(request, kwargs)
+                    return await function(request, object_, *args, **kwargs)
+                return async_wrapper
+
             @functools.wraps(function)
             def wrapper(request, *args, **kwargs):
-                if request_type == "GET":
-                    database_entry_id = kwargs.pop(field_name)
-                else:
-                    [database_entry_id] = validate_post_integers(
-                        request, field_name,
-                    )
-                object_ = get_object_or_404(
-                    model_class, pk=database_entry_id
-                )
-                if checker(request, object_):
-                    return function(request, object_, *args, **kwargs)
-                else:
-                    return JsonResponse(
-                        {"error": error_text}, status=http.HTTPStatus.FORBIDDEN
-                    )
+                object_ = get_object(request, kwargs)
+                return function(request, object_, *args, **kwargs)
             return wrapper
         return decorator
     return post_field_setter
 
 
+TO_DO_LIST_OWNER_ID_LOOKUP = "owner_id"
+TASK_OWNER_ID_LOOKUP = "to_do_list__owner_id"
+
 receive_to_do_list = receiver_decorators_factory(
     error_text=UNACCESSIBLE_TO_DO_LIST_ERROR_TEXT, model_class=models.ToDoList,
-    checker=lambda request, to_do_list: request.user == to_do_list.owner,
+    owner_id_lookup=TO_DO_LIST_OWNER_ID_LOOKUP,
 )
 receive_task = receiver_decorators_factory(
     error_text=UNACCESSIBLE_TASK_ERROR_TEXT, model_class=models.Task,
-    checker=lambda request, task: request.user == task.to_do_list.owner,
+    owner_id_lookup=TASK_OWNER_ID_LOOKUP,
 )
 
 
@@ -55,33 +117,68 @@ class JsonException(Exception):
         self.status_code = status_code
 
 
+def make_error_response(error):
+    return FastJsonResponse(
+        {"error": error.error_body}, status=error.status_code,
+    )
+
+
 def with_json_exceptions(function):
+    if asyncio.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def async_wrapper(request, *args, **kwargs):
+            try:
+                return await function(request, *args, **kwargs)
+            except JsonException as error:
+                return make_error_response(error)
+        return async_wrapper
+
     @functools.wraps(function)
     def wrapper(request, *args, **kwargs):
         try:
             return function(request, *args, **kwargs)
         except JsonException as error:
-            return JsonResponse(
-                {"error": error.error_body}, status=error.status_code
-            )
+            return make_error_response(error)
+    return wrapper
+
+
+def async_login_required(function):
+    """login_required for coroutine views"""
+    @functools.wraps(function)
+    async def wrapper(request, *args, **kwargs):
+        # Loading the user touches the session and the database
+        if await sync_to_async(lambda: request.user.is_authenticated)():
+            return await function(request, *args, **kwargs)
+        return redirect_to_login(request.get_full_path())
     return wrapper
 
 
 def with_json_exceptions_and_required_login(function):
+    if asyncio.iscoroutinefunction(function):
+        return async_login_required(with_json_exceptions(function))
     return login_required(with_json_exceptions(function))
 
 
-def validate_post_integers(request, *field_names):
+def validate_integers(fields, *field_names):
     integers = []
     for field_name in field_names:
         try:
-            integers.append(int(request.POST[field_name]))
+            field_contents = fields[field_name]
         except KeyError:
             raise JsonException(
                 f"{field_name} is not specified!",
                 http.HTTPStatus.BAD_REQUEST,
             ) from None
-        except ValueError:
+        try:
+            # Fields parsed from JSON can be booleans and fractions, which
+            # int() would take
+            if isinstance(field_contents, bool) or (
+                isinstance(field_contents, float)
+                and not field_contents.is_integer()
+            ):
+                raise ValueError
+            integers.append(int(field_contents))
+        except (TypeError, ValueError):
             raise JsonException(
                 f"{field_name} is invalid!",
                 http.HTTPStatus.BAD_REQUEST,
@@ -89,16 +186,21 @@ def validate_post_integers(request, *field_names):
     return integers
 
 
-def validate_post_strings(request, *field_names):
+def validate_strings(fields, *field_names):
     strings = []
     for field_name in field_names:
         try:
-            field_contents = request.POST[field_name]
+            field_contents = fields[field_name]
         except KeyError:
             raise JsonException(
                 f"{field_name} is not specified!",
                 http.HTTPStatus.BAD_REQUEST,
             ) from None
+        if not isinstance(field_contents, str):
+            raise JsonException(
+                f"{field_name} is invalid!",
+                http.HTTPStatus.BAD_REQUEST,
+            )
         if not field_contents:
             raise JsonException(
                 f"{field_name} is empty!",
@@ -106,3 +208,46 @@ def validate_post_strings(request, *field_names):
             ) from None
         strings.append(field_contents)
     return strings
+
+
+def validate_post_integers(request, *field_names):
+    return validate_integers(request.POST, *field_names)
+
+
+def validate_post_strings(request, *field_names):
+    return validate_strings(request.POST, *field_names)
+
+
+def validate_task_state(new_state):
+    if new_state not in (0, 1):
+        raise JsonException(
+            "new_state should be between 0 and 1!", http.HTTPStatus.BAD_REQUEST,
+        )
+
+
+def make_etag(*parts):
+    return quote_etag(".".join(str(part) for part in parts))
+
+
+def get_not_modified_response(request, etag):
+    """Returns None if the client doesn't have the current representation"""
+    return get_304_response(request, etag=etag)
+
+
+def add_etag(response, etag):
+    """Clients are asked to revalidate before reusing what they've stored"""
+    if response.status_code == http.HTTPStatus.OK:
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def get_conditional_response(request, etag, make_response):
+    """
+    Answers with 304 if the client already has the representation with this
+    ETag, otherwise returns make_response() with the ETag attached
+    """
+    not_modified_response = get_not_modified_response(request, etag)
+    if not_modified_response is not None:
+        return not_modified_response
+    return add_etag(make_response(), etag)
@@ -1,15 +1,21 @@
 import http
 
 from django.db import transaction
-from django.db.models import F, Max
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
+from django.db.models import F
 
-from . import models, view_utils
+from . import (
+    batch, caching, events, full_text_search, models, pagination, streaming,
+    task_filtering, task_ordering, view_utils,
+)
+from .json_encoding import FastJsonResponse, Rows
 from .view_utils import (
     receive_to_do_list, receive_task, with_json_exceptions_and_required_login
 )
 
+TO_DO_LIST_FIELDS = ("id", "title", "task_count", "done_count")
+TASK_FIELDS = ("id", "title", "is_done", "order")
+ARCHIVED_TASK_FIELDS = ("id", "task_id", "title", "done_at", "archived_at")
+
 
 @with_json_exceptions_and_required_login
 def create_to_do_list(request):
@@ -18,48 +24,107 @@ def create_to_do_list(request):
     to_do_list = models.ToDoList.objects.create(
         title=to_do_list_title, owner=request.user,
     )
-    return JsonResponse({
+    events.publish_to_do_list_event(
+        "created", to_do_list, title=to_do_list.title,
+    )
+    return FastJsonResponse({
         "id": to_do_list.pk,
     })
 
 
 @with_json_exceptions_and_required_login
 def get_to_do_lists(request):
-    return JsonResponse([
-        {"id": to_do_list.pk, "title": to_do_list.title}
-        for to_do_list in request.user.todolist_set.all()
-    ], safe=False)
+    etag = view_utils.make_etag(
+        "to_do_lists", caching.get_version(request.user.id),
+    )
+    return view_utils.get_conditional_response(request, etag, lambda: (
+        FastJsonResponse(caching.get_to_do_lists(
+            request, lambda: get_to_do_lists_rows(request),
+        ), safe=False)
+    ))
+
+
+def get_to_do_lists_rows(request):
+    return pagination.get_rows(
+        request, request.user.todolist_set.all(),
+        allowed_fields=TO_DO_LIST_FIELDS, cursor_fields=("-id",),
+    )
 
 
 @with_json_exceptions_and_required_login
 @receive_to_do_list("post", "to_do_list_id")
 def delete_to_do_list(_request, to_do_list):
-    to_do_list.delete()
-    return JsonResponse({})
+    with transaction.atomic():
+        # Before the tasks, which are deleted first
+        task_ordering.lock_to_do_list(to_do_list)
+        events.publish_to_do_list_event("deleted", to_do_list)
+        to_do_list.delete()
+    return FastJsonResponse({})
+
+
+@with_json_exceptions_and_required_login
+@receive_to_do_list("get", "to_do_list_id")
+def get_to_do_list_contents(request, to_do_list):
+    etag = view_utils.make_etag(to_do_list.pk, to_do_list.version)
+    return view_utils.get_conditional_response(
+        request, etag, lambda: make_to_do_list_contents_response(
+            request, to_do_list,
+        ),
+    )
+
+
+def make_to_do_list_contents_response(request, to_do_list):
+    stream_format = streaming.validate_stream_format(request)
+    tasks, cursor_fields = task_filtering.filter_tasks(
+        request, to_do_list.task_set.all(),
+    )
+    if stream_format is not None:
+        return streaming.make_streaming_response(
+            request, tasks, stream_format,
+            allowed_fields=TASK_FIELDS, cursor_fields=cursor_fields,
+        )
+    return FastJsonResponse(pagination.get_rows(
+        request, tasks, allowed_fields=TASK_FIELDS,
+        cursor_fields=cursor_fields,
+    ), safe=False)
 
 
 @with_json_exceptions_and_required_login
 @receive_to_do_list("get", "to_do_list_id")
-def get_to_do_list_contents(_request, to_do_list):
-    return JsonResponse([
-        {
-            "title": item.title, "is_done": item.is_done, "order": item.order,
-            "id": item.pk,
-        }
-        for item in to_do_list.task_set.all()
-    ], safe=False)
+def get_archived_tasks(request, to_do_list):
+    # The archive can be much bigger than the to-do list, so it is always
+    # returned a page at a time, the most recently archived tasks first
+    return FastJsonResponse(pagination.get_rows(
+        request, to_do_list.archivedtask_set.all(),
+        allowed_fields=ARCHIVED_TASK_FIELDS, cursor_fields=("-id",),
+        always_paginated=True,
+    ))
 
 
 @with_json_exceptions_and_required_login
 @receive_task("post", "task_id")
-def delete_task(_request, task):
+def delete_task(request, task):
     with transaction.atomic():
+        task_ordering.lock_to_do_list(task.to_do_list_id)
+        # The state that is counted, which could have changed since the task
+        # was loaded
         # noinspection PyUnresolvedReferences
-        models.Task.objects.filter(
-            to_do_list=task.to_do_list, order__gt=task.order
-        ).update(order=F("order") - 1)
+        is_done = models.Task.objects.select_for_update().filter(
+            pk=task.pk,
+        ).values_list("is_done", flat=True).first()
+        if is_done is None:
+            # Deleted in the meantime
+            return FastJsonResponse({})
+        events.publish_task_event("deleted", task)
+        # Orders are sparse, so the remaining tasks don't need to be shifted
         task.delete()
-    return JsonResponse({})
+        # noinspection PyUnresolvedReferences
+        models.ToDoList.objects.filter(pk=task.to_do_list_id).bump_version(
+            task_count=F("task_count") - 1,
+            done_count=F("done_count") - int(is_done),
+        )
+        caching.invalidate_after_change(request.user.id)
+    return FastJsonResponse({})
 
 
 @with_json_exceptions_and_required_login
@@ -68,24 +133,26 @@ def create_task(request):
     [to_do_list_id] = view_utils.validate_post_integers(
         request, "to_do_list_id"
     )
-    to_do_list = get_object_or_404(models.ToDoList, pk=to_do_list_id)
-    if to_do_list.owner != request.user:
-        raise view_utils.JsonException(
-            view_utils.UNACCESSIBLE_TO_DO_LIST_ERROR_TEXT,
-            http.HTTPStatus.FORBIDDEN,
-        )
+    to_do_list = view_utils.get_owned_object_or_error(
+        request, models.ToDoList, view_utils.TO_DO_LIST_OWNER_ID_LOOKUP,
+        view_utils.UNACCESSIBLE_TO_DO_LIST_ERROR_TEXT, to_do_list_id,
+    )
     with transaction.atomic():
-        # noinspection PyUnresolvedReferences
-        max_task_order = models.Task.objects.filter(
-            to_do_list=to_do_list,
-        ).aggregate(Max("order", default=0))["order__max"]
         # noinspection PyUnresolvedReferences
         task = models.Task.objects.create(
-            title=task_title, order=(
-                max_task_order + 1
+            title=task_title, order=task_ordering.allocate_orders(
+                to_do_list
             ), to_do_list=to_do_list,
         )
-    return JsonResponse({
+        events.publish_task_event(
+            "created", task, title=task.title, is_done=task.is_done,
+        )
+        # noinspection PyUnresolvedReferences
+        models.ToDoList.objects.filter(pk=to_do_list.pk).bump_version(
+            task_count=F("task_count") + 1,
+        )
+        caching.invalidate_after_change(request.user.id)
+    return FastJsonResponse({
         "id": task.pk,
     })
 
@@ -95,33 +162,17 @@ def reorder_task(request):
     task_id, new_order = view_utils.validate_post_integers(
         request, "task_id", "new_order",
     )
-    task = get_object_or_404(models.Task, pk=task_id)
-    if task.to_do_list.owner != request.user:
-        raise view_utils.JsonException(
-            view_utils.UNACCESSIBLE_TASK_ERROR_TEXT,
-            http.HTTPStatus.FORBIDDEN,
-        )
-    old_order = task.order
-    if old_order == new_order:
-        return JsonResponse({})
-    if old_order > new_order:
-        # Example: if moving 5 (old_order) to 2 (new_order), move elements
-        # between them (but not including the moved element, 5) up by 1
-        bias = 1
-        range_filters = {"order__gte": new_order, "order__lt": old_order}
-    else:
-        # Example: if moving 2 (old_order) to 5 (new_order), move elements
-        # between them (but not including the moved element, 2) down by 1
-        bias = -1
-        range_filters = {"order__gt": old_order, "order__lte": new_order}
+    task = view_utils.get_owned_object_or_error(
+        request, models.Task, view_utils.TASK_OWNER_ID_LOOKUP,
+        view_utils.UNACCESSIBLE_TASK_ERROR_TEXT, task_id,
+    )
     with transaction.atomic():
+        # new_order is a 1-based position counted from the bottom of the list
+        task_ordering.move_task(task, new_order)
+        events.publish_task_event("moved", task, position=new_order)
         # noinspection PyUnresolvedReferences
-        models.Task.objects.filter(
-            to_do_list=task.to_do_list, **range_filters,
-        ).update(order=F("order") + bias)
-    task.order = new_order
-    task.save()
-    return JsonResponse({})
+        models.ToDoList.objects.filter(pk=task.to_do_list_id).bump_version()
+    return FastJsonResponse({})
 
 
 @with_json_exceptions_and_required_login
@@ -129,24 +180,62 @@ def change_task_state(request):
     [task_id, new_state] = view_utils.validate_post_integers(
         request, "task_id", "new_state",
     )
-    if new_state not in (0, 1):
-        raise view_utils.JsonException(
-            "new_state should be between 0 and 1!", http.HTTPStatus.BAD_REQUEST,
-        )
-    task = get_object_or_404(models.Task, pk=task_id)
-    if task.to_do_list.owner != request.user:
-        raise view_utils.JsonException(
-            view_utils.UNACCESSIBLE_TASK_ERROR_TEXT,
-            http.HTTPStatus.FORBIDDEN,
-        )
+    view_utils.validate_task_state(new_state)
+    set_task_state(request, task_id, new_state)
+    return FastJsonResponse({})
+
+
+def set_task_state(request, task_id, new_state):
+    task = view_utils.get_owned_object_or_error(
+        request, models.Task, view_utils.TASK_OWNER_ID_LOOKUP,
+        view_utils.UNACCESSIBLE_TASK_ERROR_TEXT, task_id,
+    )
     task.is_done = bool(new_state)
-    task.save()
-    return JsonResponse({})
+    with transaction.atomic():
+        task_ordering.lock_to_do_list(task.to_do_list_id)
+        # Only a task that really changes its state changes the counter
+        # noinspection PyUnresolvedReferences
+        changed = models.Task.objects.filter(pk=task.pk).exclude(
+            is_done=task.is_done,
+        ).update(
+            is_done=task.is_done, done_at=models.get_done_at(task.is_done),
+        )
+        if changed:
+            events.publish_task_event("toggled", task, is_done=task.is_done)
+            # noinspection PyUnresolvedReferences
+            models.ToDoList.objects.filter(
+                pk=task.to_do_list_id,
+            ).bump_version(
+                done_count=F("done_count") + (1 if task.is_done else -1),
+            )
+            caching.invalidate_after_change(request.user.id)
+
+
+@with_json_exceptions_and_required_login
+def search(request):
+    [text] = view_utils.validate_strings(request.GET, "q")
+    limit = pagination.validate_limit(request)
+    offset = full_text_search.validate_offset(request)
+    # One more, to know if there is a next page
+    rows = full_text_search.search(request.user.id, text, limit + 1, offset)
+    return FastJsonResponse({
+        "results": Rows(full_text_search.RESULT_FIELDS, rows[:limit]),
+        "next": str(offset + limit) if len(rows) > limit else None,
+    })
+
+
+@with_json_exceptions_and_required_login
+def batch_tasks(request):
+    operations = batch.validate_operations(request)
+    return FastJsonResponse({
+        "results": batch.apply_operations(request, operations),
+    })
 
 
 def title_changers_generator(
     record_id_field_name, records_model, unaccessible_record_error_text,
-    ownership_checker, function_name="rename_record"
+    owner_id_lookup, event_publisher, changed_to_do_list_id_getter=None,
+    function_name="rename_record"
 ):
     def rename_record(request):
         [record_id, new_title] = view_utils.validate_post_strings(
@@ -158,14 +247,26 @@ def title_changers_generator(
             raise view_utils.JsonException(
                 "record_id is not an integer!", http.HTTPStatus.BAD_REQUEST,
             ) from None
-        record = get_object_or_404(records_model, pk=record_id)
-        if not ownership_checker(request, record):
-            raise view_utils.JsonException(
-                unaccessible_record_error_text, http.HTTPStatus.FORBIDDEN,
-            )
+        record = view_utils.get_owned_object_or_error(
+            request, records_model, owner_id_lookup,
+            unaccessible_record_error_text, record_id,
+        )
         record.title = new_title
-        record.save()
-        return JsonResponse({})
+        with transaction.atomic():
+            if changed_to_do_list_id_getter is not None:
+                task_ordering.lock_to_do_list(
+                    changed_to_do_list_id_getter(record),
+                )
+            # Only the title: the other fields could have been changed since
+            # the record was loaded
+            record.save(update_fields=["title"])
+            event_publisher("renamed", record, title=record.title)
+            if changed_to_do_list_id_getter is not None:
+                # noinspection PyUnresolvedReferences
+                models.ToDoList.objects.filter(
+                    pk=changed_to_do_list_id_getter(record),
+                ).bump_version()
+        return FastJsonResponse({})
     rename_record.__name__ = function_name
     return with_json_exceptions_and_required_login(rename_record)
 
@@ -174,15 +275,16 @@ rename_to_do_list = title_changers_generator(
     record_id_field_name="to_do_list_id", records_model=models.ToDoList,
     unaccessible_record_error_text=(
         view_utils.UNACCESSIBLE_TO_DO_LIST_ERROR_TEXT
-    ), ownership_checker=lambda request, to_do_list: (
-        request.user == to_do_list.owner
-    ), function_name="rename_to_do_list"
+    ), owner_id_lookup=view_utils.TO_DO_LIST_OWNER_ID_LOOKUP,
+    event_publisher=events.publish_to_do_list_event,
+    function_name="rename_to_do_list"
 )
 rename_task = title_changers_generator(
     record_id_field_name="task_id", records_model=models.Task,
     unaccessible_record_error_text=(
         view_utils.UNACCESSIBLE_TASK_ERROR_TEXT
-    ), ownership_checker=lambda request, task: (
-        request.user == task.to_do_list.owner
-    ), function_name="rename_task"
+    ), owner_id_lookup=view_utils.TASK_OWNER_ID_LOOKUP,
+    event_publisher=events.publish_task_event,
+    changed_to_do_list_id_getter=lambda task: task.to_do_list_id,
+    function_name="rename_task"
 )
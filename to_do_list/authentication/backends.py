@@ -0,0 +1,71 @@
+"""
+Authentication backend that keeps the users of the recent requests in memory.
+
+Every request with a session loads its user with get_user(), which is a query
+of auth_user per request with ModelBackend. Here users are kept in a
+per-process LRU cache for AUTHENTICATION_USERS_CACHE_TIMEOUT seconds. Saving
+or deleting a user drops it from the cache of the process that did it (see
+signals.py), so the timeout bounds how long other processes can use an old
+copy, e.g. one that still accepts the sessions from before a password change.
+"""
+import collections
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+
+class UsersCache:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # User id -> (expiration time, user), least recently used first
+        self.users = collections.OrderedDict()
+
+    def get(self, user_id):
+        """Returns None on a miss"""
+        with self.lock:
+            try:
+                expiration_time, user = self.users[user_id]
+            except KeyError:
+                return None
+            if expiration_time < time.monotonic():
+                del self.users[user_id]
+                return None
+            self.users.move_to_end(user_id)
+        # Requests can change their user, e.g. the backend attribute
+        return copy.copy(user)
+
+    def set(self, user_id, user):
+        with self.lock:
+            self.users[user_id] = (
+                time.monotonic() + settings.AUTHENTICATION_USERS_CACHE_TIMEOUT,
+                copy.copy(user),
+            )
+            self.users.move_to_end(user_id)
+            while len(self.users) > settings.AUTHENTICATION_USERS_CACHE_SIZE:
+                self.users.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.users.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.users.clear()
+
+
+users_cache = UsersCache()
+
+
+class CachedModelBackend(ModelBackend):
+
+    def get_user(self, user_id):
+        user = users_cache.get(user_id)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                users_cache.set(user_id, user)
+        return user
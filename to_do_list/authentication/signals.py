@@ -0,0 +1,15 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import users_cache
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    # Requests in between could cache the row from before the commit
+    users_cache.invalidate(user_id)
+    transaction.on_commit(lambda: users_cache.invalidate(user_id))
@@ -12,6 +12,65 @@ function checkAndClearSelection() {
 }
 
 
+/**
+ * Collects task operations and sends them to the batch endpoint once no new
+ * operation has come for a while. Operations with the same key replace each
+ * other, so toggling a checkbox back and forth results in one operation.
+ */
+class OperationsBatcher {
+    delay = 300;
+    url = "/api/tasks/batch/";
+
+    constructor(list) {
+        this.list = list;
+        this.operations = new Map();
+        this.timeout = undefined;
+        this.lastUniqueKey = 0;
+    }
+
+    add(operation, key=undefined) {
+        if (key === undefined) {
+            this.lastUniqueKey += 1;
+            key = `unique ${this.lastUniqueKey}`;
+        }
+        this.operations.delete(key);
+        this.operations.set(key, operation);
+        clearTimeout(this.timeout);
+        this.timeout = setTimeout(() => this.flush(), this.delay);
+    }
+
+    takeRequestForm() {
+        clearTimeout(this.timeout);
+        if (this.operations.size == 0) {
+            return undefined;
+        }
+        let requestForm = this.list.getFormDataWithCsrfToken();
+        requestForm.append(
+            "operations", JSON.stringify([...this.operations.values()]),
+        );
+        this.operations.clear();
+        return requestForm;
+    }
+
+    async flush() {
+        let requestForm = this.takeRequestForm();
+        if (requestForm !== undefined) {
+            await this.list.fetchWithShowingErrorToUser(this.url, {
+                method: "POST",
+                body: requestForm,
+            });
+        }
+    }
+
+    flushBeforeUnload() {
+        let requestForm = this.takeRequestForm();
+        if (requestForm !== undefined) {
+            navigator.sendBeacon(this.url, requestForm);
+        }
+    }
+}
+
+
 class ToDoList extends GenericList {
     readableListElementName = "task";
     postRequestsElementIdFieldName = "task_id";
@@ -19,35 +78,54 @@ class ToDoList extends GenericList {
     constructor(toDoListId) {
         super();
         this.toDoListId = toDoListId;
+        this.batcher = new OperationsBatcher(this);
+        // The id of the task whose title is being dragged
+        this.draggedRecordId = undefined;
     }
 
-    addListElement(listElement, where="afterbegin") {
-        let listItem = super.addListElement(...arguments);
+    makeListItemTemplate() {
+        let listItem = super.makeListItemTemplate();
         let checkBox = document.createElement("input");
         checkBox.type = "checkbox";
         checkBox.classList.add("checkbox");
-        checkBox.checked = listElement.is_done;
-        checkBox.addEventListener("change", this.checkBoxWasPressed.bind(this));
         listItem.prepend(checkBox);
+        let title = listItem.querySelector(".title");
+        title.draggable = "true";
+        title.classList.add("draggable");
+        return listItem;
+    }
+
+    fillListItem(listItem, record) {
+        super.fillListItem(listItem, record);
+        listItem.querySelector(".checkbox").checked = record.is_done;
+        listItem.querySelector(".title").style["text-decoration"] = (
+            record.is_done ? "line-through" : ""
+        );
     }
 
     checkBoxWasPressed(event) {
         let checkBox = event.target;
-        let listItem = checkBox.parentElement;
-        let titleElement = listItem.querySelector(".title");
-        if (checkBox.checked) {
-            titleElement.style["text-decoration"] = "line-through";
-        } else {
-            titleElement.style["text-decoration"] = "";
+        let record = this.getEventRecord(event);
+        if (record === undefined || !checkBox.matches(".checkbox")) {
+            return;
+        }
+        this.setTaskState(record, checkBox.checked);
+        this.batcher.add({
+            action: "change_state",
+            task_id: record.id,
+            new_state: +checkBox.checked,
+        }, `state of ${record.id}`);
+    }
+
+    /**
+     * Through the batcher, after the operations already queued for the task,
+     * which would fail in the same batch if the task were deleted before it
+     */
+    async deleteListElement(record) {
+        if (this.confirmDeletion()) {
+            this.batcher.add({action: "delete", task_id: record.id});
+            this.removeRecord(record);
         }
-        let request_form = new FormData();
-        request_form.append("csrfmiddlewaretoken", csrfMiddlewareToken);
-        request_form.append("new_state", +checkBox.checked);
-        request_form.append("task_id", checkBox.parentElement.dataset.record_id);
-        this.fetchWithShowingErrorToUser("/api/tasks/change_state/", {
-            method: "POST",
-            body: request_form,
-        });
     }
 
     getCreationFormData(listElementsCreationForm) {
@@ -56,10 +134,6 @@ class ToDoList extends GenericList {
         return form_data;
     }
 
-    getDeletionURL(itemId) {
-        return "/api/tasks/delete/";
-    }
-
     getCreationURL() {
         return "/api/tasks/create/";
     }
@@ -68,17 +142,33 @@ class ToDoList extends GenericList {
         return `/api/to_do_lists/${this.toDoListId}/`;
     }
 
-    makeListItemTitle(listElement) {
-        let title = document.createElement("span");
-        title.innerText = listElement.title;
-        if (listElement.is_done) {
-            title.style["text-decoration"] = "line-through";
+    getEventsURL() {
+        return `/api/to_do_lists/${this.toDoListId}/events/`;
+    }
+
+    setTaskState(record, isDone) {
+        record.is_done = isDone;
+        this.refreshRecord(record);
+    }
+
+    applyChange(change) {
+        let record = this.getRecord(change.id);
+        if (change.type == "toggled") {
+            if (record) {
+                this.setTaskState(record, change.is_done);
+            }
+        } else if (change.type == "moved") {
+            if (record) {
+                // Positions are 1-based and counted from the bottom
+                let otherTasksAmount = this.records.length - 1;
+                let tasksBelow = Math.max(0, Math.min(
+                    change.position - 1, otherTasksAmount,
+                ));
+                this.moveRecord(record, otherTasksAmount - tasksBelow);
+            }
+        } else {
+            super.applyChange(change);
         }
-        title.draggable = "true";
-        title.classList.add("draggable");
-        title.addEventListener("dragstart", this.handleDragStart.bind(this));
-        title.addEventListener("dragend", this.handleDragEnd.bind(this));
-        return title;
     }
 
     async sendEditedElementTitleToTheBackEnd(elementId, requestForm) {
@@ -91,57 +181,87 @@ class ToDoList extends GenericList {
         );
     }
 
+    /**
+     * The dragged row, which leaves the rendered rows when the page is
+     * scrolled away from it, stays in the DOM to get its dragend event
+     */
+    keepHiddenListItems(listItems, fragment) {
+        let listItem = this.listItems.get(this.draggedRecordId);
+        if (
+            listItem && !listItems.has(this.draggedRecordId)
+            && this.recordsById.has(this.draggedRecordId)
+        ) {
+            listItem.hidden = true;
+            listItems.set(this.draggedRecordId, listItem);
+            fragment.append(listItem);
+        }
+    }
+
     handleDragStart(event) {
-        if (checkAndClearSelection()) {
+        let record = this.getEventRecord(event);
+        if (record === undefined || checkAndClearSelection()) {
             return;
         }
+        this.draggedRecordId = record.id;
         event.target.classList.add("dragging");
     }
 
     handleDragOver(event) {
         event.preventDefault();
-        let list = document.getElementById(this.listElementName);
-        let listContents = list.children;
-        let draggedElement = document.querySelector(".dragging")?.parentElement;
-        if (!draggedElement) {
+        let draggedRecord = this.getRecord(this.draggedRecordId);
+        if (!draggedRecord) {
             return;
         }
-        for (let listItem of listContents) {
-            let boundingBox = listItem.getBoundingClientRect();
+        let list = document.getElementById(this.listElementName);
+        let [first, end] = this.renderedRange;
+        for (let index = first; index < end; index++) {
+            let boundingBox = list.children[
+                index - first
+            ].getBoundingClientRect();
             if (boundingBox.top <= event.clientY && event.clientY <= boundingBox.bottom) {
-                let nextSibling = listItem.nextSibling;
-                if (draggedElement.isSameNode(nextSibling)) {
-                    list.insertBefore(draggedElement, listItem);
-                } else {
-                    list.insertBefore(draggedElement, nextSibling);
+                let draggedIndex = this.records.indexOf(draggedRecord);
+                if (draggedIndex == index) {
+                    return;
                 }
+                // Before the row under the pointer if the dragged one is
+                // right below it, after it otherwise
+                this.moveRecord(draggedRecord, (
+                    draggedIndex == index + 1 ? index
+                    : draggedIndex < index ? index : index + 1
+                ));
+                // Right away, so that the next dragover sees the new rows
+                this.render();
                 return;
             }
         }
     }
 
     handleDragEnd(event) {
-        if (checkAndClearSelection()) {
+        let record = this.getRecord(this.draggedRecordId);
+        this.draggedRecordId = undefined;
+        event.target.classList.remove("dragging");
+        // Without the dragged row, if it isn't among the rendered ones
+        this.scheduleRender(true);
+        if (!record || checkAndClearSelection()) {
             return;
         }
-        event.target.classList.remove("dragging");
-        let list = document.getElementById(this.listElementName);
-        let listItem = event.target.closest("li");
-        let order = list.childElementCount - [...list.children].indexOf(listItem);
-        let requestForm = this.getFormDataWithCsrfToken();
-        console.log("record id", listItem.dataset.record_id, "new order", order);
-        requestForm.append("task_id", +listItem.dataset.record_id);
-        requestForm.append("new_order", order);
-        this.fetchWithShowingErrorToUser("/api/tasks/reorder/", {
-            method: "POST",
-            body: requestForm,
+        this.batcher.add({
+            action: "reorder",
+            task_id: record.id,
+            new_order: this.records.length - this.records.indexOf(record),
         });
     }
 
     bind() {
         super.bind();
         let list = document.getElementById(this.listElementName);
+        list.addEventListener("change", this.checkBoxWasPressed.bind(this));
+        list.addEventListener("dragstart", this.handleDragStart.bind(this));
+        list.addEventListener("dragend", this.handleDragEnd.bind(this));
         list.addEventListener("dragover", this.handleDragOver.bind(this));
+        window.addEventListener(
+            "pagehide", () => this.batcher.flushBeforeUnload(),
+        );
     }
 }
 
@@ -1,16 +1,35 @@
-function rebindButtonCallback(button, callback) {
-    button.removeEventListener("click", button.lastCallback);
-    button.lastCallback = callback;
-    button.addEventListener("click", callback);
-}
-
-
+/**
+ * A list of records from the API, of which only the rows that are near the
+ * visible part of the page are in the DOM. The records are kept in
+ * this.records, from the top of the list to its bottom, and the list's
+ * padding stands in for the rows that aren't rendered. Rows are cloned from
+ * a template, and their buttons are handled by listeners of the list.
+ */
 class GenericList {
     readableListElementName = undefined;
     errorFieldName = "error_field";
     listElementName = "list";
     listElementsCreationFormName = "list_elements_creation_form";
+    listItemTemplateName = "list_item_template";
     postRequestsElementIdFieldName = undefined;
+    pageSize = 200;
+    // Rendered above and below the visible rows, so that scrolling doesn't
+    // show the padding before the next frame
+    overscanRowsAmount = 20;
+    // Until the heights of rendered rows are measured
+    estimatedRowHeight = 24;
+
+    constructor() {
+        this.records = [];
+        this.recordsById = new Map();
+        // The rows in the DOM by the ids of their records
+        this.listItems = new Map();
+        this.listItemTemplate = undefined;
+        this.rowHeight = this.estimatedRowHeight;
+        this.renderedRange = undefined;
+        this.contentsChanged = false;
+        this.renderIsScheduled = false;
+    }
 
     getDeletionURL(itemId) {
         return undefined;
@@ -24,6 +43,13 @@ class GenericList {
         return undefined;
     }
 
+    /**
+     * The URL of the Server-Sent Events with the changes of the list
+     */
+    getEventsURL() {
+        return undefined;
+    }
+
     /**
      * Should return undefined if renaming was unsuccessful
      */
@@ -37,15 +63,16 @@ class GenericList {
         return requestForm;
     }
 
-    async deleteListElementCallback(event) {
-        if (confirm(
+    confirmDeletion() {
+        return confirm(
             `Do you really want to delete this ${this.readableListElementName}?`
-        )) {
+        );
+    }
+
+    async deleteListElement(record) {
+        if (this.confirmDeletion()) {
             let requestForm = this.getFormDataWithCsrfToken();
-            requestForm.append(
-                this.postRequestsElementIdFieldName,
-                event.target.parentElement.dataset.record_id,
-            );
+            requestForm.append(this.postRequestsElementIdFieldName, record.id);
             let response = await this.fetchWithShowingErrorToUser(
                 this.getDeletionURL(), {
                     method: "POST",
@@ -54,8 +81,9 @@ class GenericList {
             );
             if (response.error) {
                 this.setError(response.error);
-            } else {
-                event.target.parentElement.remove();
+            } else if (this.recordsById.has(record.id)) {
+                // Unless the change came as an event already
+                this.removeRecord(record);
             }
         }
     }
@@ -71,32 +99,15 @@ class GenericList {
         }
     }
 
-    makeListItemTitle(listElement) {
-        let titleElement = document.createElement("span");
-        titleElement.innerText = listElement.title;
-        return titleElement;
-    }
-
-    editListElementCallback(event) {
+    editListElement(record) {
         amountOfFieldsBeingEdited += 1;
-        let button = event.target;
-        rebindButtonCallback(
-            button, this.saveEditedListElementTitleCallback.bind(this)
-        );
-        let listItem = button.parentElement;
-        let titleElement = listItem.querySelector(".title");
-        let inputField = listItem.querySelector(".input");
-        inputField.value = titleElement.innerText;
-        inputField.hidden = false;
-        titleElement.hidden = true;
-        button.innerText = "Save";
+        record.isBeingEdited = true;
+        record.editedTitle = record.title;
+        this.refreshRecord(record);
     }
 
-    async saveEditedListElementTitleCallback(event) {
-        let button = event.target;
-        let listItem = button.parentElement;
-        let inputField = listItem.querySelector(".input");
-        let newTitle = inputField.value;
+    async saveEditedListElementTitle(record) {
+        let newTitle = record.editedTitle;
         if (newTitle == "") {
             this.setNoTitleProvidedError();
             return;
@@ -104,54 +115,229 @@ class GenericList {
         let requestForm = this.getFormDataWithCsrfToken();
         requestForm.append("new_title", newTitle);
         let response = await this.sendEditedElementTitleToTheBackEnd(
-            listItem.dataset.record_id, requestForm,
+            record.id, requestForm,
         );
-        if (response === undefined) {
+        if (response === undefined || !record.isBeingEdited) {
             return;
         }
         this.setError("");
-        rebindButtonCallback(
-            button, this.editListElementCallback.bind(this)
-        );
         amountOfFieldsBeingEdited -= 1;
-        event.target.innerText = "Edit";
+        record.isBeingEdited = false;
+        record.title = newTitle;
+        this.refreshRecord(record);
+    }
+
+    /**
+     * The row that the rows of the records are cloned from. Subclasses add
+     * their parts to it
+     */
+    makeListItemTemplate() {
+        return document.getElementById(
+            this.listItemTemplateName
+        ).content.firstElementChild.cloneNode(true);
+    }
+
+    makeListItem(record) {
+        if (this.listItemTemplate === undefined) {
+            this.listItemTemplate = this.makeListItemTemplate();
+        }
+        let listItem = this.listItemTemplate.cloneNode(true);
+        listItem.dataset.record_id = record.id;
+        this.fillListItem(listItem, record);
+        return listItem;
+    }
+
+    /**
+     * Shows the current state of the record in its row
+     */
+    fillListItem(listItem, record) {
+        let isBeingEdited = Boolean(record.isBeingEdited);
         let titleElement = listItem.querySelector(".title");
-        titleElement.innerText = inputField.value;
-        titleElement.hidden = false;
-        inputField.hidden = true;
+        titleElement.textContent = record.title;
+        titleElement.hidden = isBeingEdited;
+        let inputField = listItem.querySelector(".input");
+        inputField.hidden = !isBeingEdited;
+        if (isBeingEdited) {
+            inputField.value = record.editedTitle;
+        }
+        listItem.querySelector(".edit").textContent = (
+            isBeingEdited ? "Save" : "Edit"
+        );
+    }
+
+    refreshRecord(record) {
+        let listItem = this.listItems.get(record.id);
+        if (listItem) {
+            this.fillListItem(listItem, record);
+        }
+    }
+
+    getRecord(recordId) {
+        return this.recordsById.get(+recordId);
+    }
+
+    /**
+     * The record of the row that the event happened in
+     */
+    getEventRecord(event) {
+        let listItem = event.target.closest("li");
+        return listItem ? this.getRecord(listItem.dataset.record_id) : undefined;
     }
 
     addListElement(listElement, where="afterbegin") {
-        let listItem = document.createElement("li");
-        listItem.dataset.record_id = listElement.id;
-        let listTitleElement = this.makeListItemTitle(listElement);
-        listTitleElement.classList.add("title");
-        listItem.append(listTitleElement);
-        let inputField = document.createElement("input");
-        inputField.classList.add("input");
-        inputField.hidden = true;
-        listItem.append(inputField);
-        let editButton = document.createElement("button");
-        editButton.classList.add("edit");
-        editButton.style["margin-left"] = "0.5em";
-        editButton.append("Edit");
-        {
-            let lastCallback = this.editListElementCallback.bind(this);
-            editButton.addEventListener("click", lastCallback);
-            editButton.lastCallback = lastCallback;
-        }
-        listItem.append(editButton);
-        let deleteButton = document.createElement("button");
-        deleteButton.classList.add("delete");
-        deleteButton.append("Delete");
-        deleteButton.style["margin-left"] = "0.5em";
-        deleteButton.addEventListener(
-            "click", this.deleteListElementCallback.bind(this)
+        this.insertRecord(
+            listElement, where == "afterbegin" ? 0 : this.records.length,
         );
-        listItem.append(deleteButton);
+    }
+
+    insertRecord(record, index) {
+        this.records.splice(index, 0, record);
+        this.recordsById.set(record.id, record);
+        this.scheduleRender(true);
+    }
+
+    moveRecord(record, index) {
+        this.records.splice(this.records.indexOf(record), 1);
+        this.records.splice(index, 0, record);
+        this.scheduleRender(true);
+    }
+
+    removeRecord(record) {
+        if (record.isBeingEdited) {
+            amountOfFieldsBeingEdited -= 1;
+        }
+        this.records.splice(this.records.indexOf(record), 1);
+        this.recordsById.delete(record.id);
+        this.scheduleRender(true);
+    }
+
+    clearRecords() {
+        for (let record of this.records) {
+            if (record.isBeingEdited) {
+                amountOfFieldsBeingEdited -= 1;
+            }
+        }
+        this.records = [];
+        this.recordsById.clear();
+        this.scheduleRender(true);
+    }
+
+    /**
+     * Renders the rows in the next frame. Changes of the records should
+     * pass contentsChanged, otherwise the rows are only rendered again when
+     * other records become visible
+     */
+    scheduleRender(contentsChanged=false) {
+        this.contentsChanged ||= contentsChanged;
+        if (!this.renderIsScheduled) {
+            this.renderIsScheduled = true;
+            requestAnimationFrame(() => {
+                this.renderIsScheduled = false;
+                this.render();
+            });
+        }
+    }
+
+    /**
+     * The indexes of the first record to render and of the one after the
+     * last, estimated from the heights of the rendered rows
+     */
+    getRenderedRange(list) {
+        let listTop = list.getBoundingClientRect().top;
+        let first = Math.max(0, Math.min(
+            Math.floor(-listTop / this.rowHeight) - this.overscanRowsAmount,
+            this.records.length,
+        ));
+        let end = Math.max(first, Math.min(
+            Math.ceil((window.innerHeight - listTop) / this.rowHeight)
+            + this.overscanRowsAmount,
+            this.records.length,
+        ));
+        return [first, end];
+    }
+
+    render() {
         let list = document.getElementById(this.listElementName);
-        list.insertAdjacentElement(where, listItem);
-        return listItem;
+        let [first, end] = this.getRenderedRange(list);
+        if (
+            !this.contentsChanged && this.renderedRange
+            && this.renderedRange[0] == first && this.renderedRange[1] == end
+        ) {
+            return;
+        }
+        this.contentsChanged = false;
+        this.renderedRange = [first, end];
+        let focusedElement = list.contains(document.activeElement)
+            ? document.activeElement : null;
+        let fragment = document.createDocumentFragment();
+        let listItems = new Map();
+        for (let index = first; index < end; index++) {
+            let record = this.records[index];
+            // Rows that stay rendered are moved, not made again
+            let listItem = (
+                this.listItems.get(record.id) ?? this.makeListItem(record)
+            );
+            listItem.hidden = false;
+            listItems.set(record.id, listItem);
+            fragment.append(listItem);
+        }
+        this.keepHiddenListItems(listItems, fragment);
+        this.listItems = listItems;
+        list.replaceChildren(fragment);
+        focusedElement?.focus({preventScroll: true});
+        // The numbers of the rows of an <ol> start from the first rendered one
+        list.start = first + 1;
+        this.measureRowHeight(list, end - first);
+        list.style["padding-top"] = `${first * this.rowHeight}px`;
+        list.style["padding-bottom"] = (
+            `${(this.records.length - end) * this.rowHeight}px`
+        );
+    }
+
+    /**
+     * Adds the rows that have to stay in the DOM while their records aren't
+     * rendered to listItems and the fragment, hidden
+     */
+    keepHiddenListItems(listItems, fragment) {
+    }
+
+    measureRowHeight(list, renderedAmount) {
+        if (renderedAmount == 0) {
+            return;
+        }
+        let top = list.firstElementChild.getBoundingClientRect().top;
+        let bottom = list.children[
+            renderedAmount - 1
+        ].getBoundingClientRect().bottom;
+        let rowHeight = (bottom - top) / renderedAmount;
+        if (rowHeight > 0 && Math.abs(rowHeight - this.rowHeight) >= 1) {
+            // The range was estimated with another height
+            this.rowHeight = rowHeight;
+            this.scheduleRender();
+        }
+    }
+
+    handleListClick(event) {
+        let record = this.getEventRecord(event);
+        if (record === undefined) {
+            return;
+        }
+        if (event.target.matches(".edit")) {
+            if (record.isBeingEdited) {
+                this.saveEditedListElementTitle(record);
+            } else {
+                this.editListElement(record);
+            }
+        } else if (event.target.matches(".delete")) {
+            this.deleteListElement(record);
+        }
+    }
+
+    handleListInput(event) {
+        let record = this.getEventRecord(event);
+        if (record !== undefined && event.target.matches(".input")) {
+            record.editedTitle = event.target.value;
+        }
     }
 
     getCreationFormData(listElementsCreationForm) {
@@ -174,10 +360,13 @@ class GenericList {
                 this.setError(toDoListInfo.error);
             } else {
                 this.setError("");
-                this.addListElement({
-                    id: toDoListInfo.id,
-                    title,
-                });
+                // The change could have come as an event already
+                if (!this.getRecord(toDoListInfo.id)) {
+                    this.addListElement({
+                        id: toDoListInfo.id,
+                        title,
+                    });
+                }
                 listElementsCreationForm.reset();
             }
         } else {
@@ -204,17 +393,148 @@ class GenericList {
         }
     }
 
-    bind() {
-        window.addEventListener(
-            "DOMContentLoaded",
-            () => this.fetchWithShowingErrorToUser(this.getGetterURL()).then(
-                (listContents) => {
-                    for (let listItem of listContents) {
-                        this.addListElement(listItem, "beforeend");
-                    }
+    /**
+     * Fetches JSON with If-None-Match, reusing the body stored in the
+     * session storage when the server answers with 304
+     */
+    async fetchWithRevalidation(url) {
+        let storageKey = `revalidation ${url}`;
+        let stored = JSON.parse(sessionStorage.getItem(storageKey));
+        let headers = {};
+        if (stored) {
+            headers["If-None-Match"] = stored.etag;
+        }
+        try {
+            let response = await fetch(url, {headers});
+            if (response.status == 304) {
+                return stored.body;
+            }
+            if (!response.ok) {
+                throw new Error(`${response.status} (${response.statusText})`);
+            }
+            let body = await response.json();
+            let etag = response.headers.get("ETag");
+            if (etag) {
+                try {
+                    sessionStorage.setItem(
+                        storageKey, JSON.stringify({etag, body}),
+                    );
+                } catch (error) {
+                    // The storage is full, the next load will be a full one
+                    sessionStorage.removeItem(storageKey);
                 }
-            ),
-        );
+            }
+            return body;
+        } catch (error) {
+            this.setError(error);
+        }
+    }
+
+    async *fetchListPages() {
+        let url = new URL(this.getGetterURL(), window.location.origin);
+        url.searchParams.set("limit", this.pageSize);
+        while (true) {
+            let page = await this.fetchWithRevalidation(url);
+            if (page === undefined) {
+                return;
+            }
+            yield page.results;
+            if (page.next === null) {
+                return;
+            }
+            url.searchParams.set("after", page.next);
+        }
+    }
+
+    async loadListContents() {
+        for await (let listContents of this.fetchListPages()) {
+            for (let listItem of listContents) {
+                this.addListElement(listItem, "beforeend");
+            }
+        }
+    }
+
+    /**
+     * Loads the list from scratch. Changes that come while it's loading are
+     * applied after it
+     */
+    async reloadListContents() {
+        this.pendingChanges = [];
+        this.clearRecords();
+        await this.loadListContents();
+        let pendingChanges = this.pendingChanges;
+        this.pendingChanges = undefined;
+        for (let change of pendingChanges) {
+            this.applyChange(change);
+        }
+    }
+
+    /**
+     * Applies a change made elsewhere (or by this page, in which case it's
+     * already there)
+     */
+    applyChange(change) {
+        let record = this.getRecord(change.id);
+        switch (change.type) {
+            case "created":
+                if (!record) {
+                    this.addListElement(change);
+                }
+                break;
+            case "renamed":
+                if (record) {
+                    record.title = change.title;
+                    this.refreshRecord(record);
+                }
+                break;
+            case "deleted":
+                if (record) {
+                    this.removeRecord(record);
+                }
+                break;
+            case "reset":
+                this.reloadListContents();
+                break;
+        }
+    }
+
+    subscribeToChanges() {
+        let eventsURL = this.getEventsURL();
+        if (eventsURL === undefined || !window.EventSource) {
+            return;
+        }
+        let eventSource = new EventSource(eventsURL);
+        let wasOpen = false;
+        eventSource.addEventListener("open", () => {
+            // The changes made while the connection was lost were missed
+            if (wasOpen) {
+                this.reloadListContents();
+            }
+            wasOpen = true;
+        });
+        eventSource.addEventListener("message", (event) => {
+            let change = JSON.parse(event.data);
+            if (this.pendingChanges === undefined) {
+                this.applyChange(change);
+            } else {
+                this.pendingChanges.push(change);
+            }
+        });
+    }
+
+    bind() {
+        let list = document.getElementById(this.listElementName);
+        list.addEventListener("click", this.handleListClick.bind(this));
+        list.addEventListener("input", this.handleListInput.bind(this));
+        for (let eventType of ["scroll", "resize"]) {
+            window.addEventListener(
+                eventType, () => this.scheduleRender(), {passive: true},
+            );
+        }
+        window.addEventListener("DOMContentLoaded", () => {
+            this.subscribeToChanges();
+            this.reloadListContents();
+        });
     }
 }
 
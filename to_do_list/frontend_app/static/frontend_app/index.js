@@ -13,12 +13,29 @@ class ListOfToDoLists extends GenericList {
         return "/api/to_do_lists/";
     }
 
-    makeListItemTitle(listElement) {
+    getEventsURL() {
+        return "/api/to_do_lists/events/";
+    }
+
+    makeListItemTemplate() {
+        let listItem = super.makeListItemTemplate();
         let viewHyperlink = document.createElement("a");
         viewHyperlink.classList.add("title");
-        viewHyperlink.href = `/to_do_lists/${listElement.id}`;
-        viewHyperlink.append(listElement.title);
-        return viewHyperlink;
+        listItem.querySelector(".title").replaceWith(viewHyperlink);
+        let counters = document.createElement("span");
+        counters.classList.add("counters");
+        counters.style["margin-left"] = "0.5em";
+        viewHyperlink.after(counters);
+        return listItem;
+    }
+
+    fillListItem(listItem, record) {
+        super.fillListItem(listItem, record);
+        listItem.querySelector(".title").href = `/to_do_lists/${record.id}`;
+        // New lists come without the counters
+        listItem.querySelector(".counters").textContent = (
+            `${record.done_count ?? 0}/${record.task_count ?? 0} done`
+        );
     }
 
     async sendEditedElementTitleToTheBackEnd(elementId, requestForm) {
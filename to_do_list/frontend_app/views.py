@@ -1,7 +1,8 @@
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, get_object_or_404
+from django.shortcuts import get_object_or_404
 
 from api import models
+from to_do_list.minification import render
 
 
 @login_required
@@ -10,7 +11,7 @@ def view_to_do_list(request, to_do_list_id):
     return render(
         request, (
             "frontend_app/accessible_to_do_list.html"
-            if request.user == to_do_list.owner else
+            if request.user.id == to_do_list.owner_id else
             "frontend_app/inaccessible_to_do_list.html"
         ), {
             "title": to_do_list.title,
@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'to_do_list.settings')
+os.environ.setdefault('EVENT_STREAMS', '1')
 
-application = get_asgi_application()
+# What get_asgi_application() does, with the handler that can also send the
+# event streams of the API
+django.setup(set_prefix=False)
+
+from api.events import ASGIHandler  # noqa: E402
+
+application = ASGIHandler()
@@ -0,0 +1,184 @@
+import asyncio
+import contextlib
+import json
+import logging
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+from django.utils.module_loading import import_string
+
+sql_logger = logging.getLogger("to_do_list.sql")
+
+
+class PageMiddleware:
+    """
+    Runs the PAGE_MIDDLEWARE (HTML minification, clickjacking protection,
+    messages) for every request, except the ones to paths that start with
+    one of PAGE_MIDDLEWARE_EXCLUDED_PATHS (the JSON API), which skip it.
+
+    PAGE_MIDDLEWARE can only have middleware with no process_view(),
+    process_exception() and process_template_response() hooks, as only the
+    project's handler calls those.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.excluded_paths = tuple(settings.PAGE_MIDDLEWARE_EXCLUDED_PATHS)
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Makes the handler await this middleware, like MiddlewareMixin
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            # django-htmlmin's middleware is synchronous
+            handler = async_to_sync(get_response)
+        else:
+            handler = get_response
+        for middleware_path in reversed(settings.PAGE_MIDDLEWARE):
+            handler = import_string(middleware_path)(handler)
+            for hook in (
+                "process_view", "process_exception",
+                "process_template_response",
+            ):
+                if hasattr(handler, hook):
+                    raise ImproperlyConfigured(
+                        f"{middleware_path} has {hook}(), so it can't be "
+                        f"in PAGE_MIDDLEWARE."
+                    )
+        self.get_page_response = handler
+
+    def is_excluded(self, request):
+        return request.path_info.startswith(self.excluded_paths)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if self.is_excluded(request):
+            return self.get_response(request)
+        return self.get_page_response(request)
+
+    async def __acall__(self, request):
+        if self.is_excluded(request):
+            return await self.get_response(request)
+        return await sync_to_async(
+            self.get_page_response, thread_sensitive=True,
+        )(request)
+
+
+class QueryStatistics:
+    """An execute wrapper that measures the queries of a request"""
+
+    def __init__(self):
+        self.queries_amount = 0
+        self.total_duration = 0
+        self.slowest_duration = 0
+        self.slowest_sql = ""
+
+    def __call__(self, execute, sql, params, many, context):
+        start_time = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start_time
+            self.queries_amount += 1
+            self.total_duration += duration
+            if duration >= self.slowest_duration:
+                self.slowest_duration = duration
+                self.slowest_sql = sql
+
+    def add_headers(self, response):
+        response["X-SQL-Queries"] = str(self.queries_amount)
+        response["X-SQL-Time"] = f"{self.total_duration * 1000:.3f}"
+        response["X-SQL-Slowest"] = (
+            f"{self.slowest_duration * 1000:.3f} "
+            f"{get_header_safe_sql(self.slowest_sql)}"
+        )
+        response["Server-Timing"] = (
+            f'db;dur={self.total_duration * 1000:.3f};'
+            f'desc="{self.queries_amount} queries"'
+        )
+
+    def log(self, request, response):
+        resolver_match = getattr(request, "resolver_match", None)
+        view_name = resolver_match.view_name if resolver_match else "-"
+        sql_logger.info(
+            "view=%s method=%s status=%d queries=%d sql_time_ms=%.3f "
+            "slowest_ms=%.3f slowest_sql=%s",
+            view_name, request.method, response.status_code,
+            self.queries_amount, self.total_duration * 1000,
+            self.slowest_duration * 1000,
+            json.dumps(get_header_safe_sql(self.slowest_sql)),
+            extra={
+                "view": view_name,
+                "queries": self.queries_amount,
+                "sql_time_ms": self.total_duration * 1000,
+                "slowest_sql_ms": self.slowest_duration * 1000,
+                "slowest_sql": self.slowest_sql,
+            },
+        )
+
+
+def get_header_safe_sql(sql):
+    """One line of ASCII, at most SQL_INSTRUMENTATION_MAX_SQL long"""
+    sql = " ".join(sql.split())
+    if len(sql) > settings.SQL_INSTRUMENTATION_MAX_SQL:
+        sql = sql[:settings.SQL_INSTRUMENTATION_MAX_SQL - 3] + "..."
+    return sql.encode("ascii", "replace").decode()
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Counts the SQL queries of every request and measures their total time
+    and the slowest of them. With SQL_INSTRUMENTATION_HEADERS they are sent
+    as X-SQL-* and Server-Timing headers, and with SQL_INSTRUMENTATION_LOG
+    logged to the "to_do_list.sql" logger as one key=value line per request,
+    with the values also in the record's attributes for structured handlers.
+
+    The queries of a streamed response's body are made after the middleware
+    returns, so they aren't counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not (
+            settings.SQL_INSTRUMENTATION_HEADERS
+            or settings.SQL_INSTRUMENTATION_LOG
+        ):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    @contextlib.contextmanager
+    def measure(self):
+        statistics = QueryStatistics()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(statistics))
+            yield statistics
+
+    def report(self, request, response, statistics):
+        if settings.SQL_INSTRUMENTATION_HEADERS:
+            statistics.add_headers(response)
+        if settings.SQL_INSTRUMENTATION_LOG:
+            statistics.log(request, response)
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with self.measure() as statistics:
+            response = self.get_response(request)
+        return self.report(request, response, statistics)
+
+    async def __acall__(self, request):
+        # Connections are shared with the sync_to_async() calls of the
+        # request, which make its queries
+        with self.measure() as statistics:
+            response = await self.get_response(request)
+        return self.report(request, response, statistics)
@@ -0,0 +1,70 @@
+"""
+Minified HTML pages, cached by their content.
+
+django-htmlmin's middleware minifies every page with a full HTML parse,
+which takes much longer than rendering it. Pages rendered with render() from
+here are minified once per distinct content and then taken from the cache.
+The CSRF token, which changes on every request, is rendered as a placeholder
+and put into the minified page afterwards.
+"""
+import hashlib
+
+from django import shortcuts
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template import loader
+from django.views.generic import TemplateView
+from htmlmin.minify import html_minify
+
+CSRF_TOKEN_PLACEHOLDER = "csrftokenplaceholder0e1f2c3d"
+
+
+def is_enabled():
+    # The same defaults as django-htmlmin's middleware
+    return getattr(settings, "HTML_MINIFY", not settings.DEBUG)
+
+
+def minify(content):
+    return html_minify(
+        content,
+        ignore_comments=not getattr(
+            settings, "KEEP_COMMENTS_ON_MINIFYING", False,
+        ),
+        parser=getattr(settings, "HTML_MIN_PARSER", "html5lib"),
+    )
+
+
+def get_minified(content):
+    cache = caches[settings.MINIFIED_PAGES_CACHE_ALIAS]
+    key = f"minified_page:{hashlib.sha256(content.encode()).hexdigest()}"
+    minified_content = cache.get(key)
+    if minified_content is None:
+        minified_content = minify(content)
+        cache.set(
+            key, minified_content,
+            timeout=settings.MINIFIED_PAGES_CACHE_TIMEOUT,
+        )
+    return minified_content
+
+
+def render(request, template_name, context=None):
+    """django.shortcuts.render() with the minification"""
+    if not is_enabled():
+        return shortcuts.render(request, template_name, context)
+    content = loader.render_to_string(template_name, {
+        **(context or {}), "csrf_token": CSRF_TOKEN_PLACEHOLDER,
+    }, request)
+    response = HttpResponse(get_minified(content).replace(
+        CSRF_TOKEN_PLACEHOLDER, get_token(request),
+    ))
+    # Keeps django-htmlmin's middleware from minifying it again
+    response.minify_response = False
+    return response
+
+
+class MinifiedTemplateView(TemplateView):
+
+    def render_to_response(self, context, **response_kwargs):
+        return render(self.request, self.get_template_names()[0], context)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
 import mimetypes
+import os
 from pathlib import Path
 
 from . import secret_settings
@@ -46,16 +47,37 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, to measure the queries of all the other middleware
+    'to_do_list.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # PAGE_MIDDLEWARE, except for the paths of PAGE_MIDDLEWARE_EXCLUDED_PATHS
+    'to_do_list.middleware.PageMiddleware',
+]
+
+# The middleware that only HTML pages need
+PAGE_MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'htmlmin.middleware.HtmlMinifyMiddleware',
     'htmlmin.middleware.MarkRequestMiddleware',
 ]
+PAGE_MIDDLEWARE_EXCLUDED_PATHS = ['/api/']
+
+# The queries of every request, see QueryInstrumentationMiddleware: as
+# response headers when debugging, and as a line of the "to_do_list.sql"
+# logger in production. SQL longer than SQL_INSTRUMENTATION_MAX_SQL is cut
+SQL_INSTRUMENTATION_HEADERS = DEBUG
+SQL_INSTRUMENTATION_LOG = not DEBUG
+SQL_INSTRUMENTATION_MAX_SQL = 200
+
+SILENCED_SYSTEM_CHECKS = [
+    # The admin needs MessageMiddleware, which is in PAGE_MIDDLEWARE
+    'admin.E409',
+]
 
 ROOT_URLCONF = 'to_do_list.urls'
 
@@ -77,19 +99,131 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'to_do_list.wsgi.application'
 
+# Whether to route the API views that have coroutine versions (see
+# api/async_views.py) to those. Off by default, even over ASGI: they still do
+# their database work in a thread, and benchmark_asgi_vs_wsgi measured them
+# slower than the sync views (447 against 562 requests/s with 64 clients, on
+# SQLite)
+ASYNC_API_VIEWS = os.environ.get('ASYNC_API_VIEWS') == '1'
+
+# Whether the project is served by the ASGIHandler of api/events.py, which
+# can send the event streams. asgi.py turns this on
+EVENT_STREAMS = os.environ.get('EVENT_STREAMS') == '1'
+
+# Delivers the changes of to-do lists to the open pages (see api/events.py).
+# The in-process one only reaches the pages served by the same process
+EVENTS_BROADCASTER = 'api.events.InProcessBroadcaster'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # django.db.backends.sqlite3 with "pragmas" and "transaction_mode"
+        # options, see the module
+        'ENGINE': 'to_do_list.sqlite3_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL lets readers work while a writer holds the lock, and
+            # busy_timeout makes writers wait for each other instead of
+            # failing with "database is locked". Set to {} to get SQLite's
+            # defaults
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': 5000,
+                'mmap_size': 256 * 1024 * 1024,
+                # Negative values are in KiB
+                'cache_size': -20000,
+                'temp_store': 'MEMORY',
+            },
+            'transaction_mode': 'IMMEDIATE',
+        },
+        'TEST': {
+            # On disk rather than in memory, so that the tests use the same
+            # journaling and locking as production. Tests with threads also
+            # need it: threads can't wait for each other's locks on a shared
+            # in-memory database
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    },
+}
+
+# PostgreSQL is used instead of SQLite when DATABASE_BACKEND=postgresql. The
+# tests run against it the same way: DATABASE_BACKEND=postgresql python
+# manage.py test (Django creates and drops the test_ database itself), or
+# against a throwaway local server with python manage.py run_postgresql_tests
+if os.environ.get('DATABASE_BACKEND') == 'postgresql':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'to_do_list'),
+        'USER': os.environ.get('POSTGRES_USER', ''),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', ''),
+        'PORT': os.environ.get('POSTGRES_PORT', ''),
+        # Persistent connections: seconds to keep a connection open, 0 to
+        # close it after every request. Django 4.0 doesn't check them before
+        # reusing them, so a request on a dropped connection fails
+        'CONN_MAX_AGE': int(os.environ.get('POSTGRES_CONN_MAX_AGE', 60)),
+        # Required behind a transaction-pooling PgBouncer, which can't keep
+        # the cursors of a transaction on the same server connection
+        'DISABLE_SERVER_SIDE_CURSORS': (
+            os.environ.get('POSTGRES_TRANSACTION_POOLING') == '1'
+        ),
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# The cache that stores the per-user index of to-do lists, and the versions
+# that the ETags of get_to_do_lists are made of. With several processes it
+# should be a cache shared by all of them (not the default LocMemCache):
+# changes only invalidate the cache of the process that made them, so the
+# others keep serving the old index, and answering 304 to the old ETag,
+# until the timeout
+TO_DO_LISTS_CACHE_ALIAS = 'default'
+TO_DO_LISTS_CACHE_TIMEOUT = 60
+
+# How the API encodes JSON: "orjson" (falls back to "stdlib" when orjson
+# isn't installed), "stdlib" or the import path of a function that returns
+# bytes, see api/json_encoding.py
+API_JSON_ENCODER = 'orjson'
+
+# Tasks done longer ago than this are moved to the archive by archive_tasks,
+# which is meant to be run periodically (e.g. daily by cron)
+TASK_ARCHIVING_AGE_DAYS = 30
+
+# The cache of minified pages, see to_do_list/minification.py
+MINIFIED_PAGES_CACHE_ALIAS = 'default'
+MINIFIED_PAGES_CACHE_TIMEOUT = 60 * 60
+
+
+# Logging
+# https://docs.djangoproject.com/en/4.0/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'to_do_list.sql': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
-    # If I'm gonna use postgres:
-    # "OPTIONS": {
-    #     "isolation_level": psycopg2.extensions.ISOLATION_LEVEL_SERIALIZABLE,
-    # }
 }
 
 
@@ -139,5 +273,27 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_REDIRECT_URL = "index"
 LOGOUT_REDIRECT_URL = "index"
 
+# ModelBackend with the users of recent requests kept in memory, see
+# authentication/backends.py
+AUTHENTICATION_BACKENDS = ['authentication.backends.CachedModelBackend']
+AUTHENTICATION_USERS_CACHE_SIZE = 1000
+AUTHENTICATION_USERS_CACHE_TIMEOUT = 60
+
+# Sessions
+# https://docs.djangoproject.com/en/4.0/topics/http/sessions/
+#
+# SESSION_BACKEND=cached_db reads sessions from the cache and only falls back
+# to the database on a miss. It should only be used with a cache shared by
+# all the processes (not the default LocMemCache), otherwise the other
+# processes keep accepting a session after logging out until it expires
+# from their caches. SESSION_BACKEND=signed_cookies stores the session in the
+# cookie, with no storage at all, but logging out can't revoke copies of the
+# cookie
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[os.environ.get('SESSION_BACKEND', 'db')]
+
 # django-htmlmin
 HTML_MINIFY = True
@@ -0,0 +1,38 @@
+"""
+SQLite backend that can be tuned for concurrent workers.
+
+Two extra keys are read from the database OPTIONS:
+
+* "pragmas": a dict of PRAGMAs that are set on every new connection;
+* "transaction_mode": how transactions are started, for example "IMMEDIATE".
+  With the default deferred transactions, a transaction that reads first and
+  then tries to write can't wait for another writer and fails right away with
+  "database is locked", no matter what busy_timeout is. Immediate
+  transactions take the write lock at the start, so they wait instead.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        connection_params = super().get_connection_params()
+        connection_params.pop("pragmas", None)
+        connection_params.pop("transaction_mode", None)
+        return connection_params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pragmas = self.settings_dict["OPTIONS"].get("pragmas", {})
+        for pragma, value in pragmas.items():
+            connection.execute(f"PRAGMA {pragma} = {value}")
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        transaction_mode = self.settings_dict["OPTIONS"].get(
+            "transaction_mode"
+        )
+        if transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f"BEGIN {transaction_mode}")
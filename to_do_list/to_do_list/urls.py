@@ -15,12 +15,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.views.generic import TemplateView
+
+from .minification import MinifiedTemplateView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path(
-        '', TemplateView.as_view(
+        '', MinifiedTemplateView.as_view(
             template_name="frontend_app/index.html",
             extra_context={"creation_button_text": "Create new to-do list"},
         ),